@@ -1,25 +1,47 @@
 from __future__ import annotations
+import argparse
+import dataclasses
 import datetime
+import functools
 import logging
+import multiprocessing
+import socket
+import threading
 from socket import gethostname, gethostbyname
-from flask import Flask
+from typing import Any, Callable
+from flask import Flask, Response
 from flask_restful import Api, Resource, abort, request, reqparse
-from dataclasses import dataclass
-from secrets import token_hex
 from waitress import serve
 
 import cutlistgenerator
-from cutlistgenerator import errors, database, statuscodes
+from cutlistgenerator import changebus, errors, database, pagination, statuscodes
+from cutlistgenerator.database import cuthistory, cutreport
+from cutlistgenerator.estimator import cut_time_estimator
+from cutlistgenerator.responsecache import response_cache
+from cutlistgenerator.tokenstore import ApiToken, TokenStore, create_token_store
 from cutlistgenerator.thread import register as thread_register
 
-from cutlistgenerator.database.models.cutjob import CutJob, CutJobStatus, PartCutHistory
+from sqlalchemy import exists
+from sqlalchemy.orm import Query, selectinload
+from cutlistgenerator.database.models.customer import Customer
+from cutlistgenerator.database.models.part import Part
+from cutlistgenerator.database.models.systemproperty import SystemProperty
+from cutlistgenerator.database.models.cutjob import CutJob, CutJobItem, CutJobStatus, PartCutHistory
 from cutlistgenerator.database.models.salesorder import (
     SalesOrder,
     SalesOrderItem,
     SalesOrderStatus,
 )
 from cutlistgenerator.database.models.user import User
-from cutlistgenerator.settings import API_TOKEN_VALIDITY, FLASK_SECRET_KEY
+from cutlistgenerator.database.models.wirecutter import WireCutter
+from cutlistgenerator.settings import (
+    API_EVENT_HEARTBEAT_SECONDS,
+    API_EVENT_STREAMS,
+    API_MAX_PAGE_SIZE,
+    API_THREADS,
+    API_WORKERS,
+    FLASK_SECRET_KEY,
+)
 
 
 logger = logging.getLogger("api")
@@ -29,6 +51,12 @@ flask_app = Flask(__name__)
 flask_app.config["SECRET_KEY"] = FLASK_SECRET_KEY
 api = Api(flask_app)
 
+
+@flask_app.teardown_appcontext
+def remove_session(exception=None) -> None:
+    """Return the request thread's global_session connection to the pool."""
+    database.global_session.remove()
+
 login_post_parser = reqparse.RequestParser()
 login_post_parser.add_argument(
     "username", type=str, required=True, help="Username is required."
@@ -37,6 +65,22 @@ login_post_parser.add_argument(
     "password", type=str, required=True, help="Password is required."
 )
 
+page_parser = reqparse.RequestParser()
+page_parser.add_argument("limit", type=int, location="args", help="Rows per page.")
+page_parser.add_argument("cursor", type=str, location="args", help="X-Next-Cursor of the previous page.")
+page_parser.add_argument("fields", type=str, location="args", help="Comma separated fields to return, e.g. number,customer.name")
+
+events_parser = reqparse.RequestParser()
+events_parser.add_argument("last_event_id", type=int, location="args", help="Id of the last event seen, the Last-Event-ID header takes precedence.")
+events_parser.add_argument("tables", type=str, location="args", help="Comma separated tables to watch, e.g. cut_job,cut_job_item")
+
+event_stream_slots = threading.BoundedSemaphore(API_EVENT_STREAMS)
+
+summary_parser = reqparse.RequestParser()
+summary_parser.add_argument("period", type=str, location="args", default="week", choices=("day", "week"), help="Bucket size, day or week.")
+summary_parser.add_argument("since", type=datetime.date.fromisoformat, location="args", help="First day to include, YYYY-MM-DD.")
+summary_parser.add_argument("wire_cutter_id", type=int, location="args", help="Only this wire cutter.")
+
 api_request_parser = reqparse.RequestParser()
 api_request_parser.add_argument(
     "api_token",
@@ -46,52 +90,27 @@ api_request_parser.add_argument(
 )
 
 
-@dataclass
-class ApiToken:
-    user: User
-    token: str
-    expires: datetime.datetime = datetime.datetime.now() + datetime.timedelta(
-        days=API_TOKEN_VALIDITY
-    )
-
-    def expired(self) -> bool:
-        return self.expires < datetime.datetime.now()
-
-    @staticmethod
-    def generate() -> str:
-        """Generates a new API token key."""
-        return token_hex(32)
-
-
-api_tokens = (
-    list()
-)  # type: list[ApiToken] # FIXME: Find a better way to store API tokens.
+token_store = create_token_store()
 
 
 def api_token_watchdog() -> None:
-    """API token watchdog. Used in a thread for removing expired API tokens."""
-    global api_tokens
-
-    while True:
-        for token in api_tokens:
-            if token.expired():
-                logger.info(f"Removing expired API token: {token.token}")
-                api_tokens.remove(token)
+    """API token watchdog. Called periodically to remove expired API tokens."""
+    removed = token_store.purge_expired()
+    if removed:
+        logger.info(f"Removed {removed} expired API token(s)")
 
 
 def validate_api_token(api_token: str) -> tuple[bool, ApiToken]:
     """Validates an API token."""
-    for token in api_tokens:
-        if token.token == api_token:
-            return True, token
-    return False, None
+    token = token_store.get(api_token)
+    return token is not None, token
 
 
 # decorator to check for valid API token
 def requires_api_token(f):
+    @functools.wraps(f)
     def decorated(*args, **kwargs):
-        args = api_request_parser.parse_args()
-        api_token = args["api_token"]
+        api_token = api_request_parser.parse_args()["api_token"]
         if not api_token:
             abort(statuscodes.HTTP_INVALID_TOKEN, message="API token is invalid.")
         valid, token = validate_api_token(api_token)
@@ -100,68 +119,135 @@ def requires_api_token(f):
         if token.expired():
             abort(statuscodes.HTTP_UNAUTHORIZED, message="API token has expired.")
 
-        token.expires = datetime.datetime.now() + datetime.timedelta(seconds=20)
+        token_store.touch(token.token, datetime.datetime.now() + datetime.timedelta(seconds=20))
         return f(*args, **kwargs)
 
     return decorated
 
 
+def stream_page(
+    model, build_query: Callable[[database.session_type_hint], Query], serialize: Callable[[Any], dict], options: list
+) -> Response:
+    """Returns one page of model rows as a streamed JSON array.
+
+    Reads limit, cursor and fields from the query string. When another page follows,
+    its cursor is returned in the X-Next-Cursor header. Without a limit every row is
+    returned, still streamed.
+
+    Args:
+        model (Base): Mapped class to page through.
+        build_query (Callable[[Session], Query]): Builds the filtered query of model rows.
+        serialize (Callable[[Base], dict]): Turns one row into a dict.
+        options (list): Loader options used when the rows are loaded.
+
+    Returns:
+        Response: The streaming response.
+    """
+    args = page_parser.parse_args()
+    limit = args["limit"]
+    if limit is not None and not 0 < limit <= API_MAX_PAGE_SIZE:
+        abort(statuscodes.HTTP_BAD_REQUEST, message=f"limit must be between 1 and {API_MAX_PAGE_SIZE}.")
+    after = None
+    if args["cursor"]:
+        try:
+            after = pagination.decode_cursor(args["cursor"])
+        except ValueError as error:
+            abort(statuscodes.HTTP_BAD_REQUEST, message=str(error))
+    fields = pagination.parse_fields(args["fields"])
+
+    with database.Session() as session:
+        ids, next_id = pagination.read_page_ids(build_query(session), model.id, after=after, limit=limit)
+
+    rows = pagination.iter_rows(
+        model, ids, lambda row: pagination.project(serialize(row), fields), options=options
+    )
+    headers = {}
+    if next_id is not None:
+        headers["X-Next-Cursor"] = pagination.encode_cursor(next_id)
+    return Response(pagination.stream_json_array(rows), mimetype="application/json", headers=headers)
+
+
+# fmt: off
+sales_order_options = [
+    selectinload(SalesOrder.customer).selectinload(Customer.name_convertion),
+    selectinload(SalesOrder.status),
+    selectinload(SalesOrder.items).selectinload(SalesOrderItem.part),
+    selectinload(SalesOrder.items).selectinload(SalesOrderItem.status),
+    selectinload(SalesOrder.items).selectinload(SalesOrderItem.type),
+    selectinload(SalesOrder.items).selectinload(SalesOrderItem.parent_item),
+]
+cut_job_options = [
+    selectinload(CutJob.status),
+    selectinload(CutJob.wire_cutter),
+    selectinload(CutJob.items).selectinload(CutJobItem.part),
+    selectinload(CutJob.items).selectinload(CutJobItem.status),
+    selectinload(CutJob.items).selectinload(CutJobItem.sales_order_items).selectinload(SalesOrderItem.sales_order),
+]
+# fmt: on
+
+# Auditing tables each response is built from. SystemProperty holds the sync watermarks, so every sync commit changes it.
+sales_order_tables = [SalesOrder, SalesOrderItem, Customer, Part, SystemProperty]
+cut_job_tables = [CutJob, CutJobItem, SalesOrderItem, SalesOrder, Part, WireCutter]
+
+
+def open_cut_jobs_query(session: database.session_type_hint) -> Query:
+    fullfilled_status = CutJobStatus.find_by_name("Fulfilled")
+    return session.query(CutJob).filter(CutJob.status_id < fullfilled_status.id)
+
+
+def open_sales_orders_query(session: database.session_type_hint) -> Query:
+    fullfilled_status = SalesOrderStatus.find_by_name("Fulfilled")
+    return session.query(SalesOrder).filter(SalesOrder.status_id < fullfilled_status.id)
+
+
+def uncut_sales_orders_query(session: database.session_type_hint) -> Query:
+    # A semi-join returns each order once, however many of its items are uncut.
+    return open_sales_orders_query(session).filter(
+        exists().where(
+            SalesOrderItem.sales_order_id == SalesOrder.id,
+            SalesOrderItem.is_cut == False,
+        )
+    )
+
+
+def refresh_cut_time_estimates() -> None:
+    """Refresh the estimates CutJobItem.to_dict reads, before a response is built from them.
+
+    New estimates change the responses without changing their tables, so cached responses are dropped.
+    """
+    if cut_time_estimator.refresh_if_stale():
+        response_cache.invalidate()
+
+
 class OpenCutJobs(Resource):
     # @requires_api_token
     def get(self):
         """Returns a list of open cut jobs."""
-        with database.Session() as session:
-            fullfilled_status = (
-                session.query(CutJobStatus)
-                .filter(CutJobStatus.name == "Fulfilled")
-                .first()
-            )
-            cut_jobs = (
-                session.query(CutJob)
-                .filter(CutJob.status_id < fullfilled_status.id)
-                .all()
-            )
-            return [cut_job.to_dict() for cut_job in cut_jobs]
+        refresh_cut_time_estimates()
+        return response_cache.respond(
+            cut_job_tables,
+            lambda: stream_page(CutJob, open_cut_jobs_query, CutJob.to_dict, cut_job_options),
+        )
 
 
 class OpenSalesOrders(Resource):
     # @requires_api_token
     def get(self):
         """Returns a list of open sales orders."""
-        with database.Session() as session:
-            fullfilled_status = (
-                session.query(SalesOrderStatus)
-                .filter(SalesOrderStatus.name == "Fulfilled")
-                .first()
-            )
-            sales_orders = (
-                session.query(SalesOrder)
-                .filter(SalesOrder.status_id < fullfilled_status.id)
-                .all()
-            )
-            return [sales_order.to_dict() for sales_order in sales_orders]
+        return response_cache.respond(
+            sales_order_tables,
+            lambda: stream_page(SalesOrder, open_sales_orders_query, SalesOrder.to_dict, sales_order_options),
+        )
 
 
 class UncutSalesOrders(Resource):
     # @requires_api_token
     def get(self):
         """Returns a list of uncut sales orders."""
-        with database.Session() as session:
-            fullfilled_status = (
-                session.query(SalesOrderStatus)
-                .filter(SalesOrderStatus.name == "Fulfilled")
-                .first()
-            )
-            sales_orders = (
-                session.query(SalesOrder)
-                .join(SalesOrderItem)
-                .filter(
-                    SalesOrder.status_id < fullfilled_status.id,
-                    SalesOrderItem.is_cut == 0,
-                )
-                .all()
-            )
-            return [sales_order.to_dict() for sales_order in sales_orders]
+        return response_cache.respond(
+            sales_order_tables,
+            lambda: stream_page(SalesOrder, uncut_sales_orders_query, SalesOrder.to_dict, sales_order_options),
+        )
 
 
 class PartCutHistoryResource(Resource):
@@ -181,6 +267,103 @@ class PartCutHistoryResource(Resource):
             ]
 
 
+class PartCutHistorySummaryResource(Resource):
+    # @requires_api_token
+    def get(self, part_number: str):
+        args = summary_parser.parse_args()
+        with database.Session() as session:
+            part = session.query(Part).filter(Part.number == part_number).first()
+            if part is None:
+                abort(
+                    statuscodes.HTTP_NOT_FOUND,
+                    message="Part {} not found".format(part_number),
+                )
+            return cuthistory.find_summary(
+                part.id,
+                period=args["period"],
+                since=args["since"],
+                wire_cutter_id=args["wire_cutter_id"],
+                session=session,
+            )
+
+
+class CutReportResource(Resource):
+    @requires_api_token
+    def post(self):
+        """Report the quantities cut on many cut job items at once.
+
+        The body is {"reports": [{"cut_job_item_id": 1, "quantity_cut": 10, "total_time_minutes": 5}, ...]},
+        total_time_minutes is optional.
+        """
+        body = request.get_json(silent=True) or {}
+        try:
+            reports = [
+                cutreport.CutReport(
+                    cut_job_item_id=int(report["cut_job_item_id"]),
+                    quantity_cut=int(report["quantity_cut"]),
+                    total_time_minutes=None
+                    if report.get("total_time_minutes") is None
+                    else int(report["total_time_minutes"]),
+                )
+                for report in body["reports"]
+            ]
+        except (KeyError, TypeError, ValueError, AttributeError):
+            abort(
+                statuscodes.HTTP_BAD_REQUEST,
+                message='Expected {"reports": [{"cut_job_item_id": int, "quantity_cut": int, "total_time_minutes": int}]}',
+            )
+        with database.Session() as session:
+            try:
+                result = cutreport.report_cut_quantities(reports, session=session)
+            except ValueError as error:
+                abort(statuscodes.HTTP_BAD_REQUEST, message=str(error))
+        return dataclasses.asdict(result)
+
+
+class EventsResource(Resource):
+    # @requires_api_token
+    def get(self):
+        """Stream changes to cut jobs, cut job items and sales order items as Server-Sent Events.
+
+        Each event is a ChangeEvent. A "reset" event means changes were missed and
+        everything should be reloaded.
+        """
+        args = events_parser.parse_args()
+        last_event_id = args["last_event_id"]
+        if request.headers.get("Last-Event-ID", "").isdigit():
+            last_event_id = int(request.headers["Last-Event-ID"])
+        tables = None
+        if args["tables"]:
+            tables = {table.strip() for table in args["tables"].split(",") if table.strip()}
+            unknown = tables - changebus.WATCHED_TABLES
+            if unknown:
+                abort(statuscodes.HTTP_BAD_REQUEST, message=f"Unknown tables: {', '.join(sorted(unknown))}")
+        if not event_stream_slots.acquire(blocking=False):
+            abort(statuscodes.HTTP_SERVICE_UNAVAILABLE, message="Too many event streams are open, poll instead.")
+
+        changebus.change_bus.start_polling()
+        subscription = changebus.change_bus.subscribe(last_event_id, tables)
+
+        def stream():
+            try:
+                yield "retry: 3000\n\n"
+                while True:
+                    if subscription.overflowed:
+                        subscription.reset()
+                        yield "event: reset\ndata: {}\n\n"
+                    change = subscription.get(timeout=API_EVENT_HEARTBEAT_SECONDS)
+                    yield change.to_sse() if change is not None else ": keep-alive\n\n"
+            finally:
+                subscription.close()
+                event_stream_slots.release()
+
+        return Response(
+            stream(),
+            mimetype="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+
 class LoginResource(Resource):
     def get(self):
         args = login_post_parser.parse_args()
@@ -189,14 +372,12 @@ class LoginResource(Resource):
 
         try:
             user = User.authenticate(username, password)
-            for api_token in api_tokens:
-                if api_token.user == user:
-                    return {
-                        "message": "User already logged in.",
-                        "api_token": api_token.token,
-                    }
-            api_token = ApiToken(user, ApiToken.generate())
-            api_tokens.append(api_token)
+            api_token, issued = token_store.issue(user.id)
+            if not issued:
+                return {
+                    "message": "User already logged in.",
+                    "api_token": api_token.token,
+                }
         except errors.AuthenticationError as e:
             abort(statuscodes.HTTP_UNAUTHORIZED, message=str(e))
         return {"user": user.to_dict(), "token": api_token.token}
@@ -208,14 +389,7 @@ class LogoutResource(Resource):
         args = api_request_parser.parse_args()
         api_token = args["api_token"]
 
-        logged_out = False
-
-        for i, token in enumerate(api_tokens):
-            if token.token == api_token:
-                del api_tokens[i]
-                logged_out = True
-                break
-        if not logged_out:
+        if not token_store.revoke(api_token):
             abort(statuscodes.HTTP_INVALID_TOKEN, message="API token invalid")
         return {"message": "Logged out successfully"}
 
@@ -225,6 +399,10 @@ api.add_resource(OpenCutJobs, "/api/cutjobs/open")
 api.add_resource(UncutSalesOrders, "/api/salesorders/uncut")
 api.add_resource(OpenSalesOrders, "/api/salesorders/open")
 api.add_resource(PartCutHistoryResource, "/api/partcuthistory/<string:part_number>")
+api.add_resource(CutReportResource, "/api/cutjobitems/report")
+api.add_resource(PartCutHistorySummaryResource, "/api/partcuthistory/<string:part_number>/summary")
+
+api.add_resource(EventsResource, "/api/events")
 
 api.add_resource(LoginResource, "/api/login")
 api.add_resource(LogoutResource, "/api/logout")
@@ -233,22 +411,74 @@ api.add_resource(LogoutResource, "/api/logout")
 thread_register(api_token_watchdog)
 
 
-def start_api(host: str = "0.0.0.0", port: int = 5000) -> None:
-    """Starts the API server."""
+def serve_worker(listen_socket: socket.socket, threads: int) -> None:
+    """Serve requests from a socket shared with the other API worker processes."""
+    database.resize_pool(threads)
+    cut_time_estimator.refresh()
+    logger.info(f"API worker {multiprocessing.current_process().name} serving with {threads} threads")
+    # Event streams hold a request thread each but no database connection.
+    serve(flask_app, sockets=[listen_socket], threads=threads + API_EVENT_STREAMS)
+
+
+def start_api(
+    host: str = "0.0.0.0", port: int = 5000, threads: int = API_THREADS, workers: int = API_WORKERS
+) -> None:
+    """Starts the API server.
+
+    Args:
+        host (str, optional): Address to listen on. Defaults to "0.0.0.0".
+        port (int, optional): Port to listen on. Defaults to 5000.
+        threads (int, optional): Request threads per process. Defaults to the API threads setting.
+        workers (int, optional): Processes sharing the port. Defaults to the API workers setting.
+    """
     logger.info("Starting API server")
     host_ = host
     host_name = gethostname()
     host_ip = gethostbyname(host_name)
     if host_ == "0.0.0.0":
         host_ = host_ip
-    logger.info(f"API server listening on {host_}:{port}")
-    serve(flask_app, host=host_, port=port, threads=1)
+    logger.info(f"API server listening on {host_}:{port} with {workers} worker(s) of {threads} threads")
+
+    if workers <= 1:
+        database.resize_pool(threads)
+        # Read the whole history now rather than in the first request.
+        cut_time_estimator.refresh()
+        serve(flask_app, host=host_, port=port, threads=threads + API_EVENT_STREAMS)
+        return
+
+    if isinstance(token_store, TokenStore):
+        # A token held in memory is only known to the worker that issued it.
+        logger.warning("Running multiple API workers with the memory token store, API tokens are not shared between them.")
+    listen_socket = socket.create_server((host_, port))
+    # Workers open their own connections, do not hand them this process's pool.
+    database.engine.dispose()
+    context = multiprocessing.get_context("spawn")
+    processes = [
+        context.Process(target=serve_worker, args=(listen_socket, threads), name=f"API Worker {number}")
+        for number in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+
+def main(argv: list[str] = None) -> None:
+    parser = argparse.ArgumentParser(description="Cut List Generator API server.")
+    parser.add_argument("--host", default="0.0.0.0", help="Address to listen on.")
+    parser.add_argument("--port", type=int, default=5000, help="Port to listen on.")
+    parser.add_argument("--threads", type=int, default=API_THREADS, help="Request threads per process.")
+    parser.add_argument("--workers", type=int, default=API_WORKERS, help="Processes sharing the port.")
+    args = parser.parse_args(argv)
+
+    database.create()
+    start_api(host=args.host, port=args.port, threads=args.threads, workers=args.workers)
 
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()
     try:
-        database.create()
-        start_api()
+        main()
     except Exception as e:
         logger.exception("Fatal error")
         raise
@@ -1,13 +1,12 @@
 from __future__ import annotations
 import sys
 import traceback
+import multiprocessing
 import logging
 import webbrowser
-from dataclasses import dataclass
 from PyQt5 import QtCore, QtGui, QtWidgets
 from PyQt5.QtCore import QRunnable, QThreadPool, pyqtSlot, pyqtSignal, QObject, Qt
 from PyQt5.QtWidgets import QApplication, QMessageBox, QProgressBar
-from cutlistgenerator.database.models.customer import Customer
 import fishbowlorm
 from cutlistgenerator import (
     FISHBOWL_DATABASE_USER,
@@ -18,15 +17,17 @@ from cutlistgenerator import (
     DEBUG,
 )
 from cutlistgenerator.database import global_session, create as create_database, Session
-from cutlistgenerator.database.models.salesorder import (
-    SalesOrder,
-    SalesOrderItem,
-    SalesOrderStatus,
-)
+from cutlistgenerator.database.models.salesorder import SalesOrderItem
 from cutlistgenerator.database.models.part import Part
+from cutlistgenerator.database.models.wirecutter import WireCutter
 from cutlistgenerator.settings import *
-from cutlistgenerator import utilities
-from cutlistgenerator.customwidgets.qtable import CustomQTableWidget
+from cutlistgenerator import changebus, errors, scheduler, utilities, syncservice
+from cutlistgenerator.syncservice import SyncProcess
+from cutlistgenerator.customwidgets.qtable import CustomQTableView, PagedTableModel
+from cutlistgenerator.customwidgets.searchcontroller import SearchController
+from cutlistgenerator.database import salesordertable
+from cutlistgenerator.database.deletion import delete_sales_order_items
+from cutlistgenerator.database.salesordertable import SalesOrderSearchCriteria
 from cutlistgenerator.customwidgets.messagebox import ResizableMessageBox
 from cutlistgenerator.ui.dialogs import (
     CustomerNameConverterDialog,
@@ -79,17 +80,8 @@ COLUMNS = [
     "Parent Description",
 ]
 
-
-@dataclass
-class SalesOrderSearchCriteria:
-    """The search criteria for the sales order table."""
-
-    so_number: str
-    customer_name: str
-    part_number: str
-    parent_part_number: str
-    show_fully_cut: bool
-    due_date_range: DateRange
+SO_TABLE_SORT_FIELDS = [None] + list(salesordertable.SalesOrderTableRow._fields)
+"""SalesOrderTableRow field the rows are ordered by when sorting by each of COLUMNS."""
 
 
 class Worker(QRunnable):
@@ -126,6 +118,10 @@ class WorkerSignals(QObject):
     result = pyqtSignal(object)
 
 
+class ChangeSignals(QObject):
+    changed = pyqtSignal(str)
+
+
 class MainWindow(QtWidgets.QMainWindow):
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -140,12 +136,26 @@ class MainWindow(QtWidgets.QMainWindow):
 
         self.updating_table = False
         self.updating_fishbowl_data = False
+        self.sync_process = None  # type: SyncProcess
+        self.sync_errors = []  # type: list[str]
 
         self.threadpool = QThreadPool()
         self.progressBar = QProgressBar()
 
         self.statusbar.addPermanentWidget(self.progressbar)
 
+        if FISHBOWL_AUTO_SYNC_MINUTES > 0:
+            self.auto_sync_timer = QtCore.QTimer(self)
+            self.auto_sync_timer.timeout.connect(lambda: self.update_fishbowl_so_data())
+            self.auto_sync_timer.start(FISHBOWL_AUTO_SYNC_MINUTES * 60 * 1000)
+
+        # Search again when sales order items or cut jobs change, here or in another process.
+        # Listeners run on the publishing thread, the signal hands the change to the GUI thread.
+        self.change_signals = ChangeSignals()
+        self.change_signals.changed.connect(self.on_data_changed)
+        changebus.change_bus.add_listener(lambda change: self.change_signals.changed.emit(change.table))
+        changebus.change_bus.start_polling()
+
         self.reload_so_table()
 
     def setup_ui(self):
@@ -200,13 +210,25 @@ class MainWindow(QtWidgets.QMainWindow):
         self.so_search_layout.addWidget(self.include_fully_cut_checkbox)
         self.so_search_layout.addWidget(self.so_search_button)
 
-        self.so_table_widget = CustomQTableWidget()
-        self.so_table_widget.set_table_headers(COLUMNS)
+        self.so_table_model = PagedTableModel(COLUMNS, page_size=SO_TABLE_PAGE_SIZE, parent=self)
+        self.so_table_view = CustomQTableView()
+        self.so_table_view.setModel(self.so_table_model)
+        self.so_table_search = SearchController(
+            prepare=self.get_so_table_search_criteria,
+            run=lambda criteria: (criteria, salesordertable.read_page(criteria, limit=SO_TABLE_PAGE_SIZE)),
+            apply=self.show_so_table_results,
+            delay_ms=SO_TABLE_SEARCH_DELAY_MS,
+            parent=self,
+        )
+        self.so_table_model.sort_requested.connect(lambda column, order: self.reload_so_table())
+        self.so_table_search.failed.connect(
+            lambda message: self.statusbar.showMessage("Sales order search failed, see the log for details.", 5000)
+        )
 
         self.view_selected_so_button = QtWidgets.QPushButton("View")
         self.view_selected_so_button.setEnabled(False)
 
-        self.so_search_layout.addWidget(self.so_table_widget, stretch=1)
+        self.so_search_layout.addWidget(self.so_table_view, stretch=1)
         self.so_search_layout.addWidget(self.view_selected_so_button)
 
     def setup_menubar(self):
@@ -242,10 +264,17 @@ class MainWindow(QtWidgets.QMainWindow):
         self.update_fishbowl_so_data_action = QtWidgets.QAction(self)
         self.update_fishbowl_so_data_action.setText("Update Fishbowl SO Data")
         self.update_fishbowl_so_data_action.triggered.connect(
-            self.update_fishbowl_so_data
+            lambda: self.update_fishbowl_so_data()
         )
         self.fishbowl_menu.addAction(self.update_fishbowl_so_data_action)
 
+        self.full_update_fishbowl_so_data_action = QtWidgets.QAction(self)
+        self.full_update_fishbowl_so_data_action.setText("Full Fishbowl SO Data Reconciliation")
+        self.full_update_fishbowl_so_data_action.triggered.connect(
+            lambda: self.update_fishbowl_so_data(full=True)
+        )
+        self.fishbowl_menu.addAction(self.full_update_fishbowl_so_data_action)
+
         self.update_fishbowl_part_data_action = QtWidgets.QAction(self)
         self.update_fishbowl_part_data_action.setText("Update Fishbowl Part Data")
         self.update_fishbowl_part_data_action.triggered.connect(
@@ -268,6 +297,11 @@ class MainWindow(QtWidgets.QMainWindow):
         self.open_wire_cutter_editor_action.triggered.connect(self.edit_wire_cutter)
         self.wire_cutter_menu.addAction(self.open_wire_cutter_editor_action)
 
+        self.schedule_cut_jobs_action = QtWidgets.QAction(self)
+        self.schedule_cut_jobs_action.setText("Schedule Uncut Items")
+        self.schedule_cut_jobs_action.triggered.connect(self.schedule_cut_jobs)
+        self.wire_cutter_menu.addAction(self.schedule_cut_jobs_action)
+
         self.menubar.addAction(self.wire_cutter_menu.menuAction())
 
         self.setMenuBar(self.menubar)
@@ -280,9 +314,9 @@ class MainWindow(QtWidgets.QMainWindow):
         menu.addAction("Exclude From Import", self.on_excluded_from_import_clicked)
         menu.addAction("Change Due Date Pushback", self.on_change_due_date_push_back_clicked)
         menu.addAction("Create New Cut Job", self.on_create_new_cut_job_clicked)
-        menu.addAction("Copy", self.so_table_widget.copy_selected_rows)
+        menu.addAction("Copy", self.so_table_view.copy_selected_rows)
         menu.addAction("Delete", self.on_delete_so_item_clicked)
-        menu.exec_(self.so_table_widget.mapToGlobal(pos))
+        menu.exec_(self.so_table_view.mapToGlobal(pos))
     # This line restarts the black magic.
     # fmt: on
 
@@ -290,18 +324,58 @@ class MainWindow(QtWidgets.QMainWindow):
         dialog = WireCutterEditorDialog(parent=self)
         dialog.exec_()
 
+    def schedule_cut_jobs(self):
+        """Spread the uncut items that are not on a cut job over the wire cutters."""
+        schedule = scheduler.plan()
+        if not schedule.assignments:
+            self.statusbar.showMessage("There are no uncut items to schedule.", 5000)
+            return
+
+        cutter_names = {cutter.id: cutter.name for cutter in WireCutter.find_all()}
+        detailed_text = ""
+        for cutter_id, assignments in schedule.by_cutter().items():
+            finished = schedule.finish_date(schedule.cutter_minutes[cutter_id])
+            detailed_text += f"{cutter_names[cutter_id]}: {len(assignments)} parts, finished {finished:%Y-%m-%d %H:%M}\n"
+        for job in schedule.unassigned:
+            detailed_text += f"No wire cutter can cut part id {job.part_id}\n"
+
+        message_box = ResizableMessageBox()
+        message_box.setIcon(QMessageBox.Question)
+        message_box.setWindowTitle("Schedule Uncut Items")
+        message_box.setText(f"Create cut jobs for {len(schedule.assignments)} parts?")
+        message_box.setInformativeText(
+            f"{len(schedule.late())} parts will be finished after their due date. "
+            f"All work is done by {schedule.finish_date(schedule.makespan_minutes):%Y-%m-%d}."
+        )
+        message_box.setDetailedText(detailed_text)
+        message_box.setStandardButtons(QMessageBox.Yes | QMessageBox.No)
+        message_box.exec()
+
+        if message_box.result() == QMessageBox.No:
+            return
+
+        try:
+            cut_jobs = scheduler.apply(schedule)
+        except errors.ScheduleOutdatedError as error:
+            frontend_logger.warning(f"Schedule is outdated, planning again: {error}")
+            self.statusbar.showMessage("Some items were put on a cut job meanwhile, scheduling again.", 5000)
+            self.schedule_cut_jobs()
+            return
+        self.statusbar.showMessage(f"Created {len(cut_jobs)} cut jobs.", 5000)
+        self.reload_so_table()
+
     def edit_excluded_parts(self, part: Part = None):
         """Edit the list of excluded parts."""
         dialog = ExcludedPartsEditorDialog(part=part, parent=self)
         dialog.exec_()
 
     def on_change_due_date_push_back_clicked(self):
-        selected_row = self.so_table_widget.currentRow()
+        selected_row = self.so_table_view.currentIndex().row()
         if selected_row == -1:
             return
-        part_number = self.so_table_widget.item(
+        part_number = self.so_table_model.value(
             selected_row, COLUMNS.index("Part Number")
-        ).text()
+        )
         part = Part.find_by_number(part_number)
         if not part:
             return
@@ -317,9 +391,9 @@ class MainWindow(QtWidgets.QMainWindow):
             return
         parts = []  # type: list[Part]
         for index in selected_rows:
-            part_number = self.so_table_widget.item(
+            part_number = self.so_table_model.value(
                 index, COLUMNS.index("Part Number")
-            ).text()
+            )
             part = Part.find_by_number(part_number)
             if not part or part and part in parts:
                 continue
@@ -331,10 +405,12 @@ class MainWindow(QtWidgets.QMainWindow):
             self.excluded_part_from_import(part=parts[0])
             return
 
-        for part in parts:
-            self.excluded_part_from_import(
-                part, show_message=False, skip_table_reload=True
-            )
+        part_numbers = ", ".join(part.number for part in parts)
+        frontend_logger.info(f"Adding {part_numbers} to exclude list and setting their sales order items to fully cut.")
+        total_parts, total_items = SalesOrderItem.exclude_parts_from_import(parts)
+        self.statusbar.showMessage(
+            f"Excluded {total_parts} parts and updated {total_items} sales order items.", 5000
+        )
         self.reload_so_table()
 
     def setup_statusbar(self):
@@ -374,10 +450,9 @@ class MainWindow(QtWidgets.QMainWindow):
             if ret == QMessageBox.No:
                 return
 
-        frontend_logger.info(f"Adding {part.number} to exclude list.")
-        part.set_excluded_from_import(True)
+            frontend_logger.info(f"Adding {part.number} to exclude list.")
+            part.set_excluded_from_import(True)
 
-        if show_message:
             msg = QMessageBox()
             msg.setIcon(QMessageBox.Question)
             msg.setWindowTitle("Update Sales Orders")
@@ -412,7 +487,10 @@ class MainWindow(QtWidgets.QMainWindow):
             f"Setting all sales order items for part {part.number} to fully cut."
         )
 
-        total = SalesOrderItem.set_is_cut_for_all_parts(part)
+        if show_message:
+            total = SalesOrderItem.set_is_cut_for_all_parts(part)
+        else:
+            _, total = SalesOrderItem.exclude_parts_from_import([part])
         frontend_logger.info(f"Updated {total} sales order items for {part.number}.")
         self.statusbar.showMessage(
             f"Updated {total} sales order items for {part.number}.", 5000
@@ -422,23 +500,17 @@ class MainWindow(QtWidgets.QMainWindow):
             self.reload_so_table()
 
     # fmt: off
-    def on_so_table_row_double_clicked(self, row: QtWidgets.QTableWidgetItem):
-        index = row.row()
-        so_number = self.so_table_widget.item(index, COLUMNS.index("SO Number")).text()
-        line_number = self.so_table_widget.item(index, COLUMNS.index("Line Number")).text()
+    def on_so_table_row_double_clicked(self, model_index: QtCore.QModelIndex):
+        index = model_index.row()
+        so_number = self.so_table_model.value(index, COLUMNS.index("SO Number"))
+        line_number = self.so_table_model.value(index, COLUMNS.index("Line Number"))
         sales_order_item = SalesOrderItem.find_by_so_number_line_number(so_number=so_number, line_number=line_number)
         dialog = CutJobEditorDialog(sales_order_items=[sales_order_item], parent=self)
         dialog.exec()
         self.reload_so_table()
     
     def get_selected_rows(self) -> list[int]:
-        selected_items = self.so_table_widget.selectedItems()
-        selected_rows = []
-        for item in selected_items:
-            index = item.row()
-            if index in selected_rows:
-                continue
-            selected_rows.append(index)
+        selected_rows = self.so_table_view.selected_rows()
         frontend_logger.info(f"Selected rows: {selected_rows}")
         return selected_rows
     
@@ -450,7 +522,7 @@ class MainWindow(QtWidgets.QMainWindow):
         detailed_text = "The items below will be deleted.\n\n"
 
         for index in selected_rows:
-            so_item_id = int(self.so_table_widget.item(index, COLUMNS.index("SO Item Id")).text())
+            so_item_id = self.so_table_model.value(index, COLUMNS.index("SO Item Id"))
             sales_order_item = SalesOrderItem.find_by_id(so_item_id)
             sales_order_items.append(sales_order_item)
 
@@ -467,7 +539,7 @@ class MainWindow(QtWidgets.QMainWindow):
         message_box.setIcon(QMessageBox.Warning)
         message_box.setWindowTitle("Delete SO Item")
         message_box.setText(f"Are you sure you want to delete these items?")
-        message_box.setInformativeText("All items selected will be deleted. Any linked cut jobs and parent SO items will also be removed.")
+        message_box.setInformativeText("All items selected will be deleted. Any linked cut jobs, parent SO items and their child SO items will also be removed.")
         message_box.setDetailedText(detailed_text)
         message_box.setStandardButtons(QMessageBox.Yes | QMessageBox.No)
         message_box.exec()
@@ -476,10 +548,10 @@ class MainWindow(QtWidgets.QMainWindow):
             return
 
         root_logger.warning(f"Deleting {len(sales_order_items)} SO items.")
-        
-        for soitem in sales_order_items:
-            soitem.delete()
-        
+        result = delete_sales_order_items([soitem.id for soitem in sales_order_items])
+        self.statusbar.showMessage(
+            f"Deleted {result.sales_order_items} SO items, {result.cut_job_items} cut job items and {result.sales_orders} empty sales orders.", 5000
+        )
         self.reload_so_table()
 
     def on_create_new_cut_job_clicked(self):
@@ -488,8 +560,8 @@ class MainWindow(QtWidgets.QMainWindow):
 
         sales_order_items = [] # type: list[SalesOrderItem]
         for index in selected_rows:
-            so_number = self.so_table_widget.item(index, COLUMNS.index("SO Number")).text()
-            line_number = self.so_table_widget.item(index, COLUMNS.index("Line Number")).text()
+            so_number = self.so_table_model.value(index, COLUMNS.index("SO Number"))
+            line_number = self.so_table_model.value(index, COLUMNS.index("Line Number"))
             sales_order_item = SalesOrderItem.find_by_so_number_line_number(so_number=so_number, line_number=line_number)
             sales_order_items.append(sales_order_item)
         
@@ -513,15 +585,15 @@ class MainWindow(QtWidgets.QMainWindow):
         self.view_selected_so_button.setEnabled(True)
 
     def connect_signals(self):
-        self.so_search_number_lineedit.returnPressed.connect(self.reload_so_table)
-        self.so_search_customer_name_lineedit.returnPressed.connect(
-            self.reload_so_table
-        )
-        self.so_search_part_number_lineedit.returnPressed.connect(self.reload_so_table)
-        self.so_search_parent_part_number_lineedit.returnPressed.connect(
-            self.reload_so_table
-        )
-        self.include_fully_cut_checkbox.stateChanged.connect(self.reload_so_table)
+        for lineedit in (
+            self.so_search_number_lineedit,
+            self.so_search_customer_name_lineedit,
+            self.so_search_part_number_lineedit,
+            self.so_search_parent_part_number_lineedit,
+        ):
+            lineedit.textEdited.connect(self.so_table_search.request)
+            lineedit.returnPressed.connect(self.reload_so_table)
+        self.include_fully_cut_checkbox.stateChanged.connect(self.so_table_search.request)
 
         self.so_search_number_lineedit.editingFinished.connect(
             lambda x=self.so_search_number_lineedit: utilities.clean_text_input(x)
@@ -542,17 +614,17 @@ class MainWindow(QtWidgets.QMainWindow):
         )
 
         self.so_search_button.clicked.connect(self.reload_so_table)
-        self.so_table_widget.doubleClicked.connect(self.on_so_table_row_double_clicked)
-        self.so_table_widget.selectionModel().selectionChanged.connect(
+        self.so_table_view.doubleClicked.connect(self.on_so_table_row_double_clicked)
+        self.so_table_view.selectionModel().selectionChanged.connect(
             self.on_so_table_selection_changed
         )
-        self.so_table_widget.customContextMenuRequested.connect(
+        self.so_table_view.customContextMenuRequested.connect(
             self.show_table_row_context_menu
         )
         # self.view_selected_so_button.clicked.connect(self.view_selected_so)
 
         self.due_date_range_selection.date_selection_combo_box.currentIndexChanged.connect(
-            self.reload_so_table
+            self.so_table_search.request
         )
 
     def reset_progress_bar(self):
@@ -563,155 +635,136 @@ class MainWindow(QtWidgets.QMainWindow):
     def update_fishbowl_part_data(self):
         pass
 
-    def update_fishbowl_so_data(self):
-        def set_updating_table(value: bool):
-            self.updating_table = value
+    def update_fishbowl_so_data(self, full: bool = None):
+        """Sync sales orders from Fishbowl in a separate process.
 
+        Args:
+            full (bool, optional): Force (True) or skip (False) a full reconciliation. Defaults to running one when due.
+        """
         if self.updating_table:
             frontend_logger.warning(
-                "Attempted to update Fishbowl SO data, but an update thread is already running. Ignoring request."
+                "Attempted to update Fishbowl SO data, but a sync process is already running. Ignoring request."
             )
             return
 
         self.updating_table = True
-        frontend_logger.info("Starting thread to update Fishbowl SO data.")
+        frontend_logger.info("Starting process to update Fishbowl SO data.")
 
-        fb_open_sales_orders = fishbowlorm.models.FBSalesOrder.find_all_open(
-            fishbowl_orm
-        )
+        self.sync_process = SyncProcess(full=full)
+        self.sync_errors = []
+        self.sync_process.start()
 
-        # FOR TESTING ONLY
-        # utilities.create_sales_orders_from_fishbowl_data(
-        #     session=global_session,
-        #     fishbowl_orm=fishbowl_orm,
-        #     fb_open_sales_orders=fb_open_sales_orders,
-        # )
-
-        worker = Worker(
-            fn=utilities.create_sales_orders_from_fishbowl_data,
-            fishbowl_orm=fishbowl_orm,
-            fb_open_sales_orders=fb_open_sales_orders,
-        )
-
-        worker.signals.finished.connect(self.reset_progress_bar)
-        worker.signals.finished.connect(self.enable)
-        worker.signals.finished.connect(
-            lambda: frontend_logger.debug(
-                "[TABLE RELOAD] Finished reloading data into table."
-            )
-        )
-        worker.signals.result.connect(lambda: set_updating_table(False))
-        worker.signals.result.connect(self.reload_so_table)
-        worker.signals.progress.connect(self.progressbar.setValue)
-        worker.signals.progress_data.connect(self.progressbar.setFormat)
+        self.sync_poll_timer = QtCore.QTimer(self)
+        self.sync_poll_timer.timeout.connect(self.poll_sync_process)
+        self.sync_poll_timer.start(100)
 
         self.progressbar.show()
         self.progressbar.setValue(0)
         self.dissable()
-        self.threadpool.start(worker)
+
+    def poll_sync_process(self):
+        """Apply messages from the sync process and clean up once it has finished."""
+        running = self.sync_process.is_alive()
+        for message in self.sync_process.poll():
+            kind = message[0]
+            if kind == syncservice.MESSAGE_PROGRESS:
+                self.progressbar.setValue(message[1])
+                self.progressbar.setFormat(message[2])
+            elif kind == syncservice.MESSAGE_PHASE:
+                frontend_logger.debug(f"[EXECUTION TIME] Sync phase {message[1]} took {message[2]} seconds.")
+            elif kind == syncservice.MESSAGE_DONE:
+                frontend_logger.info(f"Fishbowl sync finished: {message[1]}")
+            elif kind == syncservice.MESSAGE_ERROR:
+                frontend_logger.error(f"Fishbowl sync failed:\n{message[1]}")
+                # Shown once the process is cleaned up, a modal dialog here would re-enter this poll.
+                self.sync_errors.append(message[1])
+        if running:
+            return
+
+        self.sync_poll_timer.stop()
+        exitcode = self.sync_process.exitcode
+        errors = self.sync_errors
+        frontend_logger.debug(f"Sync process exited with code {exitcode}.")
+        self.sync_process = None
+        self.sync_errors = []
+        self.updating_table = False
+        self.reset_progress_bar()
+        self.enable()
+        global_session.expire_all() # Rows were changed by the sync process.
+        self.reload_so_table()
+        frontend_logger.debug("[TABLE RELOAD] Finished reloading data into table.")
+
+        if not errors and exitcode != 0:
+            frontend_logger.error(f"Sync process exited with code {exitcode} without reporting an error.")
+            errors = [f"The sync process exited with code {exitcode} without reporting an error."]
+        if errors:
+            message_box = ResizableMessageBox()
+            message_box.setIcon(QMessageBox.Critical)
+            message_box.setWindowTitle("Fishbowl Sync")
+            message_box.setText("Syncing sales orders from Fishbowl failed.")
+            message_box.setDetailedText("\n\n".join(errors))
+            message_box.exec()
 
     def get_so_table_search_criteria(self) -> SalesOrderSearchCriteria:
-        return SalesOrderSearchCriteria(
+        due_date_range = self.due_date_range_selection.get_selected_date_range()
+        criteria = SalesOrderSearchCriteria(
             so_number=self.so_search_number_lineedit.text(),
             customer_name=self.so_search_customer_name_lineedit.text(),
             part_number=self.so_search_part_number_lineedit.text(),
             parent_part_number=self.so_search_parent_part_number_lineedit.text(),
             show_fully_cut=self.include_fully_cut_checkbox.isChecked(),
-            due_date_range=self.due_date_range_selection.get_selected_date_range(),
         )
+        if due_date_range.text != DateRange.all().text:
+            criteria.due_date_start = due_date_range.start.toPyDate()
+            criteria.due_date_end = due_date_range.end.toPyDate()
+        # The row number column has no field of its own, it follows the default order.
+        if self.so_table_model.sort_column > 0:
+            criteria.sort_by = SO_TABLE_SORT_FIELDS[self.so_table_model.sort_column]
+        if self.so_table_model.sort_column >= 0:
+            criteria.descending = self.so_table_model.sort_order == Qt.DescendingOrder
+        return criteria
+
+    def on_data_changed(self, table: str):
+        """Refresh the table, debounced like a search edit, after a change to the rows it shows."""
+        if table in ("sales_order_item", "cut_job_item"):
+            self.so_table_search.request()
 
     def reload_so_table(self):
-        search_criteria = self.get_so_table_search_criteria()
-        self.so_table_widget.setRowCount(0)
-        so_open_status = SalesOrderStatus.find_by_name("In Progress")
-        query = (
-            global_session.query(SalesOrder, Customer, SalesOrderItem, Part)
-            .join(Customer)
-            .join(SalesOrderItem)
-            .join(Part)
-        )
-
-        query = query.filter(
-            SalesOrderItem.quantity_to_fulfill
-            - SalesOrderItem.quantity_fulfilled
-            - SalesOrderItem.quantity_picked
-            > 0
-        )
-
-        query = query.filter(SalesOrder.status_id <= so_open_status.id)
-        query = query.filter(Part.excluded_from_import == False)
-
-        if not search_criteria.show_fully_cut:
-            query = query.filter(SalesOrderItem.is_cut == False)
-
-        if search_criteria.so_number != "":
-            query = query.filter(SalesOrder.number.contains(search_criteria.so_number))
-
-        if search_criteria.customer_name != "":
-            query = query.filter(Customer.name.contains(search_criteria.customer_name))
-
-        if search_criteria.part_number != "":
-            query = query.filter(Part.number.contains(search_criteria.part_number))
-
-        if search_criteria.parent_part_number != "":
-            parent_part = (
-                global_session.query(Part)
-                .filter(Part.number == search_criteria.parent_part_number)
-                .first()
-            )
-            if parent_part is not None:
-                part_ids = [parent_part.id]
-                part_ids.extend([child.id for child in parent_part.children])
-                query = query.filter(Part.id.in_(part_ids))
-
-        if search_criteria.due_date_range.text != DateRange.all().text:
-            query = query.filter(
-                SalesOrderItem.date_scheduled_fulfillment
-                >= search_criteria.due_date_range.start.toPyDate()
-            )
-            query = query.filter(
-                SalesOrderItem.date_scheduled_fulfillment
-                <= search_criteria.due_date_range.end.toPyDate()
-            )
-
-        query = query.order_by(SalesOrderItem.date_scheduled_fulfillment)
-
-        results = query.all()  # type: list[tuple[SalesOrder, Customer, SalesOrderItem, Part]]
-
-        data = []
-        index = 1
-        total_rows = len(results)
-        id_row_max_chars = len(str(total_rows))
-        for sales_order, customer, sales_order_item, part in results:
-            index_string = str(index)
-            index_string = utilities.pad_string(index_string, id_row_max_chars)
-
-            # fmt: off
-            data.append(
-                [
-                    index_string,
-                    str(sales_order_item.id),
-                    sales_order_item.date_scheduled_fulfillment.strftime(DATE_FORMAT),
-                    sales_order_item.pushed_back_due_date.strftime(DATE_FORMAT),
-                    customer.name_converted,
-                    sales_order.number,
-                    sales_order_item.line_number,
-                    part.number,
-                    part.description,
-                    str(int(sales_order_item.quantity_left_to_fulfill)),
-                    sales_order_item.has_cut_job_item_string,
-                    sales_order_item.fully_cut,
-                    sales_order_item.parent_item.part.number if sales_order_item.parent_item_id != None else "",
-                    sales_order_item.parent_item.part.description if sales_order_item.parent_item_id != None else "",
-                ]
-            )
-            index += 1
-            # fmt: on
-
-        for row in data:
-            self.so_table_widget.insert_row_data(row)
-
-        self.so_table_widget.resizeColumnsToContents()
+        """Search again right away. The table is refreshed when the background query finishes."""
+        self.so_table_search.request_now()
+
+    def show_so_table_results(self, result: tuple[SalesOrderSearchCriteria, tuple[list[salesordertable.SalesOrderTableRow], salesordertable.PageCursor]]):
+        """Swap the first page of a finished search into the table."""
+        criteria, (rows, cursor) = result
+
+        def load_page(cursor: salesordertable.PageCursor, limit: int) -> tuple[list[list], salesordertable.PageCursor]:
+            first_number = self.so_table_model.rowCount() + 1
+            rows, cursor = salesordertable.read_page(criteria, after=cursor, limit=limit)
+            return [so_table_row(first_number + index, row) for index, row in enumerate(rows)], cursor
+
+        first_page = [so_table_row(index + 1, row) for index, row in enumerate(rows)]
+        self.so_table_model.set_page_loader(load_page, first_page=(first_page, cursor))
+        self.so_table_view.resizeColumnsToContents()
+
+
+def so_table_row(number: int, row: salesordertable.SalesOrderTableRow) -> list:
+    """Returns the values shown in the sales order table for one row, in COLUMNS order."""
+    return [
+        number,
+        row.id,
+        row.date_scheduled_fulfillment,
+        row.pushed_back_due_date,
+        row.customer_name,
+        row.so_number,
+        row.line_number,
+        row.part_number,
+        row.part_description,
+        int(row.quantity_left_to_fulfill),
+        "Yes" if row.has_cut_job else "No",
+        "Yes" if row.is_cut else "No",
+        row.parent_part_number,
+        row.parent_part_description,
+    ]
 
 
 def show_new_release_dialog(version: str, html_url: str):
@@ -772,6 +825,7 @@ def main():
 
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support() # Needed by the sync process in frozen builds.
     root_logger.info("=" * 80)
     root_logger.info("Starting {} version {}".format(PROGRAM_NAME, PROGRAM_VERSION))
     if DEBUG:
@@ -0,0 +1,318 @@
+"""In-process change bus for cut jobs and sales order items.
+
+Commits made in this process publish a ChangeEvent per changed table as soon as they
+land, with the ids of the rows changed through the ORM (see database.changes). Set
+based statements publish the table without ids, meaning "reload it". Changes made by other
+processes, e.g. the Fishbowl sync or another API worker, are picked up by a
+DatabasePoller, which publishes the ids of the rows whose date_modified moved.
+
+Subscribers either get a queue to read from (the API's event stream) or a callback
+run on the publishing thread (the desktop window). Recent events are kept so a client
+that reconnects with the last event id it saw gets what it missed. A subscriber that
+falls too far behind is flagged as overflowed and should reload everything.
+"""
+from __future__ import annotations
+import datetime
+import json
+import logging
+import queue
+import threading
+from collections import deque
+from dataclasses import asdict, dataclass, field
+from typing import Callable
+from sqlalchemy import func
+from cutlistgenerator.database import Session, changes, session_type_hint
+from cutlistgenerator.database.models.cutjob import CutJob, CutJobItem
+from cutlistgenerator.database.models.salesorder import SalesOrderItem
+from cutlistgenerator.responsecache import ResponseCache
+from cutlistgenerator.settings import (
+    CHANGE_BUS_HISTORY,
+    CHANGE_BUS_QUEUE_SIZE,
+    CHANGE_POLL_MAX_IDS,
+    CHANGE_POLL_SECONDS,
+)
+
+backend_logger = logging.getLogger("backend")
+
+WATCHED_MODELS = [CutJob, CutJobItem, SalesOrderItem]
+WATCHED_TABLES = {model.__tablename__ for model in WATCHED_MODELS}
+
+
+@dataclass
+class ChangeEvent:
+    id: int
+    table: str
+    action: str
+    """One of insert, update or delete."""
+    ids: list[int] = None
+    """Ids of the changed rows, None if they are not known and the table should be reloaded."""
+    source: str = "local"
+    """local for commits in this process, database for changes seen by the poller."""
+    date: str = field(default_factory=lambda: datetime.datetime.now().isoformat())
+
+    def to_sse(self) -> str:
+        """Returns the event in Server-Sent Events format."""
+        return f"id: {self.id}\nevent: change\ndata: {json.dumps(asdict(self))}\n\n"
+
+
+class Subscription:
+    """Queue of the events published after subscribing."""
+
+    def __init__(self, bus: ChangeBus, tables: set[str] = None, queue_size: int = CHANGE_BUS_QUEUE_SIZE) -> None:
+        self.bus = bus
+        self.tables = tables
+        self.overflowed = False
+        """Set when events were dropped because the subscriber fell behind."""
+        self._queue = queue.Queue(maxsize=queue_size)  # type: queue.Queue[ChangeEvent]
+
+    def put(self, change: ChangeEvent) -> None:
+        if self.tables is not None and change.table not in self.tables:
+            return
+        try:
+            self._queue.put_nowait(change)
+        except queue.Full:
+            self.overflowed = True
+
+    def get(self, timeout: float = None) -> ChangeEvent:
+        """Returns the next event, or None if there was none within timeout seconds."""
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def reset(self) -> None:
+        """Drop every queued event and clear overflowed, after the subscriber reloaded everything."""
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                break
+        self.overflowed = False
+
+    def close(self) -> None:
+        self.bus.unsubscribe(self)
+
+    def __enter__(self) -> Subscription:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class ChangeBus:
+    """Thread safe publish and subscribe of ChangeEvents within one process."""
+
+    def __init__(self, history_size: int = CHANGE_BUS_HISTORY) -> None:
+        self._lock = threading.Lock()
+        self._next_id = 1
+        self._history = deque(maxlen=history_size)  # type: deque[ChangeEvent]
+        self._subscriptions = set()  # type: set[Subscription]
+        self._listeners = []  # type: list[Callable[[ChangeEvent], None]]
+        self._poller = None  # type: DatabasePoller
+
+    def publish(self, table: str, action: str, ids: list[int] = None, source: str = "local") -> ChangeEvent:
+        with self._lock:
+            change = ChangeEvent(self._next_id, table, action, ids, source)
+            self._next_id += 1
+            self._history.append(change)
+            subscriptions = list(self._subscriptions)
+            listeners = list(self._listeners)
+            poller = self._poller
+        for subscription in subscriptions:
+            subscription.put(change)
+        for listener in listeners:
+            try:
+                listener(change)
+            except Exception:
+                backend_logger.exception(f"Change listener {listener} failed:\n")
+        if poller is not None and source == "local":
+            poller.note_local(table, action, ids)
+        return change
+
+    def subscribe(self, last_event_id: int = None, tables: set[str] = None) -> Subscription:
+        """Returns a subscription to the events published from now on.
+
+        Args:
+            last_event_id (int, optional): Id of the last event the subscriber saw. The events after it
+                are queued first, or the subscription starts overflowed if they are no longer kept.
+                Defaults to only new events.
+            tables (set[str], optional): Only events for these tables. Defaults to every table.
+        """
+        subscription = Subscription(self, tables)
+        with self._lock:
+            self._subscriptions.add(subscription)
+            if last_event_id is None:
+                return subscription
+            oldest = self._history[0].id if self._history else self._next_id
+            if last_event_id >= self._next_id or last_event_id < oldest - 1:
+                # From another process or too long ago, the subscriber has to reload.
+                subscription.overflowed = True
+                return subscription
+            for change in self._history:
+                if change.id > last_event_id:
+                    subscription.put(change)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def add_listener(self, listener: Callable[[ChangeEvent], None]) -> None:
+        """Call listener with every event, on the thread that publishes it."""
+        with self._lock:
+            if listener not in self._listeners:
+                self._listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[[ChangeEvent], None]) -> None:
+        with self._lock:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+    def start_polling(self, interval: float = CHANGE_POLL_SECONDS) -> DatabasePoller:
+        """Start watching the database for changes made by other processes, once per bus."""
+        with self._lock:
+            if self._poller is None or not self._poller.is_alive():
+                self._poller = DatabasePoller(self, interval)
+                self._poller.start()
+            return self._poller
+
+    def stop_polling(self) -> None:
+        with self._lock:
+            poller, self._poller = self._poller, None
+        if poller is not None:
+            poller.stop()
+
+
+@dataclass
+class TableCursor:
+    """What the poller has seen of one table."""
+
+    since: datetime.datetime
+    """Newest date_modified seen, None while the table was empty."""
+    seen: set[int]
+    """Ids of the rows modified at since, which were already published."""
+    count: int
+    local: set[int] = field(default_factory=set)
+    """Ids of rows this process changed, not to be published again."""
+    local_inserts: set[int] = field(default_factory=set)
+    local_deletes: set[int] = field(default_factory=set)
+
+
+class DatabasePoller(threading.Thread):
+    """Publishes the rows of the watched tables changed by other processes.
+
+    Every poll reads MAX(date_modified) and COUNT(*) of the tables in one round trip. For
+    a table where either moved, the ids of the rows modified since the last poll are read
+    and published as inserts or updates, up to CHANGE_POLL_MAX_IDS. A count lower than
+    expected means rows were deleted, which is published without ids.
+
+    Changes this process committed were already published by the bus. Their ids are
+    skipped, and after a set based statement the table's cursor is moved to the
+    current state instead, as its event already told clients to reload the table.
+    """
+
+    def __init__(self, bus: ChangeBus, interval: float = CHANGE_POLL_SECONDS) -> None:
+        super().__init__(name="Change Poller", daemon=True)
+        self.bus = bus
+        self.interval = interval
+        self._stopped = threading.Event()
+        self._lock = threading.Lock()
+        self._cursors = {}  # type: dict[str, TableCursor]
+
+    def stop(self) -> None:
+        self._stopped.set()
+
+    @staticmethod
+    def read_cursor(session: session_type_hint, model, count: int) -> TableCursor:
+        since = session.query(func.max(model.date_modified)).scalar()
+        seen = {id for id, in session.query(model.id).filter(model.date_modified == since)}
+        return TableCursor(since, seen, count)
+
+    def note_local(self, table: str, action: str, ids: list[int] = None) -> None:
+        """Record a change this process published, so the poller does not publish it again."""
+        with self._lock:
+            cursor = self._cursors.get(table)
+            if cursor is None:
+                return
+            if ids is not None:
+                cursor.local.update(ids)
+                if action == "insert":
+                    cursor.local_inserts.update(ids)
+                elif action == "delete":
+                    cursor.local_deletes.update(ids)
+                return
+            model = next(model for model in WATCHED_MODELS if model.__tablename__ == table)
+            with Session() as session:
+                count = session.query(func.count()).select_from(model).scalar()
+                self._cursors[table] = self.read_cursor(session, model, count)
+
+    def poll_table(self, session: session_type_hint, model, cursor: TableCursor, count: int) -> TableCursor:
+        """Publish the changes to one table since cursor. Returns the new cursor."""
+        table = model.__tablename__
+        query = session.query(model.id, model.date_created, model.date_modified)
+        if cursor.since is not None:
+            query = query.filter(model.date_modified >= cursor.since)
+        rows = [
+            row
+            for row in query.order_by(model.date_modified, model.id).limit(CHANGE_POLL_MAX_IDS + len(cursor.seen) + 1)
+            if row.date_modified != cursor.since or row.id not in cursor.seen
+        ]
+        if len(rows) > CHANGE_POLL_MAX_IDS:
+            self.bus.publish(table, "update", source="database")
+            return self.read_cursor(session, model, count)
+
+        inserted = [row.id for row in rows if cursor.since is None or row.date_created >= cursor.since]
+        updated = [row.id for row in rows if cursor.since is not None and row.date_created < cursor.since]
+        for action, ids in (("insert", inserted), ("update", updated)):
+            ids = [id for id in ids if id not in cursor.local]
+            if ids:
+                self.bus.publish(table, action, ids, source="database")
+        added = len(cursor.local_inserts.union(inserted))
+        missing = cursor.count + added - len(cursor.local_deletes) - count
+        if missing > 0:
+            self.bus.publish(table, "delete", source="database")
+        elif missing < 0:
+            # Rows added without a new date_modified, e.g. copied in with their old dates.
+            self.bus.publish(table, "insert", source="database")
+
+        if not rows:
+            return TableCursor(cursor.since, cursor.seen, count)
+        since = rows[-1].date_modified
+        seen = {row.id for row in rows if row.date_modified == since}
+        if since == cursor.since:
+            seen |= cursor.seen
+        return TableCursor(since, seen, count)
+
+    def poll(self, versions: list[tuple]) -> list[tuple]:
+        """Publish the changes since versions. Returns the current versions."""
+        with self._lock, Session() as session:
+            current = ResponseCache.table_versions(WATCHED_MODELS, session)
+            for model, before, after in zip(WATCHED_MODELS, versions or [None] * len(WATCHED_MODELS), current):
+                table = model.__tablename__
+                cursor = self._cursors.get(table)
+                if cursor is None:
+                    self._cursors[table] = self.read_cursor(session, model, after[1])
+                elif before != after or cursor.local or cursor.local_deletes:
+                    self._cursors[table] = self.poll_table(session, model, cursor, after[1])
+        return current
+
+    def run(self) -> None:
+        versions = None
+        while not self._stopped.is_set():
+            try:
+                versions = self.poll(versions)
+            except Exception:
+                backend_logger.exception("Polling for changes failed:\n")
+            self._stopped.wait(self.interval)
+
+
+change_bus = ChangeBus()
+
+
+def publish_committed_changes(committed: changes.Changes) -> None:
+    for (table, action), ids in committed.items():
+        if table in WATCHED_TABLES:
+            change_bus.publish(table, action, None if ids is None else sorted(ids))
+
+
+changes.add_commit_listener(publish_committed_changes)
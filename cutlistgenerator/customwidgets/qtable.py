@@ -1,6 +1,9 @@
 from __future__ import annotations
+import datetime
 import json
+from typing import Any, Callable
 from PyQt5 import QtCore, QtWidgets, QtGui
+from cutlistgenerator.settings import DATE_FORMAT
 
 
 class CustomQTableWidget(QtWidgets.QTableWidget):
@@ -131,3 +134,227 @@ class CustomQTableWidget(QtWidgets.QTableWidget):
 
         json_data = json.dumps(row_data, indent=4, sort_keys=True)
         clipboard.setText(json_data)
+
+
+PageLoader = Callable[[Any, int], "tuple[list[list], Any]"]
+"""Called with (cursor, limit), returns (rows, cursor for the next page)."""
+
+
+class PagedTableModel(QtCore.QAbstractTableModel):
+    """Read only table model that pulls its rows a page at a time.
+
+    Rows hold raw values and are converted to text when displayed. Sorting is left to the
+    page loader's query, see sort. Pages stay loaded once read, so memory grows with how
+    far the user scrolls, not with the size of the whole result.
+    """
+
+    sort_requested = QtCore.pyqtSignal(int, object)
+    """Emitted with (column, Qt.SortOrder) when the view asks for a new order."""
+
+    def __init__(self, headers: list[str], page_size: int = 200, parent=None):
+        super().__init__(parent)
+        self.headers = headers
+        self.page_size = page_size
+        self.rows = []  # type: list[list]
+        self.page_loader = None  # type: PageLoader
+        self.cursor = None
+        self.more_rows = False
+        self.sort_column = -1
+        self.sort_order = QtCore.Qt.AscendingOrder
+
+    def set_page_loader(self, page_loader: PageLoader, first_page: tuple[list[list], Any] = None):
+        """Replace the rows with ones read from page_loader.
+
+        Args:
+            page_loader (PageLoader): Reads the following pages.
+            first_page (tuple[list[list], Any], optional): (rows, cursor) already read, swapped in
+                with a single model reset. Defaults to reading the first page now.
+        """
+        if first_page is None:
+            first_page = page_loader(None, self.page_size)
+        rows, cursor = first_page
+        self.beginResetModel()
+        self.rows = list(rows)
+        self.page_loader = page_loader
+        self.cursor = cursor
+        self.more_rows = len(self.rows) == self.page_size
+        self.endResetModel()
+
+    def rowCount(self, parent=QtCore.QModelIndex()) -> int:
+        if parent.isValid():
+            return 0
+        return len(self.rows)
+
+    def columnCount(self, parent=QtCore.QModelIndex()) -> int:
+        if parent.isValid():
+            return 0
+        return len(self.headers)
+
+    def headerData(self, section: int, orientation, role=QtCore.Qt.DisplayRole):
+        if role == QtCore.Qt.DisplayRole and orientation == QtCore.Qt.Horizontal:
+            return self.headers[section]
+        return None
+
+    def data(self, index: QtCore.QModelIndex, role=QtCore.Qt.DisplayRole):
+        if not index.isValid() or role != QtCore.Qt.DisplayRole:
+            return None
+        return self.text(index.row(), index.column())
+
+    def value(self, row: int, column: int):
+        """Returns the raw value of a cell."""
+        return self.rows[row][column]
+
+    def text(self, row: int, column: int) -> str:
+        """Returns the displayed text of a cell."""
+        value = self.rows[row][column]
+        if value is None:
+            return ""
+        if isinstance(value, (datetime.date, datetime.datetime)):
+            return value.strftime(DATE_FORMAT)
+        return str(value)
+
+    def canFetchMore(self, parent=QtCore.QModelIndex()) -> bool:
+        if parent.isValid():
+            return False
+        return self.more_rows
+
+    def fetchMore(self, parent=QtCore.QModelIndex()):
+        if parent.isValid() or not self.more_rows:
+            return
+        rows, cursor = self.page_loader(self.cursor, self.page_size)
+        self.more_rows = len(rows) == self.page_size
+        if not rows:
+            return
+        self.cursor = cursor
+        self.beginInsertRows(QtCore.QModelIndex(), len(self.rows), len(self.rows) + len(rows) - 1)
+        self.rows.extend(rows)
+        self.endInsertRows()
+
+    def sort(self, column: int, order=QtCore.Qt.AscendingOrder):
+        """Ask the owner to read the rows again ordered by column.
+
+        The rows are not sorted here, that would need every page in memory. The owner
+        reruns its query in the new order and passes the new pages to set_page_loader.
+        """
+        self.sort_column = column
+        self.sort_order = order
+        self.sort_requested.emit(column, order)
+
+
+class CustomQTableView(QtWidgets.QTableView):
+    """QTableView counterpart of CustomQTableWidget for use with PagedTableModel."""
+
+    column_visibility_changed = QtCore.pyqtSignal(int, bool)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.header_context_menu = None  # type: QtWidgets.QMenu
+
+        self.mouse_over_column = (
+            -1
+        )  # -1 means no column is currently being hovered over
+
+        self.setShowGrid(True)
+        self.setAlternatingRowColors(True)
+        self.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
+        self.setSelectionBehavior(QtWidgets.QAbstractItemView.SelectRows)
+        self.setSelectionMode(QtWidgets.QAbstractItemView.ExtendedSelection)
+
+        self.setContextMenuPolicy(QtCore.Qt.CustomContextMenu)
+        self.horizontalHeader().setContextMenuPolicy(QtCore.Qt.CustomContextMenu)
+        self.horizontalHeader().customContextMenuRequested.connect(
+            self.show_header_context_menu
+        )
+        self.horizontalHeader().setDefaultSectionSize(75)
+        self.horizontalHeader().setSortIndicatorShown(True)
+        self.horizontalHeader().setSortIndicator(-1, QtCore.Qt.AscendingOrder)
+        self.horizontalHeader().sortIndicatorChanged.connect(self.sort_table)
+        self.horizontalHeader().setStretchLastSection(True)
+        self.verticalHeader().setVisible(False)
+        self.verticalHeader().setStretchLastSection(False)
+        self.setWordWrap(False)
+
+        font = QtGui.QFont()
+        font.setBold(True)
+        self.horizontalHeader().setFont(font)
+
+    def setModel(self, model: QtCore.QAbstractItemModel):
+        super().setModel(model)
+        self.header_context_menu = self.set_header_context_menu()
+
+    def header_text(self, column: int) -> str:
+        return self.model().headerData(column, QtCore.Qt.Horizontal)
+
+    def sort_table(self, column: int, order):
+        if column < 0:
+            return
+        self.model().sort(column, order)
+
+    def toggle_column(self, checked):
+        action = self.sender()
+        header_text = action.text()
+
+        for column in range(self.model().columnCount()):
+            if self.header_text(column) != header_text:
+                continue
+
+            self.setColumnHidden(column, not checked)
+            # emit a signal on the column visibility change
+            self.column_visibility_changed.emit(column, checked)
+
+    def set_header_context_menu(self) -> QtWidgets.QMenu:
+        menu = QtWidgets.QMenu()
+
+        menu.addSeparator()
+
+        for column in range(self.model().columnCount()):
+            action = QtWidgets.QAction(self.header_text(column), self)
+            action.setCheckable(True)
+            action.setChecked(True)
+            action.toggled.connect(self.toggle_column)
+            menu.addAction(action)
+
+        menu.addSeparator()
+
+        menu.addAction("Auto Resize This Column", self.resize_current_column)
+        menu.addAction("Auto Resize All Columns", self.resize_all_columns)
+        return menu
+
+    def show_header_context_menu(self, pos):
+        header = self.horizontalHeader()
+        self.mouse_over_column = header.logicalIndexAt(pos)
+        point = header.mapToGlobal(pos)
+        self.header_context_menu.exec_(point)
+
+    def resize_current_column(self):
+        current_column = self.mouse_over_column
+        self.resizeColumnToContents(current_column)
+
+    def resize_all_columns(self):
+        for column in range(self.model().columnCount()):
+            self.resizeColumnToContents(column)
+
+    def selected_rows(self) -> list[int]:
+        """Returns the selected row numbers in ascending order."""
+        return sorted(index.row() for index in self.selectionModel().selectedRows())
+
+    def copy_selected_rows(self):
+        rows = self.selected_rows()
+        if not rows:
+            return
+        model = self.model()
+        column_headers = [
+            self.header_text(i) for i in range(model.columnCount())
+        ]
+        clipboard = QtWidgets.QApplication.clipboard()
+        clipboard.clear()
+
+        row_data = []  # type: list[list[dict[str, str]]]
+        for row in rows:
+            data = []  # type: list[dict[str, str]]
+            for index, column_header in enumerate(column_headers):
+                data.append({column_header: model.text(row, index)})
+            row_data.append(data)
+
+        json_data = json.dumps(row_data, indent=4, sort_keys=True)
+        clipboard.setText(json_data)
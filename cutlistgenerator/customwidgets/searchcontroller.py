@@ -0,0 +1,93 @@
+from __future__ import annotations
+import logging
+import traceback
+from typing import Any, Callable
+from PyQt5 import QtCore
+
+frontend_logger = logging.getLogger("frontend")
+
+
+class SearchSignals(QtCore.QObject):
+    result = QtCore.pyqtSignal(int, object)
+    error = QtCore.pyqtSignal(int, str)
+
+
+class SearchRunnable(QtCore.QRunnable):
+    """Runs one search on the thread pool and reports back with its generation."""
+
+    def __init__(self, generation: int, run: Callable[[Any], Any], request: Any):
+        super().__init__()
+        self.generation = generation
+        self.run_search = run
+        self.request = request
+        self.signals = SearchSignals()
+
+    @QtCore.pyqtSlot()
+    def run(self):
+        try:
+            result = self.run_search(self.request)
+        except Exception:
+            self.signals.error.emit(self.generation, traceback.format_exc())
+            return
+        self.signals.result.emit(self.generation, result)
+
+
+class SearchController(QtCore.QObject):
+    """Debounces search requests and runs them off the GUI thread.
+
+    prepare is called on the GUI thread when the search starts and its return value is
+    passed to run on a pool thread. run must not touch the GUI or global_session.
+    apply is called on the GUI thread with the result, but only for the newest search;
+    results of searches superseded while they were running are dropped.
+    """
+
+    failed = QtCore.pyqtSignal(str)
+
+    def __init__(
+        self,
+        prepare: Callable[[], Any],
+        run: Callable[[Any], Any],
+        apply: Callable[[Any], None],
+        delay_ms: int = 300,
+        parent: QtCore.QObject = None,
+    ):
+        super().__init__(parent)
+        self.prepare = prepare
+        self.run = run
+        self.apply = apply
+        self.generation = 0
+        self.threadpool = QtCore.QThreadPool(self)
+        self.threadpool.setMaxThreadCount(2)
+
+        self.timer = QtCore.QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(delay_ms)
+        self.timer.timeout.connect(self.start)
+
+    def request(self):
+        """Start a search once input has been quiet for the debounce delay."""
+        self.timer.start()
+
+    def request_now(self):
+        """Start a search right away."""
+        self.timer.stop()
+        self.start()
+
+    def start(self):
+        self.generation += 1
+        runnable = SearchRunnable(self.generation, self.run, self.prepare())
+        runnable.signals.result.connect(self.on_result)
+        runnable.signals.error.connect(self.on_error)
+        self.threadpool.start(runnable)
+
+    def on_result(self, generation: int, result: Any):
+        if generation != self.generation:
+            frontend_logger.debug(f"Dropping results of superseded search {generation}.")
+            return
+        self.apply(result)
+
+    def on_error(self, generation: int, message: str):
+        if generation != self.generation:
+            return
+        frontend_logger.error(f"Search failed:\n{message}")
+        self.failed.emit(message)
@@ -3,15 +3,22 @@ from distutils import log
 import sqlalchemy
 import datetime
 import logging
+import threading
+from contextlib import contextmanager
+from typing import Iterator
 from sqlalchemy import create_engine
-from sqlalchemy import Column, Integer, DateTime, String
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import Column, Integer, DateTime, Index, String
+from sqlalchemy.orm import scoped_session, sessionmaker
 from sqlalchemy.orm.session import Session as session_type_hint
 from sqlalchemy.ext.declarative import declarative_base
 
 from cutlistgenerator import (
     DATABASE_URL_WITH_SCHEMA,
     DATABASE_URL_WITHOUT_SCHEMA,
+    DATABASE_MAX_OVERFLOW,
+    DATABASE_POOL_PRE_PING,
+    DATABASE_POOL_RECYCLE_SECONDS,
+    DATABASE_POOL_SIZE,
     SCHEMA_NAME,
     SCHEMA_CREATE,
 )
@@ -27,10 +34,26 @@ if not log_started:
     log_started = True
 
 
-engine = create_engine(DATABASE_URL_WITH_SCHEMA, isolation_level="READ COMMITTED")
+def create_database_engine(
+    pool_size: int = DATABASE_POOL_SIZE, max_overflow: int = DATABASE_MAX_OVERFLOW
+) -> sqlalchemy.engine.Engine:
+    """Returns a new engine for the local database using the configured pool settings."""
+    return create_engine(
+        DATABASE_URL_WITH_SCHEMA,
+        isolation_level="READ COMMITTED",
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_pre_ping=DATABASE_POOL_PRE_PING,
+        pool_recycle=DATABASE_POOL_RECYCLE_SECONDS,
+    )
+
+
+engine = create_database_engine()
 # type: sqlalchemy.orm.session.sessionmaker
 Session = sessionmaker(bind=engine)
-global_session = Session()  # type: session_type_hint
+# Each thread gets its own session. Threads that finish a unit of work (e.g. a request) should call global_session.remove().
+global_session = scoped_session(Session)  # type: session_type_hint
+UNIT_OF_WORK_DEPTH = "unit_of_work_depth"
 DeclarativeBase = declarative_base(
     bind=engine
 )  # type: sqlalchemy.ext.declarative.api.DeclarativeMeta
@@ -78,6 +101,87 @@ class Type_(Base):
         return f'<{self.__class__.name}(id={self.id}, name="{self.name}")>'
 
 
+def fulltext_index(table_name: str, column_name: str) -> Index:
+    """Returns a MySQL FULLTEXT index using the ngram parser, so substring searches on the column can use it.
+
+    It has to be created through migrations.ddl_connection, which builds it without stopwords.
+    """
+    return Index(
+        f"ft_{table_name}_{column_name}_nostop",
+        column_name,
+        mysql_prefix="FULLTEXT",
+        mysql_with_parser="ngram",
+    )
+
+
+def resize_pool(pool_size: int, max_overflow: int = DATABASE_MAX_OVERFLOW) -> None:
+    """Swap the engine for one whose pool holds pool_size connections.
+
+    Used by servers that size the pool to their thread count, at startup. It must be
+    called from the main thread before any other thread uses the database: only the
+    calling thread's global_session is removed, sessions open in other threads stay
+    bound to the old engine, and so does any module that imported engine by name.
+    The old engine's idle connections are closed.
+
+    Args:
+        pool_size (int): Connections kept in the pool.
+        max_overflow (int, optional): Extra connections allowed under load. Defaults to the Database setting.
+
+    Raises:
+        RuntimeError: If called from any thread but the main thread.
+    """
+    if threading.current_thread() is not threading.main_thread():
+        raise RuntimeError("resize_pool must be called from the main thread, before other threads use the database.")
+    global engine
+    old_engine = engine
+    engine = create_database_engine(pool_size=pool_size, max_overflow=max_overflow)
+    Session.configure(bind=engine)
+    DeclarativeBase.metadata.bind = engine
+    global_session.remove()
+    old_engine.dispose()
+    backend_logger.info(f"Database pool resized to {pool_size} connections (+{max_overflow} overflow).")
+
+
+@contextmanager
+def unit_of_work(session: session_type_hint = None) -> Iterator[session_type_hint]:
+    """Group every change made inside the block into one transaction.
+
+    Model helpers that normally commit only flush while a unit of work is open on their
+    session. The block commits once when it exits and rolls everything back if it raises.
+    Units of work can be nested, only the outermost one commits.
+
+    Args:
+        session (Session, optional): Session to use for this operation. Defaults to Global Session.
+
+    Yields:
+        Session: The session the unit of work is running on.
+    """
+    if not session:
+        session = global_session
+    depth = session.info.get(UNIT_OF_WORK_DEPTH, 0)
+    session.info[UNIT_OF_WORK_DEPTH] = depth + 1
+    try:
+        yield session
+        if depth == 0:
+            session.commit()
+    except Exception:
+        if depth == 0:
+            session.rollback()
+        raise
+    finally:
+        session.info[UNIT_OF_WORK_DEPTH] = depth
+
+
+def commit(session: session_type_hint = None) -> None:
+    """Commit the session, or only flush it while a unit_of_work is open on it."""
+    if not session:
+        session = global_session
+    if session.info.get(UNIT_OF_WORK_DEPTH, 0):
+        session.flush()
+    else:
+        session.commit()
+
+
 def create_schema() -> None:
     """Create the database schema."""
     backend_logger.info(f"Creating schema [{SCHEMA_NAME}].")
@@ -97,7 +201,10 @@ def delete_schema() -> None:
 def create_tables(session: session_type_hint) -> None:
     """Check if tables exist and create them if not."""
     backend_logger.info("Creating tables.")
-    Base.metadata.create_all(bind=session.get_bind())
+    with ddl_connection(session.get_bind()) as connection:
+        Base.metadata.create_all(bind=connection)
+    migrate_indexes(session)
+    backfill_summary(session)
 
 
 def disable_foreign_key_checks(session: session_type_hint) -> None:
@@ -129,6 +236,9 @@ from .models.salesorder import (
 from .models.cutjob import CutJobStatus, CutJobItemStatus
 from .models.wirecutter import WireSize, WireCutter
 from .models.systemproperty import SystemProperty
+from .cache import lookup_cache
+from .migrations import ddl_connection, migrate_indexes
+from .cuthistory import backfill_summary
 
 
 def create_default_data() -> None:
@@ -156,6 +266,8 @@ def create(force_recreate: bool = False) -> None:
                 delete_tabels(session)
             create_tables(session)
             create_default_data()
+            lookup_cache.invalidate()
+            lookup_cache.load()
         except sqlalchemy.exc.OperationalError as error:
             if error.orig.args[0] == 1049:  # Unknown database
                 backend_logger.info(
@@ -0,0 +1,109 @@
+from __future__ import annotations
+import logging
+import threading
+from cutlistgenerator.database import Session, Status, Type_, session_type_hint
+
+backend_logger = logging.getLogger("backend")
+
+
+class LookupCache:
+    """Process wide cache of the Status and Type_ reference tables.
+
+    Rows are loaded once into detached instances so lookups never touch the database.
+    Call invalidate() after changing one of these tables outside of create_default_data.
+    Instances returned by the cache are detached, compare ids rather than objects.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._by_id = {} # type: dict[type, dict[int, Status | Type_]]
+        self._by_name = {} # type: dict[type, dict[str, Status | Type_]]
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def tables() -> list[type]:
+        """Returns every mapped Status and Type_ subclass."""
+        result = []
+        pending = Status.__subclasses__() + Type_.__subclasses__()
+        while pending:
+            table = pending.pop(0)
+            if "__tablename__" in table.__dict__:
+                result.append(table)
+            pending.extend(table.__subclasses__())
+        return result
+
+    def load(self, tables: list[type] = None, session: session_type_hint = None) -> None:
+        """Load the provided tables into the cache. Defaults to all Status and Type_ tables."""
+        if tables is None:
+            tables = self.tables()
+        close_session = session is None
+        if session is None:
+            session = Session()
+        try:
+            for table in tables:
+                rows = session.query(table).order_by(table.id).all()
+                with self._lock:
+                    self._by_id[table] = {row.id: row for row in rows}
+                    self._by_name[table] = {row.name: row for row in rows}
+                backend_logger.debug(f"Loaded {len(rows)} rows into the lookup cache for {table.__tablename__}.")
+        finally:
+            if close_session:
+                session.close()
+
+    def invalidate(self, table: type = None) -> None:
+        """Drop the cached rows for table, or for every table when table is None."""
+        with self._lock:
+            if table is None:
+                self._by_id.clear()
+                self._by_name.clear()
+            else:
+                self._by_id.pop(table, None)
+                self._by_name.pop(table, None)
+
+    def find_by_id(self, table: type, id: int) -> Status | Type_:
+        by_id = self._by_id.get(table)
+        if by_id is not None and id in by_id:
+            self.hits += 1
+            return by_id[id]
+        self.misses += 1
+        self.load([table])
+        return self._by_id[table].get(id)
+
+    def find_by_name(self, table: type, name: str) -> Status | Type_:
+        by_name = self._by_name.get(table)
+        if by_name is not None and name in by_name:
+            self.hits += 1
+            return by_name[name]
+        self.misses += 1
+        self.load([table])
+        return self._by_name[table].get(name)
+
+    def id_map(self, table: type) -> dict[str, int]:
+        """Returns a name -> id map for table."""
+        if table not in self._by_name:
+            self.misses += 1
+            self.load([table])
+        else:
+            self.hits += 1
+        return {name: row.id for name, row in self._by_name[table].items()}
+
+    def name_map(self, table: type) -> dict[int, str]:
+        """Returns an id -> name map for table."""
+        if table not in self._by_id:
+            self.misses += 1
+            self.load([table])
+        else:
+            self.hits += 1
+        return {id: row.name for id, row in self._by_id[table].items()}
+
+    def stats(self) -> dict:
+        """Returns the hit / miss counters and the number of cached rows per table."""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "tables": {table.__tablename__: len(rows) for table, rows in self._by_id.items()},
+        }
+
+
+lookup_cache = LookupCache()
@@ -0,0 +1,105 @@
+"""Tables and rows written by each session, handed to listeners once committed.
+
+Rows flushed through the ORM are recorded with their ids. INSERT, UPDATE and DELETE
+statements run with session.execute are recorded per table without ids, as their rows
+are not known. bulk_save_objects and raw SQL strings are not seen.
+
+After a commit every listener is called with what the transaction wrote, on the
+committing thread. A rollback discards it.
+"""
+from __future__ import annotations
+import logging
+import threading
+from typing import Callable
+from sqlalchemy import event
+from sqlalchemy.orm import ORMExecuteState, Session as SqlAlchemySession
+from cutlistgenerator.database import session_type_hint
+
+backend_logger = logging.getLogger("backend")
+
+PENDING_CHANGES = "pending_changes"
+
+Changes = dict[tuple[str, str], set]
+"""Ids by (table name, action), action being insert, update or delete. None ids mean unknown rows."""
+
+_listeners = []  # type: list[Callable[[Changes], None]]
+_lock = threading.Lock()
+
+
+def add_commit_listener(listener: Callable[[Changes], None]) -> None:
+    """Call listener with the changes of every commit that wrote something."""
+    with _lock:
+        if listener not in _listeners:
+            _listeners.append(listener)
+
+
+def remove_commit_listener(listener: Callable[[Changes], None]) -> None:
+    with _lock:
+        if listener in _listeners:
+            _listeners.remove(listener)
+
+
+def tables(changes: Changes) -> set[str]:
+    """Returns the names of the tables written to."""
+    return {table for table, _ in changes}
+
+
+def pending_changes(session: session_type_hint) -> Changes:
+    return session.info.setdefault(PENDING_CHANGES, {})
+
+
+def add_pending(session: session_type_hint, table: str, action: str, id: int = None) -> None:
+    changes = pending_changes(session)
+    ids = changes.setdefault((table, action), set())
+    if ids is None:
+        return
+    if id is None:
+        changes[(table, action)] = None
+    else:
+        ids.add(id)
+
+
+@event.listens_for(SqlAlchemySession, "after_flush")
+def collect_flushed_changes(session: session_type_hint, flush_context) -> None:
+    for action, instances in (("insert", session.new), ("update", session.dirty), ("delete", session.deleted)):
+        for instance in instances:
+            table = getattr(instance, "__tablename__", None)
+            if table is None:
+                continue
+            if action == "update" and not session.is_modified(instance, include_collections=False):
+                continue
+            add_pending(session, table, action, getattr(instance, "id", None))
+
+
+@event.listens_for(SqlAlchemySession, "do_orm_execute")
+def collect_statement_changes(state: ORMExecuteState) -> None:
+    if state.is_insert:
+        action = "insert"
+    elif state.is_update:
+        action = "update"
+    elif state.is_delete:
+        action = "delete"
+    else:
+        return
+    table = getattr(state.statement.table, "name", None)
+    if table is not None:
+        add_pending(state.session, table, action)
+
+
+@event.listens_for(SqlAlchemySession, "after_commit")
+def notify_committed_changes(session: session_type_hint) -> None:
+    changes = session.info.pop(PENDING_CHANGES, None)
+    if not changes:
+        return
+    with _lock:
+        listeners = list(_listeners)
+    for listener in listeners:
+        try:
+            listener(changes)
+        except Exception:
+            backend_logger.exception(f"Commit listener {listener} failed:\n")
+
+
+@event.listens_for(SqlAlchemySession, "after_rollback")
+def discard_rolled_back_changes(session: session_type_hint) -> None:
+    session.info.pop(PENDING_CHANGES, None)
@@ -0,0 +1,238 @@
+"""Rolled up PartCutHistory.
+
+Every cut is added to a day bucket and a week bucket of PartCutHistorySummary for
+its part and wire cutter, with one INSERT ... ON DUPLICATE KEY UPDATE per bucket, so
+concurrent cuts add up in the database rather than overwriting each other. Reports
+then read one row per bucket instead of every cut.
+
+rebuild_summary recomputes every bucket from the history, for databases that had
+history before the summary existed.
+
+    python -m cutlistgenerator.database.cuthistory --rebuild
+"""
+from __future__ import annotations
+import argparse
+import datetime
+import logging
+import sys
+from dataclasses import dataclass
+from typing import Iterable
+from sqlalchemy import delete, func
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from cutlistgenerator.database import Session, global_session, session_type_hint, unit_of_work
+from cutlistgenerator.database.models.cutjob import PartCutHistory, PartCutHistorySummary
+from cutlistgenerator.database.models.wirecutter import WireCutter
+from cutlistgenerator.settings import BATCH_SIZE
+from cutlistgenerator.utilities import chunks
+
+backend_logger = logging.getLogger("backend")
+
+
+@dataclass
+class Bucket:
+    """Totals of the cuts in one bucket."""
+
+    cut_count: int = 0
+    quantity_cut: int = 0
+    total_time_minutes: int = 0
+    min_rate: float = None
+    max_rate: float = None
+
+    def add(self, quantity_cut: int, total_time_minutes: int) -> None:
+        self.cut_count += 1
+        self.quantity_cut += quantity_cut
+        self.total_time_minutes += total_time_minutes
+        if quantity_cut > 0:
+            rate = total_time_minutes / quantity_cut
+            self.min_rate = rate if self.min_rate is None else min(self.min_rate, rate)
+            self.max_rate = rate if self.max_rate is None else max(self.max_rate, rate)
+
+
+def period_start(event_date: datetime.datetime, period: str) -> datetime.date:
+    """Returns the day, or the Monday of the week, event_date falls in."""
+    day = event_date.date()
+    if period == "week":
+        return day - datetime.timedelta(days=day.weekday())
+    return day
+
+
+def bucket_cuts(rows: Iterable[tuple[int, int, datetime.datetime, int, int]]) -> dict[tuple, Bucket]:
+    """Totals cuts per bucket.
+
+    Args:
+        rows (Iterable[tuple]): part_id, wire_cutter_id, event_date, quantity_cut, total_time_minutes of each cut.
+
+    Returns:
+        dict[tuple, Bucket]: Totals by (part_id, wire_cutter_id, period, period_start).
+    """
+    buckets = {}  # type: dict[tuple, Bucket]
+    for part_id, wire_cutter_id, event_date, quantity_cut, total_time_minutes in rows:
+        for period in PartCutHistorySummary.PERIODS:
+            key = (part_id, wire_cutter_id, period, period_start(event_date, period))
+            bucket = buckets.get(key)
+            if bucket is None:
+                bucket = buckets[key] = Bucket()
+            bucket.add(quantity_cut or 0, total_time_minutes or 0)
+    return buckets
+
+
+def bucket_rows(buckets: dict[tuple, Bucket]) -> list[dict]:
+    return [
+        {
+            "part_id": part_id,
+            "wire_cutter_id": wire_cutter_id,
+            "period": period,
+            "period_start": start,
+            "cut_count": bucket.cut_count,
+            "quantity_cut": bucket.quantity_cut,
+            "total_time_minutes": bucket.total_time_minutes,
+            "min_rate": bucket.min_rate,
+            "max_rate": bucket.max_rate,
+        }
+        for (part_id, wire_cutter_id, period, start), bucket in buckets.items()
+    ]
+
+
+def upsert_buckets(session: session_type_hint, rows: list[dict]) -> None:
+    """Add bucket totals to the summary, creating the buckets that do not exist yet."""
+    table = PartCutHistorySummary.__table__
+    mysql = session.get_bind().dialect.name == "mysql"
+    statement = mysql_insert(table) if mysql else sqlite_insert(table)
+    new = statement.inserted if mysql else statement.excluded
+    # SQLite spells LEAST and GREATEST as the multi-argument MIN and MAX.
+    least, greatest = (func.least, func.greatest) if mysql else (func.min, func.max)
+    # Both are NULL if either side is, so fall back to whichever rate exists.
+    updates = {
+        "cut_count": table.c.cut_count + new.cut_count,
+        "quantity_cut": table.c.quantity_cut + new.quantity_cut,
+        "total_time_minutes": table.c.total_time_minutes + new.total_time_minutes,
+        "min_rate": func.coalesce(least(table.c.min_rate, new.min_rate), table.c.min_rate, new.min_rate),
+        "max_rate": func.coalesce(greatest(table.c.max_rate, new.max_rate), table.c.max_rate, new.max_rate),
+    }
+    for chunk in chunks(rows):
+        values = statement.values(chunk)
+        if mysql:
+            session.execute(values.on_duplicate_key_update(**updates))
+        else:
+            session.execute(
+                values.on_conflict_do_update(
+                    index_elements=["part_id", "period", "period_start", "wire_cutter_id"], set_=updates
+                )
+            )
+
+
+def add_to_summary(history: list[PartCutHistory], session: session_type_hint = None) -> None:
+    """Add new PartCutHistory rows to their buckets. Does not commit.
+
+    Args:
+        history (list[PartCutHistory]): Rows just added to the history.
+        session (Session, optional): Session to use for this operation. Defaults to Global Session.
+    """
+    if not session:
+        session = global_session
+    buckets = bucket_cuts(
+        (row.part_id, row.wire_cutter_id, row.event_date, row.quantity_cut, row.total_time_minutes)
+        for row in history
+    )
+    upsert_buckets(session, bucket_rows(buckets))
+
+
+def rebuild_summary(session: session_type_hint = None) -> int:
+    """Recompute every bucket from PartCutHistory, in one transaction or in the caller's unit_of_work.
+
+    Args:
+        session (Session, optional): Session to use for this operation. Defaults to Global Session.
+
+    Returns:
+        int: Number of buckets written.
+    """
+    if not session:
+        session = global_session
+    with unit_of_work(session):
+        rows = session.query(
+            PartCutHistory.part_id,
+            PartCutHistory.wire_cutter_id,
+            PartCutHistory.event_date,
+            PartCutHistory.quantity_cut,
+            PartCutHistory.total_time_minutes,
+        ).yield_per(BATCH_SIZE)
+        buckets = bucket_cuts(rows)
+        session.execute(delete(PartCutHistorySummary))
+        upsert_buckets(session, bucket_rows(buckets))
+    backend_logger.info(f"Rebuilt {len(buckets)} part cut history summary buckets.")
+    return len(buckets)
+
+
+def backfill_summary(session: session_type_hint) -> None:
+    """Build the summary if it is empty while there is history, e.g. right after it was added."""
+    if session.query(PartCutHistorySummary.id).first() is not None:
+        return
+    if session.query(PartCutHistory.id).first() is None:
+        return
+    rebuild_summary(session)
+
+
+def find_summary(
+    part_id: int,
+    period: str = "week",
+    since: datetime.date = None,
+    wire_cutter_id: int = None,
+    session: session_type_hint = None,
+) -> list[dict]:
+    """Returns the buckets of a part, oldest first.
+
+    Args:
+        part_id (int): Id of the part.
+        period (str, optional): "day" or "week". Defaults to "week".
+        since (datetime.date, optional): First day to include. Defaults to all history.
+        wire_cutter_id (int, optional): Only this wire cutter. Defaults to every wire cutter.
+        session (Session, optional): Session to use for this operation. Defaults to Global Session.
+
+    Returns:
+        list[dict]: One dict per bucket, with the wire cutter's name and the average rate.
+    """
+    if not session:
+        session = global_session
+    query = (
+        session.query(PartCutHistorySummary, WireCutter.name)
+        .join(WireCutter, WireCutter.id == PartCutHistorySummary.wire_cutter_id)
+        .filter(PartCutHistorySummary.part_id == part_id, PartCutHistorySummary.period == period)
+    )
+    if since is not None:
+        query = query.filter(PartCutHistorySummary.period_start >= since)
+    if wire_cutter_id is not None:
+        query = query.filter(PartCutHistorySummary.wire_cutter_id == wire_cutter_id)
+    return [
+        {
+            "period": summary.period,
+            "period_start": summary.period_start.isoformat(),
+            "wire_cutter": wire_cutter_name,
+            "cut_count": summary.cut_count,
+            "quantity_cut": summary.quantity_cut,
+            "total_time_minutes": summary.total_time_minutes,
+            "min_rate": summary.min_rate,
+            "max_rate": summary.max_rate,
+            "avg_rate": summary.avg_rate,
+        }
+        for summary, wire_cutter_name in query.order_by(
+            PartCutHistorySummary.period_start, PartCutHistorySummary.wire_cutter_id
+        )
+    ]
+
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Maintain the part cut history summary.")
+    parser.add_argument("--rebuild", action="store_true", help="Recompute every bucket from the history.")
+    args = parser.parse_args(argv)
+
+    with Session() as session:
+        if args.rebuild:
+            print(f"Rebuilt {rebuild_summary(session)} buckets.")
+        else:
+            backfill_summary(session)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
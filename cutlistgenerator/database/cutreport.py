@@ -0,0 +1,209 @@
+"""Batch reporting of cut quantities.
+
+Setting CutJobItem.quantity_cut one item at a time runs validate_quantity_cut for
+each item, which commits per linked sales order item and rescans the whole cut job.
+report_cut_quantities applies any number of reports in one transaction instead. It
+reads what it needs with a few grouped queries, works out the item and job status
+changes in memory, and writes them back with set based UPDATEs, bulk inserted
+PartCutHistory rows and their summary buckets.
+
+The rules are the same as validate_quantity_cut. An item is finished once its
+quantity cut covers what is left to fulfill on its sales order items, which are
+marked cut or not cut to match. A job is fulfilled once all of its items are, and
+is in progress while any reported item is not finished. History is only written
+when an item becomes fulfilled, so reporting the same count twice does not count
+the cut twice.
+"""
+from __future__ import annotations
+import datetime
+import logging
+from dataclasses import dataclass, field
+from typing import Iterable
+from sqlalchemy import bindparam, case, func, update
+from cutlistgenerator.database import global_session, session_type_hint, unit_of_work
+from cutlistgenerator.database.cuthistory import add_to_summary
+from cutlistgenerator.database.models.cutjob import (
+    CutJob,
+    CutJobItem,
+    CutJobItemStatus,
+    CutJobStatus,
+    PartCutHistory,
+)
+from cutlistgenerator.database.models.salesorder import SalesOrderItem
+from cutlistgenerator.utilities import chunks
+
+backend_logger = logging.getLogger("backend")
+
+
+@dataclass
+class CutReport:
+    """Quantity cut so far on one cut job item."""
+
+    cut_job_item_id: int
+    quantity_cut: int
+    total_time_minutes: int = None
+    """Minutes the cut took so far. None leaves the recorded time as it is."""
+
+
+@dataclass
+class ReportResult:
+    items: int = 0
+    items_finished: int = 0
+    jobs_finished: int = 0
+    history_rows: int = 0
+    unknown_item_ids: list[int] = field(default_factory=list)
+
+
+def report_cut_quantities(reports: Iterable[CutReport], session: session_type_hint = None) -> ReportResult:
+    """Apply many quantity cut reports in one transaction, or in the caller's unit_of_work.
+
+    Args:
+        reports (Iterable[CutReport]): Reports to apply. The last report of an item wins.
+        session (Session, optional): Session to use for this operation. Defaults to Global Session.
+
+    Raises:
+        ValueError: If a quantity or time is negative. Nothing is written.
+
+    Returns:
+        ReportResult: What changed, and the ids of any cut job items that do not exist.
+    """
+    if not session:
+        session = global_session
+    by_id = {}  # type: dict[int, CutReport]
+    for report in reports:
+        if report.quantity_cut < 0 or (report.total_time_minutes or 0) < 0:
+            raise ValueError(f"Cut job item {report.cut_job_item_id}: quantities and times can not be negative.")
+        by_id[report.cut_job_item_id] = report
+    result = ReportResult()
+    if not by_id:
+        return result
+
+    fulfilled_item_id = CutJobItemStatus.find_by_name("Fulfilled").id
+    in_progress_item_id = CutJobItemStatus.find_by_name("In Progress").id
+    fulfilled_job_id = CutJobStatus.find_by_name("Fulfilled").id
+    in_progress_job_id = CutJobStatus.find_by_name("In Progress").id
+    now = datetime.datetime.now()
+    with unit_of_work(session):
+        ids = sorted(by_id)
+        items = {}  # type: dict[int, tuple]
+        left_to_fulfill = {}  # type: dict[int, float]
+        for chunk in chunks(ids):
+            for row in (
+                session.query(
+                    CutJobItem.id,
+                    CutJobItem.cut_job_id,
+                    CutJobItem.part_id,
+                    CutJobItem.status_id,
+                    CutJobItem.total_time_minutes,
+                    CutJob.wire_cutter_id,
+                )
+                .join(CutJob, CutJob.id == CutJobItem.cut_job_id)
+                .filter(CutJobItem.id.in_(chunk))
+            ):
+                items[row.id] = row
+            for cut_job_item_id, left in (
+                session.query(
+                    SalesOrderItem.cut_job_item_id,
+                    func.sum(
+                        SalesOrderItem.quantity_to_fulfill
+                        - SalesOrderItem.quantity_fulfilled
+                        - SalesOrderItem.quantity_picked
+                    ),
+                )
+                .filter(SalesOrderItem.cut_job_item_id.in_(chunk))
+                .group_by(SalesOrderItem.cut_job_item_id)
+            ):
+                left_to_fulfill[cut_job_item_id] = left or 0
+        result.unknown_item_ids = [id for id in ids if id not in items]
+
+        item_rows = []
+        finished_ids = []
+        unfinished_ids = []
+        history = []
+        in_progress_job_ids = set()
+        for id, item in items.items():
+            report = by_id[id]
+            finished = report.quantity_cut >= left_to_fulfill.get(id, 0)
+            total_time_minutes = (
+                item.total_time_minutes if report.total_time_minutes is None else report.total_time_minutes
+            )
+            item_rows.append(
+                {
+                    "item_id": id,
+                    "new_quantity_cut": report.quantity_cut,
+                    "new_total_time_minutes": total_time_minutes,
+                    "new_status_id": fulfilled_item_id if finished else in_progress_item_id,
+                    "new_date_finished": now if finished else None,
+                    "new_date_modified": now,
+                }
+            )
+            if not finished:
+                unfinished_ids.append(id)
+                in_progress_job_ids.add(item.cut_job_id)
+                continue
+            finished_ids.append(id)
+            if item.status_id != fulfilled_item_id:
+                history.append(
+                    PartCutHistory(
+                        event_date=now,
+                        part_id=item.part_id,
+                        wire_cutter_id=item.wire_cutter_id,
+                        quantity_cut=report.quantity_cut,
+                        total_time_minutes=total_time_minutes,
+                    )
+                )
+        result.items = len(item_rows)
+        result.items_finished = len(finished_ids)
+
+        table = CutJobItem.__table__
+        if item_rows:
+            session.execute(
+                update(table)
+                .where(table.c.id == bindparam("item_id"))
+                .values(
+                    quantity_cut=bindparam("new_quantity_cut"),
+                    total_time_minutes=bindparam("new_total_time_minutes"),
+                    status_id=bindparam("new_status_id"),
+                    date_finished=bindparam("new_date_finished"),
+                    date_modified=bindparam("new_date_modified"),
+                ),
+                item_rows,
+            )
+        for is_cut, cut_job_item_ids in ((True, finished_ids), (False, unfinished_ids)):
+            for chunk in chunks(cut_job_item_ids):
+                session.execute(
+                    update(SalesOrderItem)
+                    .where(SalesOrderItem.cut_job_item_id.in_(chunk))
+                    .values(is_cut=is_cut, date_modified=now)
+                    .execution_options(synchronize_session=False)
+                )
+        if history:
+            session.bulk_save_objects(history)
+            add_to_summary(history, session)
+            result.history_rows = len(history)
+
+        job_ids = sorted({item.cut_job_id for item in items.values()})
+        finished_job_ids = []
+        for chunk in chunks(job_ids):
+            finished_job_ids.extend(
+                cut_job_id
+                for cut_job_id, in session.query(CutJobItem.cut_job_id)
+                .filter(CutJobItem.cut_job_id.in_(chunk))
+                .group_by(CutJobItem.cut_job_id)
+                .having(func.sum(case((CutJobItem.status_id == fulfilled_item_id, 0), else_=1)) == 0)
+            )
+        result.jobs_finished = len(finished_job_ids)
+        in_progress_job_ids = sorted(in_progress_job_ids - set(finished_job_ids))
+        for status_id, cut_job_ids in ((fulfilled_job_id, finished_job_ids), (in_progress_job_id, in_progress_job_ids)):
+            for chunk in chunks(cut_job_ids):
+                session.execute(
+                    update(CutJob)
+                    .where(CutJob.id.in_(chunk))
+                    .values(status_id=status_id, date_modified=now)
+                    .execution_options(synchronize_session=False)
+                )
+    backend_logger.info(
+        f"Reported {result.items} cut job items, {result.items_finished} finished, "
+        f"{result.jobs_finished} cut jobs fulfilled."
+    )
+    return result
@@ -0,0 +1,168 @@
+"""Set based deletion of sales order items.
+
+delete_sales_order_items archives and deletes a batch of items, the items they are
+linked to, their cut job items and the orders left empty, with a fixed number of
+INSERT ... SELECT / UPDATE / DELETE statements in a single transaction. Either
+everything is removed and archived or nothing is.
+"""
+from __future__ import annotations
+import logging
+from dataclasses import dataclass
+from typing import Iterable
+from sqlalchemy import delete, exists, insert, select, update
+from cutlistgenerator.database import global_session, session_type_hint, unit_of_work
+from cutlistgenerator.database.models.cutjob import CutJobItem, RemovedCutJobItem
+from cutlistgenerator.database.models.salesorder import (
+    RemovedSalesOrderItem,
+    SalesOrder,
+    SalesOrderItem,
+)
+from cutlistgenerator.utilities import chunks
+
+backend_logger = logging.getLogger("backend")
+
+
+@dataclass
+class DeleteResult:
+    """Number of rows removed by delete_sales_order_items."""
+
+    sales_order_items: int = 0
+    cut_job_items: int = 0
+    sales_orders: int = 0
+
+
+def linked_item_ids(item_ids: Iterable[int], session: session_type_hint) -> set[int]:
+    """Returns item_ids plus every parent and child item reachable from them.
+
+    The parent of a deleted item is deleted with it, and so are the children of any
+    deleted item, otherwise they would be left pointing at a missing parent.
+
+    Args:
+        item_ids (Iterable[int]): Ids of the items to delete.
+        session (Session): Session to use for this operation.
+
+    Returns:
+        set[int]: Ids of every item to delete.
+    """
+    result = set(item_ids)
+    frontier = sorted(result)
+    while frontier:
+        found = set()
+        for chunk in chunks(frontier):
+            found.update(
+                id for id, in session.query(SalesOrderItem.parent_item_id).filter(
+                    SalesOrderItem.id.in_(chunk), SalesOrderItem.parent_item_id != None
+                )
+            )
+            found.update(
+                id for id, in session.query(SalesOrderItem.id).filter(
+                    SalesOrderItem.parent_item_id.in_(chunk)
+                )
+            )
+        frontier = sorted(found - result)
+        result.update(frontier)
+    return result
+
+
+def delete_sales_order_items(item_ids: Iterable[int], session: session_type_hint = None) -> DeleteResult:
+    """Archive and delete sales order items with their linked items, cut job items and empty orders.
+
+    Items are copied to removed_sales_order_item and cut job items to removed_cut_job_item
+    before they are deleted. Items outside of the batch that share a deleted cut job item
+    are unlinked from it. Runs in one transaction and commits once, or joins the
+    caller's unit_of_work.
+
+    Args:
+        item_ids (Iterable[int]): Ids of the sales order items to delete.
+        session (Session, optional): Session to use for this operation. Defaults to Global Session.
+
+    Returns:
+        DeleteResult: Number of items, cut job items and orders removed.
+    """
+    if not session:
+        session = global_session
+    result = DeleteResult()
+    with unit_of_work(session):
+        ids = sorted(linked_item_ids(item_ids, session))
+        if not ids:
+            return result
+
+        cut_job_item_ids = set()
+        sales_order_ids = set()
+        for chunk in chunks(ids):
+            for cut_job_item_id, sales_order_id in session.query(
+                SalesOrderItem.cut_job_item_id, SalesOrderItem.sales_order_id
+            ).filter(SalesOrderItem.id.in_(chunk)):
+                if cut_job_item_id is not None:
+                    cut_job_item_ids.add(cut_job_item_id)
+                sales_order_ids.add(sales_order_id)
+        cut_job_item_ids = sorted(cut_job_item_ids)
+        sales_order_ids = sorted(sales_order_ids)
+
+        item_columns = [
+            column.name for column in RemovedSalesOrderItem.__table__.columns if column.name != "id"
+        ]
+        cut_job_item_columns = [
+            column.name for column in RemovedCutJobItem.__table__.columns if column.name != "id"
+        ]
+        for chunk in chunks(ids):
+            session.execute(
+                insert(RemovedSalesOrderItem).from_select(
+                    item_columns,
+                    select(*[SalesOrderItem.__table__.c[name] for name in item_columns]).where(
+                        SalesOrderItem.id.in_(chunk)
+                    ),
+                )
+            )
+        for chunk in chunks(cut_job_item_ids):
+            session.execute(
+                insert(RemovedCutJobItem).from_select(
+                    cut_job_item_columns,
+                    select(*[CutJobItem.__table__.c[name] for name in cut_job_item_columns]).where(
+                        CutJobItem.id.in_(chunk)
+                    ),
+                )
+            )
+
+        # InnoDB checks foreign keys row by row, so break the links before deleting.
+        for chunk in chunks(cut_job_item_ids):
+            session.execute(
+                update(SalesOrderItem)
+                .where(SalesOrderItem.cut_job_item_id.in_(chunk))
+                .values(cut_job_item_id=None)
+                .execution_options(synchronize_session=False)
+            )
+        for chunk in chunks(ids):
+            session.execute(
+                update(SalesOrderItem)
+                .where(SalesOrderItem.id.in_(chunk), SalesOrderItem.parent_item_id != None)
+                .values(parent_item_id=None)
+                .execution_options(synchronize_session=False)
+            )
+
+        for chunk in chunks(ids):
+            result.sales_order_items += session.execute(
+                delete(SalesOrderItem)
+                .where(SalesOrderItem.id.in_(chunk))
+                .execution_options(synchronize_session=False)
+            ).rowcount
+        for chunk in chunks(cut_job_item_ids):
+            result.cut_job_items += session.execute(
+                delete(CutJobItem)
+                .where(CutJobItem.id.in_(chunk))
+                .execution_options(synchronize_session=False)
+            ).rowcount
+        for chunk in chunks(sales_order_ids):
+            result.sales_orders += session.execute(
+                delete(SalesOrder)
+                .where(
+                    SalesOrder.id.in_(chunk),
+                    ~exists().where(SalesOrderItem.sales_order_id == SalesOrder.id),
+                )
+                .execution_options(synchronize_session=False)
+            ).rowcount
+    backend_logger.info(
+        f"Deleted {result.sales_order_items} sales order items, {result.cut_job_items} cut job items "
+        f"and {result.sales_orders} empty sales orders."
+    )
+    return result
@@ -0,0 +1,350 @@
+"""Index migrations for an existing schema.
+
+The indexes declared on the models are the source of truth. migrate_indexes creates
+any that are missing and drops the ones listed in RETIRED_INDEXES, so index changes
+reach existing databases without FORCE_REBUILD_DATABASE. It runs from create_tables
+on every start up.
+
+InnoDB fixes a FULLTEXT index's stopword list when the index is created, so all DDL
+runs through ddl_connection, which turns stopwords off for the connection. The ngram
+indexes then hold every ngram, which search.contains relies on.
+
+hot_queries() lists the query shapes the indexes were designed for. check_hot_queries
+runs EXPLAIN on each one and reports whether MySQL picked the intended index.
+check_search runs the sales order table searches with and without the fulltext
+indexes and reports any search where they return different rows.
+
+    python -m cutlistgenerator.database.migrations [--dry-run] [--explain] [--check-search]
+"""
+from __future__ import annotations
+import argparse
+import logging
+import sys
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Callable, Iterator
+import sqlalchemy
+from sqlalchemy import Index, MetaData, Table, func, inspect
+from sqlalchemy.orm import Query
+from cutlistgenerator.database import Base, Session, search, session_type_hint
+
+backend_logger = logging.getLogger("backend")
+
+# fmt: off
+RETIRED_INDEXES = [
+    # (table name, index name)
+    ("sales_order_item", "ix_sales_order_item_part_id"),  # Prefix of ix_sales_order_item_part_id_is_cut.
+    # Built with the default stopword list, replaced by the _nostop indexes.
+    ("sales_order", "ft_sales_order_number"),
+    ("customer", "ft_customer_name"),
+    ("part", "ft_part_number"),
+]  # type: list[tuple[str, str]]
+# fmt: on
+
+
+@dataclass
+class IndexPlan:
+    """Index changes needed to bring a schema in line with the models."""
+
+    create: list[Index]
+    drop: list[tuple[str, str]]
+    """(table name, index name) pairs."""
+
+    def __bool__(self) -> bool:
+        return bool(self.create or self.drop)
+
+
+@contextmanager
+def ddl_connection(bind: sqlalchemy.engine.Engine) -> Iterator[sqlalchemy.engine.Connection]:
+    """Yields a connection for creating tables and indexes, with InnoDB stopwords turned off on MySQL."""
+    with bind.connect() as connection:
+        if connection.dialect.name != "mysql":
+            yield connection
+            return
+        connection.exec_driver_sql("SET SESSION innodb_ft_enable_stopword = OFF")
+        try:
+            yield connection
+        finally:
+            connection.exec_driver_sql("SET SESSION innodb_ft_enable_stopword = DEFAULT")
+
+
+def plan_indexes(session: session_type_hint) -> IndexPlan:
+    """Compare the declared indexes with the database.
+
+    Tables that do not exist yet are skipped, create_all makes them with their indexes.
+
+    Args:
+        session (Session): Session to use for this operation.
+
+    Returns:
+        IndexPlan: Indexes to create and to drop.
+    """
+    inspector = inspect(session.get_bind())
+    tables = set(inspector.get_table_names())
+    existing = {
+        table.name: {index["name"] for index in inspector.get_indexes(table.name)}
+        for table in Base.metadata.sorted_tables
+        if table.name in tables
+    }
+    create = [
+        index
+        for table in Base.metadata.sorted_tables
+        if table.name in existing
+        for index in sorted(table.indexes, key=lambda index: index.name)
+        if index.name not in existing[table.name]
+    ]
+    drop = [
+        (table_name, index_name)
+        for table_name, index_name in RETIRED_INDEXES
+        if index_name in existing.get(table_name, ())
+    ]
+    return IndexPlan(create=create, drop=drop)
+
+
+def migrate_indexes(session: session_type_hint, dry_run: bool = False) -> IndexPlan:
+    """Create missing indexes, then drop retired ones.
+
+    Indexes are created first so a foreign key never loses its only supporting index.
+
+    Args:
+        session (Session): Session to use for this operation.
+        dry_run (bool, optional): Only log the changes. Defaults to False.
+
+    Returns:
+        IndexPlan: The changes that were (or would be) made.
+    """
+    plan = plan_indexes(session)
+    if dry_run or not plan:
+        for index in plan.create:
+            backend_logger.info(f"Would create index {index.name} on {index.table.name}.")
+        for table_name, index_name in plan.drop:
+            backend_logger.info(f"Would drop index {index_name} on {table_name}.")
+        return plan
+    with ddl_connection(session.get_bind()) as connection:
+        for index in plan.create:
+            backend_logger.info(f"Creating index {index.name} on {index.table.name}.")
+            index.create(bind=connection)
+        for table_name, index_name in plan.drop:
+            backend_logger.info(f"Dropping index {index_name} on {table_name}.")
+            # Bind the name to a stand in table so the retired index never joins the model metadata.
+            Index(index_name, _table=Table(table_name, MetaData())).drop(bind=connection)
+    return plan
+
+
+@dataclass
+class HotQuery:
+    """A query shape with the index it is expected to use."""
+
+    name: str
+    table: str
+    index: str
+    build: Callable[[session_type_hint], Query]
+
+
+@dataclass
+class ExplainResult:
+    """What EXPLAIN reported for a HotQuery."""
+
+    query: HotQuery
+    key: str
+    possible_keys: str
+    access_type: str
+    rows: int
+
+    @property
+    def ok(self) -> bool:
+        return self.key == self.query.index
+
+    def __str__(self) -> str:
+        status = "OK" if self.ok else "MISS"
+        return (
+            f"[{status}] {self.query.name}: expected {self.query.index}, "
+            f"used {self.key} ({self.access_type}, ~{self.rows} rows, possible: {self.possible_keys})"
+        )
+
+
+def hot_queries() -> list[HotQuery]:
+    """Returns the registered hot query shapes."""
+    from cutlistgenerator.database.models.salesorder import SalesOrder, SalesOrderItem
+
+    # fmt: off
+    return [
+        HotQuery(
+            "sync item lookup", "sales_order_item", "ix_sales_order_item_fb_so_item_id_line_number",
+            lambda session: session.query(SalesOrderItem.id).filter(
+                SalesOrderItem.fb_so_item_id == 1, SalesOrderItem.line_number == "1"
+            ),
+        ),
+        HotQuery(
+            "uncut items by due date", "sales_order_item", "ix_sales_order_item_is_cut_date_scheduled_fulfillment",
+            lambda session: session.query(SalesOrderItem.id)
+            .filter(SalesOrderItem.is_cut == False)
+            .order_by(SalesOrderItem.date_scheduled_fulfillment, SalesOrderItem.id)
+            .limit(200),
+        ),
+        HotQuery(
+            "items for part", "sales_order_item", "ix_sales_order_item_part_id_is_cut",
+            lambda session: session.query(SalesOrderItem.id).filter(
+                SalesOrderItem.part_id == 1, SalesOrderItem.is_cut == False
+            ),
+        ),
+        HotQuery(
+            "open sales orders", "sales_order", "ix_sales_order_status_id",
+            lambda session: session.query(SalesOrder.id).filter(SalesOrder.status_id <= 1),
+        ),
+    ]
+    # fmt: on
+
+
+def explain(session: session_type_hint, query: Query) -> list[dict]:
+    """Returns the EXPLAIN rows for query. MySQL only.
+
+    Args:
+        session (Session): Session to use for this operation.
+        query (Query): Query to explain.
+
+    Returns:
+        list[dict]: One dict per EXPLAIN row.
+    """
+    bind = session.get_bind()
+    compiled = query.statement.compile(dialect=bind.dialect, compile_kwargs={"render_postcompile": True})
+    result = session.connection().exec_driver_sql(f"EXPLAIN {compiled.string}", compiled.params)
+    return [dict(row._mapping) for row in result]
+
+
+def check_hot_queries(session: session_type_hint) -> list[ExplainResult]:
+    """EXPLAIN every hot query and report the index MySQL chose for its table.
+
+    Small or freshly created tables can make MySQL prefer a full scan, so run this
+    against a database with production sized data.
+
+    Args:
+        session (Session): Session to use for this operation.
+
+    Returns:
+        list[ExplainResult]: One result per hot query. Empty on databases other than MySQL.
+    """
+    if session.get_bind().dialect.name != "mysql":
+        backend_logger.warning("EXPLAIN checks are only supported on MySQL.")
+        return []
+
+    results = []
+    for hot_query in hot_queries():
+        rows = [row for row in explain(session, hot_query.build(session)) if row["table"] == hot_query.table]
+        row = rows[0] if rows else {}
+        result = ExplainResult(
+            query=hot_query,
+            key=row.get("key"),
+            possible_keys=row.get("possible_keys"),
+            access_type=row.get("type"),
+            rows=row.get("rows"),
+        )
+        if not result.ok:
+            backend_logger.warning(str(result))
+        results.append(result)
+    return results
+
+
+SEARCH_CHECK_TERMS = ["a", "i", "an", "at", "by", "in", "is", "of", "to", "the", "and", "inc", "acme", "a1", "12-3"]
+"""Terms with stopwords, short runs and punctuation, checked on every fulltext indexed column."""
+
+
+@dataclass
+class SearchCheck:
+    """Rows a substring search found with the LIKE alone and with search.contains."""
+
+    column: str
+    text: str
+    like_rows: int
+    match_rows: int
+
+    @property
+    def ok(self) -> bool:
+        # search.contains only adds a MATCH to the LIKE, so equal counts mean equal rows.
+        return self.like_rows == self.match_rows
+
+    def __str__(self) -> str:
+        status = "OK" if self.ok else "MISS"
+        return f"[{status}] {self.column} contains {self.text!r}: LIKE {self.like_rows} rows, MATCH and LIKE {self.match_rows} rows"
+
+
+def fulltext_columns() -> list[sqlalchemy.Column]:
+    """Returns the columns with a FULLTEXT index."""
+    return [
+        column
+        for table in Base.metadata.sorted_tables
+        for index in sorted(table.indexes, key=lambda index: index.name)
+        if index.dialect_options["mysql"]["prefix"] == "FULLTEXT"
+        for column in index.columns
+    ]
+
+
+def check_search(session: session_type_hint, samples: int = 20) -> list[SearchCheck]:
+    """Run substring searches on every fulltext indexed column with and without the index.
+
+    Searches SEARCH_CHECK_TERMS and pieces of the first samples values of each column.
+
+    Args:
+        session (Session): Session to use for this operation.
+        samples (int, optional): Values of each column to take search terms from. Defaults to 20.
+
+    Returns:
+        list[SearchCheck]: One result per column and term. Empty on databases other than MySQL.
+    """
+    if session.get_bind().dialect.name != "mysql":
+        backend_logger.warning("Fulltext search checks are only supported on MySQL.")
+        return []
+    token_size = session.execute("SELECT @@ngram_token_size").scalar()
+    if token_size != search.NGRAM_TOKEN_SIZE:
+        backend_logger.warning(
+            f"ngram_token_size is {token_size} but search.NGRAM_TOKEN_SIZE is {search.NGRAM_TOKEN_SIZE}."
+        )
+
+    results = []
+    for column in fulltext_columns():
+        values = [value for value, in session.query(column).filter(column != None).distinct().limit(samples)]
+        terms = dict.fromkeys(SEARCH_CHECK_TERMS + [piece for value in values for piece in (value, value[:3], value[-4:])])
+        for text in terms:
+            count = session.query(func.count()).select_from(column.table)
+            result = SearchCheck(
+                column=f"{column.table.name}.{column.name}",
+                text=text,
+                like_rows=count.filter(column.contains(text)).scalar(),
+                match_rows=count.filter(search.contains(session, column, text)).scalar(),
+            )
+            if not result.ok:
+                backend_logger.warning(str(result))
+            results.append(result)
+    return results
+
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Bring the database indexes in line with the models.")
+    parser.add_argument("--dry-run", action="store_true", help="Only print the changes.")
+    parser.add_argument("--explain", action="store_true", help="Check that the hot queries use their indexes.")
+    parser.add_argument(
+        "--check-search", action="store_true", help="Check that fulltext searches find the same rows as LIKE."
+    )
+    args = parser.parse_args(argv)
+
+    with Session() as session:
+        plan = migrate_indexes(session, dry_run=args.dry_run)
+        for index in plan.create:
+            print(f"{'Would create' if args.dry_run else 'Created'} {index.table.name}.{index.name}")
+        for table_name, index_name in plan.drop:
+            print(f"{'Would drop' if args.dry_run else 'Dropped'} {table_name}.{index_name}")
+        if not plan:
+            print("Indexes are up to date.")
+
+        results = []
+        if args.explain:
+            results.extend(check_hot_queries(session))
+        if args.check_search:
+            results.extend(check_search(session))
+        for result in results:
+            print(result)
+        return 0 if all(result.ok for result in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,59 @@
+from __future__ import annotations
+import datetime
+import logging
+from sqlalchemy import Column, DateTime, Integer, String, Text
+
+from cutlistgenerator.database import Base, global_session, session_type_hint
+
+backend_logger = logging.getLogger("backend")
+
+
+class BulkUpdateLog(Base):
+    """A log of every bulk UPDATE, written in the same transaction as the update."""
+
+    __tablename__ = "bulk_update_log"
+
+    event_date = Column(DateTime, nullable=False, default=datetime.datetime.now)
+    operation = Column(String(50), nullable=False)
+    table_name = Column(String(50), nullable=False)
+    value = Column(String(50), nullable=False)
+    part_ids = Column(Text, nullable=False, doc="Comma separated ids of the parts the update targeted.")
+    affected_rows = Column(Integer, nullable=False)
+
+    def __repr__(self) -> str:
+        return f"<BulkUpdateLog(operation={self.operation}, table={self.table_name}, affected_rows={self.affected_rows})>"
+
+    @staticmethod
+    def add(
+        operation: str,
+        table_name: str,
+        value,
+        part_ids: list[int],
+        affected_rows: int,
+        session: session_type_hint = None,
+    ) -> BulkUpdateLog:
+        """Adds an audit row to the session. Does not commit.
+
+        Args:
+            operation (str): Name of the bulk operation.
+            table_name (str): Table that was updated.
+            value: Value the rows were set to.
+            part_ids (list[int]): Ids of the parts the update targeted.
+            affected_rows (int): Rows changed by the update.
+            session (Session, optional): Session to use for this operation. Defaults to Global Session.
+
+        Returns:
+            BulkUpdateLog: The new audit row.
+        """
+        if not session:
+            session = global_session
+        log = BulkUpdateLog(
+            operation=operation,
+            table_name=table_name,
+            value=str(value),
+            part_ids=",".join(str(id) for id in part_ids),
+            affected_rows=affected_rows,
+        )
+        session.add(log)
+        backend_logger.info(f"{operation}: set {table_name} to {value} on {affected_rows} rows for parts {log.part_ids}.")
+        return log
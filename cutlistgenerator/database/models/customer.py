@@ -4,7 +4,7 @@ import logging
 from fishbowlorm.models import FBCustomer, FBSalesOrder
 from sqlalchemy import Column, Integer, String, ForeignKey
 from sqlalchemy.orm import relationship
-from cutlistgenerator.database import Base, Auditing, global_session
+from cutlistgenerator.database import Base, Auditing, fulltext_index, global_session, commit
 
 
 backend_logger = logging.getLogger("backend")
@@ -23,6 +23,7 @@ class Customer(Base, Auditing):
     """Represents a customer."""
 
     __tablename__ = "customer"
+    __table_args__ = (fulltext_index("customer", "name"),)
 
     name = Column(String(255), nullable=False, unique=True)
     name_convertion = relationship(
@@ -80,7 +81,7 @@ class Customer(Base, Auditing):
             customer = Customer(name=fb_sales_order.customerObj.name)
             customer_names.append(customer.name)
             global_session.add(customer)
-            global_session.commit()
+            commit()
             created += 1
         backend_logger.debug(
             f"[EXECUTION TIME] Created {created} customers in {time.perf_counter() - s} seconds."
@@ -96,5 +97,5 @@ class Customer(Base, Auditing):
 
         customer = Customer(name=fishbowl_customer.name)
         global_session.add(customer)
-        global_session.commit()
+        commit()
         return customer
@@ -1,9 +1,10 @@
 from __future__ import annotations
 import datetime
 import logging
-from sqlalchemy import Column, Integer, ForeignKey, String, DateTime
+from sqlalchemy import Column, Integer, ForeignKey, String, Date, DateTime, Float, Index, UniqueConstraint
 from sqlalchemy.orm import relationship, validates
-from cutlistgenerator.database import Base, Auditing, Status, global_session, Session
+from cutlistgenerator.database import Base, Auditing, Status, global_session, Session, commit, session_type_hint
+from cutlistgenerator.database.cache import lookup_cache
 from cutlistgenerator.database.models.part import Part
 from cutlistgenerator.database.models.salesorder import SalesOrderItem
 from cutlistgenerator.database.models.wirecutter import WireCutter
@@ -26,13 +27,11 @@ class CutJobStatus(Status):
 
     @staticmethod
     def find_by_id(id: int) -> CutJobStatus:
-        return global_session.query(CutJobStatus).filter(CutJobStatus.id == id).first()
+        return lookup_cache.find_by_id(CutJobStatus, id)
 
     @staticmethod
     def find_by_name(name: str) -> CutJobStatus:
-        return (
-            global_session.query(CutJobStatus).filter(CutJobStatus.name == name).first()
-        )
+        return lookup_cache.find_by_name(CutJobStatus, name)
 
     @staticmethod
     def create_default_data():
@@ -53,7 +52,7 @@ class CutJobStatus(Status):
                 continue
             global_session.add(item)
             backend_logger.info(f"Creating {item}")
-        global_session.commit()
+        commit()
 
 
 class CutJobItemStatus(Status):
@@ -63,19 +62,11 @@ class CutJobItemStatus(Status):
 
     @staticmethod
     def find_by_id(id: int) -> CutJobItemStatus:
-        return (
-            global_session.query(CutJobItemStatus)
-            .filter(CutJobItemStatus.id == id)
-            .first()
-        )
+        return lookup_cache.find_by_id(CutJobItemStatus, id)
 
     @staticmethod
     def find_by_name(name: str) -> CutJobItemStatus:
-        return (
-            global_session.query(CutJobItemStatus)
-            .filter(CutJobItemStatus.name == name)
-            .first()
-        )
+        return lookup_cache.find_by_name(CutJobItemStatus, name)
 
     @staticmethod
     def find_all() -> list[CutJobItemStatus]:
@@ -104,13 +95,14 @@ class CutJobItemStatus(Status):
                 continue
             global_session.add(item)
             backend_logger.info(f"Creating {item}")
-        global_session.commit()
+        commit()
 
 
 class CutJob(Base, Auditing):
     """Represents a collection of parts for a WireCutter to prosess."""
 
     __tablename__ = "cut_job"
+    __table_args__ = (Index("ix_cut_job_date_modified", "date_modified"),)
     NUMBER_PREFIX = "CJ"
 
     items = relationship(
@@ -155,7 +147,7 @@ class CutJob(Base, Auditing):
             wire_cutter_id=wire_cutter.id,
         )
         global_session.add(cut_job)
-        global_session.commit()
+        commit()
         return cut_job
 
     def save(self):
@@ -164,13 +156,14 @@ class CutJob(Base, Auditing):
             global_session.add(self)
 
         self.date_modified = datetime.datetime.now()
-        global_session.commit()
+        commit()
 
 
 class CutJobItem(Base, Auditing):
     """Represents a part needing to be cut."""
 
     __tablename__ = "cut_job_item"
+    __table_args__ = (Index("ix_cut_job_item_date_modified", "date_modified"),)
 
     cut_job_id = Column(Integer, ForeignKey("cut_job.id"), nullable=False, index=True)
     cut_job = relationship("CutJob", back_populates="items")  # type: CutJob
@@ -205,6 +198,7 @@ class CutJobItem(Base, Auditing):
             result[column.name] = str(getattr(self, column.name))
         result["status"] = self.status.name
         result["part"] = self.part.to_dict()
+        result["estimated_time_minutes"] = self.estimated_time_minutes
         result.pop("part_id")
         result.pop("status_id")
 
@@ -256,9 +250,22 @@ class CutJobItem(Base, Auditing):
             self.cut_job.date_modified = datetime.datetime.now()
 
         self.date_modified = datetime.datetime.now()
-        global_session.commit()
+        commit()
         return value
 
+    @property
+    def estimated_time_minutes(self) -> float:
+        """Returns the estimated minutes to cut what is left of this item on its cut job's wire cutter.
+
+        Only reads the estimator's rates, refreshing them is up to the caller. total_time_minutes
+        is left for the time actually taken, which PartCutHistory records.
+        """
+        from cutlistgenerator.estimator import cut_time_estimator
+
+        return round(
+            cut_time_estimator.estimate_minutes(self.part_id, self.cut_job.wire_cutter_id, self.left_to_cut), 1
+        )
+
     @property
     def fully_cut(self) -> bool:
         """Returns True if the cut job item is fully cut."""
@@ -277,18 +284,18 @@ class CutJobItem(Base, Auditing):
         """Adds a sales order item to the cut job item."""
         if not self.id:
             global_session.add(self)
-            global_session.commit()
+            commit()
 
         if sales_order_item.cut_job_item_id != self.id:
             self.quantity_to_cut += sales_order_item.quantity_left_to_fulfill
         sales_order_item.set_cut_job_item(self)
-        global_session.commit()
+        commit()
 
     def remove_sales_order_item(self, sales_order_item: SalesOrderItem) -> None:
         """Removes a sales order item from the cut job item."""
         sales_order_item.remove_cut_job_item()
         self.quantity_to_cut -= sales_order_item.quantity_left_to_fulfill
-        global_session.commit()
+        commit()
 
     def save(self):
         """Saves the CutJobItem to the database."""
@@ -296,14 +303,14 @@ class CutJobItem(Base, Auditing):
             global_session.add(self)
 
         self.date_modified = datetime.datetime.now()
-        global_session.commit()
+        commit()
 
     def delete(self) -> RemovedCutJobItem:
         """Deletes the CutJobItem from the database."""
         removed_item = RemovedCutJobItem.create_from_cut_job_item(self)
         if self.id:
             global_session.delete(self)
-        global_session.commit()
+        commit()
         return removed_item
 
 
@@ -338,6 +345,9 @@ class PartCutHistory(Base):
 
     @staticmethod
     def create_from_cut_job_item(item: CutJobItem, quantity_cut=None) -> None:
+        """Records a cut and adds it to the PartCutHistorySummary buckets in the same transaction."""
+        from cutlistgenerator.database.cuthistory import add_to_summary
+
         history = PartCutHistory(
             part_id=item.part_id,
             wire_cutter_id=item.cut_job.wire_cutter_id,
@@ -345,25 +355,69 @@ class PartCutHistory(Base):
             total_time_minutes=item.total_time_minutes,
         )
         global_session.add(history)
-        global_session.commit()
+        global_session.flush()
+        add_to_summary([history], global_session)
+        commit()
 
     @staticmethod
-    def find_by_part(part: Part) -> list[PartCutHistory]:
+    def find_by_part(part: Part, session: session_type_hint = None) -> list[PartCutHistory]:
         """Finds all PartCutHistory for a given part."""
+        if not session:
+            session = global_session
         return (
-            global_session.query(PartCutHistory)
+            session.query(PartCutHistory)
             .filter(PartCutHistory.part_id == part.id)
             .order_by(PartCutHistory.event_date.desc())
             .all()
         )
 
     @staticmethod
-    def find_by_part_number(number: str) -> list[PartCutHistory]:
+    def find_by_part_number(number: str, session: session_type_hint = None) -> list[PartCutHistory]:
         """Finds all PartCutHistory for a given part number."""
-        part = Part.find_by_number(number)
+        if not session:
+            session = global_session
+        part = session.query(Part).filter(Part.number == number).first()
         if not part:
             return None
-        return PartCutHistory.find_by_part(part)
+        return PartCutHistory.find_by_part(part, session=session)
+
+
+class PartCutHistorySummary(Base):
+    """PartCutHistory rolled up per part, wire cutter and day or week.
+
+    Kept up to date by PartCutHistory.create_from_cut_job_item, so reports read one
+    row per bucket instead of every cut. See cutlistgenerator.database.cuthistory."""
+
+    __tablename__ = "part_cut_history_summary"
+    # fmt: off
+    __table_args__ = (
+        UniqueConstraint("part_id", "period", "period_start", "wire_cutter_id", name="uq_part_cut_history_summary_bucket"),
+    )
+    # fmt: on
+    PERIODS = ("day", "week")
+
+    part_id = Column(Integer, ForeignKey("part.id"), nullable=False)
+    wire_cutter_id = Column(
+        Integer, ForeignKey("wire_cutter.id"), nullable=False, index=True
+    )
+    period = Column(String(4), nullable=False)
+    """Either "day" or "week"."""
+    period_start = Column(Date, nullable=False)
+    """The day, or the Monday of the week."""
+    cut_count = Column(Integer, nullable=False, default=0)
+    quantity_cut = Column(Integer, nullable=False, default=0)
+    total_time_minutes = Column(Integer, nullable=False, default=0)
+    min_rate = Column(Float, nullable=True)
+    """Fewest minutes per unit of any cut in the bucket. None if nothing was counted."""
+    max_rate = Column(Float, nullable=True)
+    """Most minutes per unit of any cut in the bucket."""
+
+    @property
+    def avg_rate(self) -> float:
+        """Minutes per unit over all cuts in the bucket."""
+        if not self.quantity_cut:
+            return None
+        return self.total_time_minutes / self.quantity_cut
 
 
 class RemovedCutJobItem(Base):
@@ -391,5 +445,5 @@ class RemovedCutJobItem(Base):
             total_time_minutes = item.total_time_minutes
         )
         global_session.add(item)
-        global_session.commit()
+        commit()
         return item
\ No newline at end of file
@@ -10,6 +10,7 @@ from sqlalchemy import (
 )
 from sqlalchemy.orm import relationship, validates
 from cutlistgenerator.database import Base, Type_, global_session
+from cutlistgenerator.database.cache import lookup_cache
 from cutlistgenerator.database.models.part import Part
 
 
@@ -24,7 +25,7 @@ class LocationType(Type_):
     @staticmethod
     def find_by_name(name: str) -> LocationType:
         """Find a location type by name."""
-        return global_session.query(LocationType).filter_by(name=name).first()
+        return lookup_cache.find_by_name(LocationType, name)
 
     @staticmethod
     def find_all() -> list[LocationType]:
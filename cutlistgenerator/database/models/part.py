@@ -1,11 +1,12 @@
 from __future__ import annotations
 from datetime import datetime
 import logging
-from sqlalchemy import Column, String, Boolean, Integer, ForeignKey
+from sqlalchemy import Column, String, Boolean, Integer, ForeignKey, update
 from sqlalchemy.orm import relationship
 from sqlalchemy.orm.collections import collection
 
-from cutlistgenerator.database import Auditing, Base, DeclarativeBase, global_session, session_type_hint
+from cutlistgenerator.database import Auditing, Base, DeclarativeBase, fulltext_index, global_session, session_type_hint, commit, unit_of_work
+from cutlistgenerator.database.models.audit import BulkUpdateLog
 from cutlistgenerator.settings import DEFAULT_DUE_DATE_PUSH_BACK_DAYS
 
 logger = logging.getLogger("backend")
@@ -21,6 +22,7 @@ class Part(Base, Auditing):
     """Represents a part."""
 
     __tablename__ = "part"
+    __table_args__ = (fulltext_index("part", "number"),)
 
     description = Column(String(256), default="")
     number = Column(String(256), unique=True, nullable=False)
@@ -47,7 +49,7 @@ class Part(Base, Auditing):
 
         self.children.append(child)
         self.date_modified = datetime.now()
-        global_session.commit()
+        commit()
 
     @property
     def parent(self) -> Part:
@@ -71,19 +73,55 @@ class Part(Base, Auditing):
         """Set the excluded_from_import flag."""
         self.excluded_from_import = excluded_from_import
         self.date_modified = datetime.now()
-        global_session.commit()
+        commit()
+
+    @staticmethod
+    def set_excluded_from_import_for_parts(
+        parts: list[Part],
+        excluded_from_import: bool,
+        session: session_type_hint = None,
+    ) -> int:
+        """Set the excluded_from_import flag on many parts with a single UPDATE.
+
+        An audit row is written in the same transaction.
+
+        Args:
+            parts (list[Part]): Parts to update.
+            excluded_from_import (bool): Value to set.
+            session (Session, optional): Session to use for this operation. Defaults to Global Session.
+
+        Returns:
+            int: Number of parts that changed.
+        """
+        if not session:
+            session = global_session
+        part_ids = sorted({part.id for part in parts})
+        if not part_ids:
+            return 0
+        with unit_of_work(session):
+            total = session.execute(
+                update(Part)
+                .where(
+                    Part.id.in_(part_ids),
+                    Part.excluded_from_import != excluded_from_import,
+                )
+                .values(excluded_from_import=excluded_from_import, date_modified=datetime.now())
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            BulkUpdateLog.add("set excluded from import", Part.__tablename__, excluded_from_import, part_ids, total, session)
+        return total
 
     def set_due_date_push_back_days(self, days: int) -> None:
         """Set the due_date_push_back_days."""
         self.due_date_push_back_days = days
         self.date_modified = datetime.now()
-        global_session.commit()
+        commit()
 
     def set_parent(self, parent: Part) -> None:
         """Set the parent part."""
         self.parent_id = parent.id
         self.date_modified = datetime.now()
-        global_session.commit()
+        commit()
 
     @staticmethod
     def find_by_number(number: str) -> Part:
@@ -113,7 +151,7 @@ class Part(Base, Auditing):
         part = Part(number=number, description=description)
         global_session.add(part)
         if not skip_commit:
-            global_session.commit()
+            commit()
         logger.debug(f"Creating part {part}")
         return part
 
@@ -1,11 +1,13 @@
 from __future__ import annotations
 import datetime
 import logging
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Float, Boolean
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Float, Boolean, Index, and_, exists, or_, select, update
 from sqlalchemy.orm import backref, relationship
-from cutlistgenerator.database import Auditing, Base, Session, Status, global_session, session_type_hint
+from cutlistgenerator.database import Auditing, Base, Session, Status, Type_, fulltext_index, global_session, session_type_hint, commit, unit_of_work
+from cutlistgenerator.database.cache import lookup_cache
+from cutlistgenerator.database.models.audit import BulkUpdateLog
 from cutlistgenerator.database.models.customer import Customer
-from cutlistgenerator.database.models.part import Part
+from cutlistgenerator.database.models.part import ParentToChildPart, Part
 
 backend_logger = logging.getLogger("backend")
 
@@ -20,11 +22,7 @@ class SalesOrderStatus(Status):
 
     @staticmethod
     def find_by_id(id: int) -> SalesOrderStatus:
-        return (
-            global_session.query(SalesOrderStatus)
-            .filter(SalesOrderStatus.id == id)
-            .first()
-        )
+        return lookup_cache.find_by_id(SalesOrderStatus, id)
 
     @staticmethod
     def find_all() -> list[SalesOrderStatus]:
@@ -34,11 +32,7 @@ class SalesOrderStatus(Status):
 
     @staticmethod
     def find_by_name(name: str) -> SalesOrderStatus:
-        return (
-            global_session.query(SalesOrderStatus)
-            .filter(SalesOrderStatus.name == name)
-            .first()
-        )
+        return lookup_cache.find_by_name(SalesOrderStatus, name)
 
     @staticmethod
     def create_default_data():
@@ -63,7 +57,7 @@ class SalesOrderStatus(Status):
                 continue
             global_session.add(item)
             backend_logger.info(f"Creating {item}")
-        global_session.commit()
+        commit()
 
 
 class SalesOrderItemStatus(Status):
@@ -76,19 +70,11 @@ class SalesOrderItemStatus(Status):
 
     @staticmethod
     def find_by_id(id: int) -> SalesOrderItemStatus:
-        return (
-            global_session.query(SalesOrderItemStatus)
-            .filter(SalesOrderItemStatus.id == id)
-            .first()
-        )
+        return lookup_cache.find_by_id(SalesOrderItemStatus, id)
 
     @staticmethod
     def find_by_name(name: str) -> SalesOrderItemStatus:
-        return (
-            global_session.query(SalesOrderItemStatus)
-            .filter(SalesOrderItemStatus.name == name)
-            .first()
-        )
+        return lookup_cache.find_by_name(SalesOrderItemStatus, name)
 
     @staticmethod
     def create_default_data():
@@ -117,22 +103,20 @@ class SalesOrderItemStatus(Status):
                 continue
             global_session.add(item)
             backend_logger.info(f"Creating {item}")
-        global_session.commit()
+        commit()
 
 
-class SalesOrderItemType(Base):
+class SalesOrderItemType(Type_):
     """Represents the type of a sales order item."""
 
     __tablename__ = "sales_order_item_type"
 
-    name = Column(String(50), nullable=False, unique=True)
-
     def __repr__(self) -> str:
         return f"<SalesOrderItemType(id={self.id}, name='{self.name}')>"
 
     @staticmethod
     def find_by_name(name: str) -> SalesOrderItemType:
-        return global_session.query(SalesOrderItemType).filter_by(name=name).first()
+        return lookup_cache.find_by_name(SalesOrderItemType, name)
 
     @staticmethod
     def create_default_data():
@@ -162,11 +146,15 @@ class SalesOrderItemType(Base):
                 continue
             global_session.add(item)
             backend_logger.info(f"Creating {item}")
-        global_session.commit()
+        commit()
 
 
 class SalesOrder(Base, Auditing):
     __tablename__ = "sales_order"
+    __table_args__ = (
+        fulltext_index("sales_order", "number"),
+        Index("ix_sales_order_date_modified", "date_modified"),
+    )
 
     customer_id = Column(Integer, ForeignKey("customer.id"), index=True)
     customer = relationship("Customer", foreign_keys=[customer_id])  # type: Customer
@@ -194,7 +182,7 @@ class SalesOrder(Base, Auditing):
             result[column.name] = str(getattr(self, column.name))
         result["customer"] = self.customer.to_dict()
         if include_items:
-            result["items"] = [item.to_dict() for item in self.items]
+            result["items"] = [item.to_dict(include_sales_order=False) for item in self.items]
         result["status"] = self.status.to_dict()
         result.pop("status_id")
         result.pop("customer_id")
@@ -225,7 +213,7 @@ class SalesOrder(Base, Auditing):
             status_id=status.id,
         )
         session.add(sales_order)
-        session.commit()
+        commit(session)
         backend_logger.debug(f"Creating sales order {sales_order}.")
         return sales_order
 
@@ -260,17 +248,31 @@ class SalesOrder(Base, Auditing):
         )
 
     @staticmethod
-    def remove_empty_orders():
+    def remove_empty_orders() -> int:
         """Removes all sales orders that have no items."""
-        orders = global_session.query(SalesOrder).all()
-        for order in orders:
-            if not order.items:
-                global_session.delete(order)
-        global_session.commit()
+        total = (
+            global_session.query(SalesOrder)
+            .filter(~exists().where(SalesOrderItem.sales_order_id == SalesOrder.id))
+            .delete(synchronize_session=False)
+        )
+        commit()
+        return total
 
 
 class SalesOrderItem(Base, Auditing):
     __tablename__ = "sales_order_item"
+    # fmt: off
+    __table_args__ = (
+        # Sync lookups match Fishbowl items on (fb_so_item_id, line_number).
+        Index("ix_sales_order_item_fb_so_item_id_line_number", "fb_so_item_id", "line_number"),
+        # Uncut items in due date order. InnoDB appends id, which covers the table's keyset.
+        Index("ix_sales_order_item_is_cut_date_scheduled_fulfillment", "is_cut", "date_scheduled_fulfillment"),
+        # Items for a part, optionally only the uncut ones. Replaces ix_sales_order_item_part_id.
+        Index("ix_sales_order_item_part_id_is_cut", "part_id", "is_cut"),
+        # MAX(date_modified) versions the API's cached responses.
+        Index("ix_sales_order_item_date_modified", "date_modified"),
+    )
+    # fmt: on
 
     cut_job_item_id = Column(Integer, ForeignKey("cut_job_item.id"), nullable=True)
     cut_job_item = relationship(
@@ -287,7 +289,7 @@ class SalesOrderItem(Base, Auditing):
         remote_side="SalesOrderItem.id",
         backref=backref("child_items", order_by=line_number),
     )  # type: SalesOrderItem
-    part_id = Column(Integer, ForeignKey("part.id"), index=True)
+    part_id = Column(Integer, ForeignKey("part.id"))
     part = relationship("Part", foreign_keys=[part_id])  # type: Part
     quantity_fulfilled = Column(Float, nullable=False)
     quantity_ordered = Column(Float, nullable=False)
@@ -313,16 +315,23 @@ class SalesOrderItem(Base, Auditing):
     def __str__(self) -> str:
         return f"Id: {self.id} Line: {self.line_number} Part: {self.part.number}"
 
-    def to_dict(self) -> dict:
+    def to_dict(self, include_sales_order: bool = True) -> dict:
+        """Returns the item as a dict.
+
+        Args:
+            include_sales_order (bool, optional): Include the parent sales order. Leave it out when
+                serializing the items of an order that is already being serialized. Defaults to True.
+        """
         result = {}
         for column in self.__table__.columns:
             result[column.name] = str(getattr(self, column.name))
         result["pushed_back_due_date"] = self.pushed_back_due_date.strftime("%Y-%m-%d")
-        result["parent_item"] = self.parent_item.to_dict() if self.parent_item else None
+        result["parent_item"] = self.parent_item.to_dict(include_sales_order) if self.parent_item else None
         result["part"] = self.part.to_dict()
         result["status"] = self.status.to_dict()
         result["type"] = self.type.to_dict()
-        result["sales_order"] = self.sales_order.to_dict(include_items=False)
+        if include_sales_order:
+            result["sales_order"] = self.sales_order.to_dict(include_items=False)
         result.pop("status_id")
         result.pop("type_id")
         result.pop("part_id")
@@ -371,44 +380,29 @@ class SalesOrderItem(Base, Auditing):
         """Sets the is_cut flag."""
         self.is_cut = is_cut
         self.date_modified = datetime.datetime.now()
-        global_session.commit()
+        commit()
 
     def set_cut_job_item(self, cut_job_item) -> None:
         """Sets the cut job item."""
         self.cut_job_item_id = cut_job_item.id
         self.date_modified = datetime.datetime.now()
-        global_session.commit()
+        commit()
 
     def remove_cut_job_item(self) -> None:
         """Removes the cut job item."""
         self.cut_job_item_id = None
         self.date_modified = datetime.datetime.now()
-        global_session.commit()
+        commit()
     
     def delete(self) -> None:
-        """Deletes the item from DB."""
-        removed_so_item = RemovedSalesOrderItem.create_from_so_item(self)
-        removed_cut_job_item = None
-        try:
-            if self.parent_item:
-                backend_logger.info(f"Deleting parent SO item {self.parent_item}")
-                self.parent_item.delete()
-
-            if self.cut_job_item:
-                backend_logger.info(f"Deleting Cut Job Item {self.cut_job_item}")
-                cut_job_item = self.cut_job_item
-                self.cut_job_item_id = None
-                global_session.commit()
-                removed_cut_job_item = cut_job_item.delete()
-            backend_logger.info(f"Deleting So Item {self}")
-            global_session.delete(self)
-            global_session.commit()
-        except Exception as e:
-            global_session.delete(removed_so_item)
-            if removed_cut_job_item:
-                global_session.delete(removed_cut_job_item)
-            global_session.commit()
-            raise e
+        """Deletes the item from DB, with its parent item, child items and cut job item.
+
+        See delete_sales_order_items.
+        """
+        from cutlistgenerator.database.deletion import delete_sales_order_items
+
+        backend_logger.info(f"Deleting So Item {self}")
+        delete_sales_order_items([self.id])
 
     @staticmethod
     def find_by_fishbowl_sales_order_item_id(
@@ -461,32 +455,86 @@ class SalesOrderItem(Base, Auditing):
     @staticmethod
     def remove_part_from_all_items(part: Part) -> int:
         """Removes the part from all sales order items."""
-        so_items = (
-            global_session.query(SalesOrderItem)
-            .filter(SalesOrderItem.part_id == part.id)
-            .all()
-        )
-        total = 0
-        for item in so_items:
-            total += 1
-            global_session.delete(item)
-        global_session.commit()
-        SalesOrder.remove_empty_orders()
-        return total
+        from cutlistgenerator.database.deletion import delete_sales_order_items
+
+        item_ids = [
+            id for id, in global_session.query(SalesOrderItem.id).filter(SalesOrderItem.part_id == part.id)
+        ]
+        return delete_sales_order_items(item_ids).sales_order_items
 
     @staticmethod
     def set_is_cut_for_all_parts(part: Part) -> int:
         """Sets the is cut flag for all items with this part."""
-        so_items = (
-            global_session.query(SalesOrderItem)
-            .filter(SalesOrderItem.part_id == part.id)
-            .all()
-        )
-        total = 0
-        for item in so_items:
-            total += 1
-            item.set_is_cut(True)
+        return SalesOrderItem.set_is_cut_for_parts([part], True)
+
+    @staticmethod
+    def set_is_cut_for_parts(
+        parts: list[Part],
+        is_cut: bool,
+        session: session_type_hint = None,
+    ) -> int:
+        """Sets the is cut flag with a single UPDATE on every item for these parts and on their child items.
+
+        Child items are the "N.k" lines the sync adds under an item for each child part. They
+        share the item's fb_so_item_id and their part is a child of the item's part in
+        ParentToChildPart. An audit row is written in the same transaction.
+
+        Args:
+            parts (list[Part]): Parts whose items to update.
+            is_cut (bool): Value to set.
+            session (Session, optional): Session to use for this operation. Defaults to Global Session.
+
+        Returns:
+            int: Number of items that changed.
+        """
+        if not session:
+            session = global_session
+        part_ids = sorted({part.id for part in parts})
+        if not part_ids:
+            return 0
+        with unit_of_work(session):
+            # MySQL can not select from the table an UPDATE is changing, so the items are read first.
+            items = session.query(SalesOrderItem.id, SalesOrderItem.fb_so_item_id).filter(
+                SalesOrderItem.part_id.in_(part_ids)
+            ).all()
+            total = 0
+            if items:
+                child_part_ids = select(ParentToChildPart.child_id).where(ParentToChildPart.parent_id.in_(part_ids))
+                total = session.execute(
+                    update(SalesOrderItem)
+                    .where(
+                        or_(
+                            SalesOrderItem.id.in_([id for id, _ in items]),
+                            and_(
+                                SalesOrderItem.fb_so_item_id.in_(sorted({fb_so_item_id for _, fb_so_item_id in items})),
+                                SalesOrderItem.part_id.in_(child_part_ids),
+                            ),
+                        ),
+                        SalesOrderItem.is_cut != is_cut,
+                    )
+                    .values(is_cut=is_cut, date_modified=datetime.datetime.now())
+                    .execution_options(synchronize_session=False)
+                ).rowcount
+            BulkUpdateLog.add("set is cut", SalesOrderItem.__tablename__, is_cut, part_ids, total, session)
         return total
+
+    @staticmethod
+    def exclude_parts_from_import(parts: list[Part], set_is_cut: bool = True) -> tuple[int, int]:
+        """Exclude parts from import and optionally set all of their items as cut, in one transaction.
+
+        Args:
+            parts (list[Part]): Parts to exclude.
+            set_is_cut (bool, optional): Also set the parts' items and their child items as cut. Defaults to True.
+
+        Returns:
+            tuple[int, int]: Number of parts and number of sales order items that changed.
+        """
+        with unit_of_work():
+            total_parts = Part.set_excluded_from_import_for_parts(parts, True)
+            total_items = 0
+            if set_is_cut:
+                total_items = SalesOrderItem.set_is_cut_for_parts(parts, True)
+        return total_parts, total_items
     
     @staticmethod
     def create(
@@ -523,7 +571,7 @@ class SalesOrderItem(Base, Auditing):
             type_id=type.id,
         )
         global_session.add(sales_order_item)
-        global_session.commit()
+        commit()
         backend_logger.debug(f"Creating sales order item {sales_order_item}.")
 
 
@@ -567,5 +615,5 @@ class RemovedSalesOrderItem(Base):
         )
 
         global_session.add(item)
-        global_session.commit()
+        commit()
         return item
\ No newline at end of file
@@ -1,9 +1,10 @@
 from __future__ import annotations
+import datetime
 import logging
 from sqlalchemy import Column, String, Boolean
 from sqlalchemy.orm import validates
 
-from cutlistgenerator.database import Auditing, Base, global_session
+from cutlistgenerator.database import Auditing, Base, global_session, session_type_hint, commit
 
 backend_logger = logging.getLogger("backend")
 
@@ -23,6 +24,8 @@ class SystemProperty(Base, Auditing):
 
     def convert_value(self):
         """Converts value from string to type specified in type_."""
+        if self.type_ in ("str", "string"):
+            return
         self.value = eval(f"{self.type_}({self.value})")
 
     @staticmethod
@@ -33,6 +36,19 @@ class SystemProperty(Base, Auditing):
             obj.convert_value()
         return obj
 
+    @staticmethod
+    def set_value(key: str, value, type_: str = "str", session: session_type_hint = None) -> SystemProperty:
+        """Creates or updates a system property. Does not commit."""
+        if not session:
+            session = global_session
+        obj = session.query(SystemProperty).filter_by(key=key).first()
+        if not obj:
+            obj = SystemProperty(key=key, type_=type_)
+            session.add(obj)
+        obj.value = str(value)
+        obj.date_modified = datetime.datetime.now()
+        return obj
+
     # fmt: off
     @staticmethod
     def create_default_data():
@@ -50,6 +66,6 @@ class SystemProperty(Base, Auditing):
                 continue
             global_session.add(item)
             backend_logger.info(f"Creating {item}")
-        global_session.commit()
+        commit()
 
     # fmt: on
@@ -9,7 +9,7 @@ from sqlalchemy.orm import relationship
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.sql.sqltypes import JSON, BigInteger
 from cutlistgenerator import errors
-from cutlistgenerator.database import Base, global_session
+from cutlistgenerator.database import Base, global_session, commit
 
 
 logged_in_users = {}  # type: dict[str, User]
@@ -57,7 +57,7 @@ class User(Base):
                 continue
             global_session.add(user)
             backend_logger.info(f"Creating {user}")
-        global_session.commit()
+        commit()
 
     @property
     def password(self):
@@ -136,7 +136,7 @@ class User(Base):
         if self.is_superuser and not self.active_flag:
             raise errors.SaveError("Superuser cannot be deactivated.")
         self.date_last_modified = datetime.datetime.now()
-        global_session.commit()
+        commit()
 
     def delete(self) -> None:
         """Delete the user from the database."""
@@ -144,7 +144,7 @@ class User(Base):
             raise errors.DeleteError("Superuser cannot be deleted.")
         try:
             global_session.delete(self)
-            global_session.commit()
+            commit()
         except SQLAlchemyError as e:
             global_session.rollback()
             raise errors.DatabaseError(str(e)) from e
@@ -195,7 +195,7 @@ class UserLoginEventType(Base):
                 continue
             global_session.add(event_type)
             backend_logger.info(f"Creating {event_type}")
-        global_session.commit()
+        commit()
 
 
 class UserLoginLog(Base):
@@ -220,7 +220,7 @@ class UserLoginLog(Base):
                 event_type_id=UserLoginEventType.find_by_name("Login").id, user=user
             )
         )
-        global_session.commit()
+        commit()
 
     @staticmethod
     def on_logout(user: User) -> None:
@@ -230,7 +230,20 @@ class UserLoginLog(Base):
                 event_type_id=UserLoginEventType.find_by_name("Logout").id, user=user
             )
         )
-        global_session.commit()
+        commit()
+
+
+class ApiTokenRecord(Base):
+    """An API token, used by the database backed token store so tokens are shared between API processes."""
+
+    __tablename__ = "sysuser_api_token"
+
+    token = Column(String(64), nullable=False, unique=True)
+    user_id = Column(Integer, ForeignKey("sysuser.id"), nullable=False, index=True)
+    expires = Column(DateTime, nullable=False, index=True)
+
+    def __repr__(self) -> str:
+        return f"<ApiTokenRecord(user_id={self.user_id}, expires={self.expires})>"
 
 
 class UserProperty(Base):
@@ -248,7 +261,7 @@ class UserProperty(Base):
         """Save the user property to the database."""
         if self.id is None:
             global_session.add(self)
-        global_session.commit()
+        commit()
 
     def __repr__(self) -> str:
         """Return a string representation of the object."""
@@ -280,5 +293,5 @@ class UserProperty(Base):
         """Create a new user property."""
         obj = UserProperty(user_id=user_id, name=name, value=value)
         global_session.add(obj)
-        global_session.commit()
+        commit()
         return obj
@@ -3,7 +3,7 @@ import logging
 import datetime
 from sqlalchemy import Column, Integer, String, ForeignKey, Float
 from sqlalchemy.orm import relationship
-from cutlistgenerator.database import Base, Auditing, global_session
+from cutlistgenerator.database import Base, Auditing, global_session, commit
 
 
 backend_logger = logging.getLogger("backend")
@@ -67,7 +67,7 @@ class WireSize(Base):
                 continue
             global_session.add(item)
             backend_logger.info(f"Creating {item}")
-        global_session.commit()
+        commit()
 
 
 class WireCutterOption(Base, Auditing):
@@ -104,7 +104,7 @@ class WireCutter(Base, Auditing):
 
     def save(self) -> None:
         self.date_modified = datetime.datetime.now()
-        global_session.commit()
+        commit()
 
     @staticmethod
     def find_by_name(name: str) -> WireCutter:
@@ -129,7 +129,7 @@ class WireCutter(Base, Auditing):
             raise Exception(f"Wire cutter {name} already exists")
         wire_cutter = WireCutter(name=name, max_wire_size_id=max_wire_size.id)
         global_session.add(wire_cutter)
-        global_session.commit()
+        commit()
         return wire_cutter
 
     @staticmethod
@@ -147,4 +147,4 @@ class WireCutter(Base, Auditing):
                 continue
             global_session.add(item)
             backend_logger.info(f"Creating {item}")
-        global_session.commit()
+        commit()
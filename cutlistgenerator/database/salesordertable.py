@@ -0,0 +1,234 @@
+"""Queries behind the sales order table in the main window.
+
+Rows are read a page at a time using keyset pagination on the sort column
+and id, (date_scheduled_fulfillment, id) by default, so each page starts
+where the last one ended no matter how far down the table the user has
+scrolled. Sorting by another column runs the query again in that order
+rather than reading and sorting every row in memory. NULLs sort after
+every value, or before them when descending.
+
+The query selects plain columns only. The pushed back due date, converted
+customer name, cut job flag and parent part are all worked out in SQL, so a
+page is one round trip with no lazy loads.
+"""
+from __future__ import annotations
+import datetime
+from dataclasses import dataclass
+from typing import Any, NamedTuple
+from sqlalchemy import DateTime, and_, case, func, literal, literal_column, or_, select
+from sqlalchemy.orm import Query, aliased
+from cutlistgenerator.database import Session, global_session, search, session_type_hint
+from cutlistgenerator.database.models.customer import Customer, CustomerNameConversion
+from cutlistgenerator.database.models.part import Part, ParentToChildPart
+from cutlistgenerator.database.models.salesorder import (
+    SalesOrder,
+    SalesOrderItem,
+    SalesOrderStatus,
+)
+
+PageCursor = tuple[Any, int]
+"""(sort column value, id) of the last row on the previous page."""
+
+NOT_NULL_FIELDS = {"id", "date_scheduled_fulfillment", "so_number", "part_number", "has_cut_job", "is_cut"}
+"""Fields that are never NULL, which are ordered without the extra NULLs last term so indexes can serve them."""
+
+
+class SalesOrderTableRow(NamedTuple):
+    """One row of the sales order table."""
+
+    id: int
+    """Sales order item id."""
+    date_scheduled_fulfillment: datetime.datetime
+    pushed_back_due_date: datetime.datetime
+    customer_name: str
+    """Converted customer name."""
+    so_number: str
+    line_number: str
+    part_number: str
+    part_description: str
+    quantity_left_to_fulfill: float
+    has_cut_job: bool
+    is_cut: bool
+    parent_part_number: str
+    parent_part_description: str
+
+
+@dataclass
+class SalesOrderSearchCriteria:
+    """The search criteria for the sales order table."""
+
+    so_number: str = ""
+    customer_name: str = ""
+    part_number: str = ""
+    parent_part_number: str = ""
+    show_fully_cut: bool = False
+    due_date_start: datetime.date = None
+    """First due date to include. None includes all dates."""
+    due_date_end: datetime.date = None
+    """Last due date to include. None includes all dates."""
+    sort_by: str = "date_scheduled_fulfillment"
+    """SalesOrderTableRow field to order the rows by."""
+    descending: bool = False
+
+
+def build_query(criteria: SalesOrderSearchCriteria, session: session_type_hint = None) -> Query:
+    """Returns the filtered, unordered sales order table query.
+
+    Args:
+        criteria (SalesOrderSearchCriteria): Filters to apply.
+        session (Session, optional): Session to use for this operation. Defaults to Global Session.
+
+    Returns:
+        Query: Query of rows with the SalesOrderTableRow columns.
+    """
+    if not session:
+        session = global_session
+    so_open_status = SalesOrderStatus.find_by_name("In Progress")
+    ParentItem = aliased(SalesOrderItem)
+    ParentPart = aliased(Part)
+    query = (
+        session.query(
+            SalesOrderItem.id,
+            SalesOrderItem.date_scheduled_fulfillment,
+            func.timestampadd(
+                literal_column("DAY"),
+                -Part.due_date_push_back_days,
+                SalesOrderItem.date_scheduled_fulfillment,
+                type_=DateTime,
+            ),
+            func.coalesce(func.nullif(CustomerNameConversion.name, ""), Customer.name),
+            SalesOrder.number,
+            SalesOrderItem.line_number,
+            Part.number,
+            Part.description,
+            SalesOrderItem.quantity_to_fulfill
+            - SalesOrderItem.quantity_fulfilled
+            - SalesOrderItem.quantity_picked,
+            case((SalesOrderItem.cut_job_item_id != None, True), else_=False),
+            SalesOrderItem.is_cut,
+            ParentPart.number,
+            ParentPart.description,
+        )
+        .select_from(SalesOrder)
+        .join(Customer, Customer.id == SalesOrder.customer_id)
+        .outerjoin(CustomerNameConversion, CustomerNameConversion.customer_id == Customer.id)
+        .join(SalesOrderItem, SalesOrderItem.sales_order_id == SalesOrder.id)
+        .join(Part, Part.id == SalesOrderItem.part_id)
+        .outerjoin(ParentItem, ParentItem.id == SalesOrderItem.parent_item_id)
+        .outerjoin(ParentPart, ParentPart.id == ParentItem.part_id)
+    )
+
+    query = query.filter(
+        SalesOrderItem.quantity_to_fulfill
+        - SalesOrderItem.quantity_fulfilled
+        - SalesOrderItem.quantity_picked
+        > 0
+    )
+
+    query = query.filter(SalesOrder.status_id <= so_open_status.id)
+    query = query.filter(Part.excluded_from_import == False)
+
+    if not criteria.show_fully_cut:
+        query = query.filter(SalesOrderItem.is_cut == False)
+
+    if criteria.so_number != "":
+        query = query.filter(search.contains(session, SalesOrder.number, criteria.so_number))
+
+    if criteria.customer_name != "":
+        query = query.filter(search.contains(session, Customer.name, criteria.customer_name))
+
+    if criteria.part_number != "":
+        query = query.filter(search.contains(session, Part.number, criteria.part_number))
+
+    if criteria.parent_part_number != "":
+        FilterPart = aliased(Part)
+        child_ids = (
+            select(ParentToChildPart.child_id)
+            .join(FilterPart, FilterPart.id == ParentToChildPart.parent_id)
+            .where(FilterPart.number == criteria.parent_part_number)
+        )
+        query = query.filter(
+            or_(Part.number == criteria.parent_part_number, Part.id.in_(child_ids))
+        )
+
+    if criteria.due_date_start is not None:
+        query = query.filter(
+            SalesOrderItem.date_scheduled_fulfillment >= criteria.due_date_start
+        )
+    if criteria.due_date_end is not None:
+        query = query.filter(
+            SalesOrderItem.date_scheduled_fulfillment <= criteria.due_date_end
+        )
+    return query
+
+
+def fetch_page(
+    query: Query,
+    after: PageCursor = None,
+    limit: int = 200,
+    sort_by: str = "date_scheduled_fulfillment",
+    descending: bool = False,
+) -> tuple[list[SalesOrderTableRow], PageCursor]:
+    """Returns the next page of query and the cursor for the page after it.
+
+    Args:
+        query (Query): Query from build_query.
+        after (PageCursor, optional): Cursor returned with the previous page. Defaults to the first page.
+        limit (int, optional): Rows per page. Defaults to 200.
+        sort_by (str, optional): SalesOrderTableRow field to order by, then by id. Defaults to the due date.
+        descending (bool, optional): Order from the largest value down. Defaults to False.
+
+    Returns:
+        tuple[list[SalesOrderTableRow], PageCursor]: The rows and the cursor of the last row, None if the page is empty.
+    """
+    field = SalesOrderTableRow._fields.index(sort_by)
+    column = query.column_descriptions[field]["expr"] if sort_by != "id" else SalesOrderItem.id
+    nullable = sort_by not in NOT_NULL_FIELDS
+    if after is not None:
+        value, id = after
+        after_id = SalesOrderItem.id < id if descending else SalesOrderItem.id > id
+        if sort_by == "id":
+            query = query.filter(after_id)
+        elif value is None:
+            # NULLs come last ascending and first descending.
+            same = and_(column == None, after_id)
+            query = query.filter(or_(same, column != None) if descending else same)
+        else:
+            # Bound as a literal so the boolean columns compare like any other value.
+            value = literal(value)
+            past = column < value if descending else column > value
+            past = or_(past, and_(column == value, after_id))
+            query = query.filter(or_(past, column == None) if nullable and not descending else past)
+
+    order = [column] if sort_by == "id" else [column, SalesOrderItem.id]
+    if descending:
+        order = [term.desc() for term in order]
+    if nullable:
+        order.insert(0, (column == None).desc() if descending else column == None)
+    rows = [SalesOrderTableRow(*row) for row in query.order_by(*order).limit(limit)]
+    if not rows:
+        return rows, None
+    return rows, (rows[-1][field], rows[-1].id)
+
+
+def read_page(criteria: SalesOrderSearchCriteria, after: PageCursor = None, limit: int = 200) -> tuple[list[SalesOrderTableRow], PageCursor]:
+    """Build the query and read one page in a short lived session.
+
+    Does not use the global session, so it is safe to call from a worker thread.
+
+    Args:
+        criteria (SalesOrderSearchCriteria): Filters to apply.
+        after (PageCursor, optional): Cursor returned with the previous page. Defaults to the first page.
+        limit (int, optional): Rows per page. Defaults to 200.
+
+    Returns:
+        tuple[list[SalesOrderTableRow], PageCursor]: The rows and the cursor of the last row, None if the page is empty.
+    """
+    with Session() as session:
+        return fetch_page(
+            build_query(criteria, session),
+            after=after,
+            limit=limit,
+            sort_by=criteria.sort_by,
+            descending=criteria.descending,
+        )
@@ -0,0 +1,60 @@
+"""Substring search backed by the FULLTEXT ngram indexes from fulltext_index.
+
+On MySQL a substring filter becomes MATCH ... AGAINST, which is answered from the
+index, paired with the original LIKE '%text%' that decides the result. The MATCH
+only narrows the rows the LIKE has to look at, so it must never drop a row the LIKE
+would keep:
+
+- The indexes are built without stopwords (see migrations.ddl_connection). With
+  InnoDB's default list, every ngram containing a stopword such as "a" or "i" would
+  be missing from the index.
+- Only runs of letters and digits at least NGRAM_TOKEN_SIZE long are matched, each as
+  its own phrase. Whitespace and punctuation split ngrams differently in the index
+  and in the search text, so they are left to the LIKE.
+
+Other databases, and text without such a run, use the LIKE alone.
+migrations.check_search compares both forms on a live database.
+"""
+from __future__ import annotations
+import re
+from sqlalchemy import and_
+from sqlalchemy.sql.elements import ColumnElement
+from cutlistgenerator.database import session_type_hint
+
+NGRAM_TOKEN_SIZE = 2  # MySQL's default ngram_token_size, must match the server.
+
+WORD_RUN = re.compile(r"[^\W_]+")
+"""Runs of letters and digits."""
+
+
+def match_terms(text: str) -> str:
+    """Returns the boolean mode search for text, or "" if the index can not narrow it down.
+
+    Args:
+        text (str): Text to search for.
+
+    Returns:
+        str: One required phrase per letter and digit run, e.g. +"12" +"345" for 12-345.
+    """
+    runs = [run for run in WORD_RUN.findall(text) if len(run) >= NGRAM_TOKEN_SIZE]
+    return " ".join(f'+"{run}"' for run in runs)
+
+
+def contains(session: session_type_hint, column, text: str) -> ColumnElement:
+    """Returns a filter for rows where column contains text.
+
+    Args:
+        session (Session): Session the query will run in, used to pick the dialect.
+        column (Column): A column with a fulltext_index.
+        text (str): Text to search for.
+
+    Returns:
+        ColumnElement: The filter expression.
+    """
+    like = column.contains(text)
+    if session.get_bind().dialect.name != "mysql":
+        return like
+    terms = match_terms(text)
+    if not terms:
+        return like
+    return and_(column.match(terms), like)
@@ -41,3 +41,9 @@ class SaveError(DatabaseError):
     """Raised when an object cannot be saved to the database."""
 
     pass
+
+
+class ScheduleOutdatedError(DatabaseError):
+    """Raised when items of a schedule were put on a cut job after it was planned."""
+
+    pass
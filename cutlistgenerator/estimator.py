@@ -0,0 +1,226 @@
+"""Cut time estimates fitted from PartCutHistory.
+
+Every history row gives a rate, total_time_minutes / quantity_cut. Rates are fitted
+per part and cutter and per cutter. Rows further than ESTIMATOR_OUTLIER_MADS median
+absolute deviations from their group's median are dropped as outliers, e.g. a job
+left running over a weekend, and the rest are averaged with weights that halve every
+ESTIMATOR_HALF_LIFE rows, so the estimate follows a cutter that speeds up or slows
+down. Fitting is vectorized over the history with NumPy. Per cutter and overall
+rates only look at the newest ESTIMATOR_WINDOW rows of their group.
+
+The history is read once and kept in memory. refresh() only reads rows added since
+the last refresh and only refits the groups they belong to. refresh_if_stale() does
+so at most every ESTIMATOR_REFRESH_SECONDS, for callers that read estimates often.
+"""
+from __future__ import annotations
+import logging
+import threading
+import time
+from dataclasses import dataclass
+import numpy as np
+from cutlistgenerator.database import Session, session_type_hint
+from cutlistgenerator.database.models.cutjob import PartCutHistory
+from cutlistgenerator.settings import (
+    ESTIMATOR_HALF_LIFE,
+    ESTIMATOR_OUTLIER_MADS,
+    ESTIMATOR_REFRESH_SECONDS,
+    ESTIMATOR_WINDOW,
+    SCHEDULER_DEFAULT_MINUTES_PER_UNIT,
+)
+
+backend_logger = logging.getLogger("backend")
+
+# Scales the median absolute deviation to the standard deviation of normally distributed rates.
+MAD_TO_STANDARD_DEVIATION = 1.4826
+
+
+@dataclass
+class RateEstimate:
+    """Fitted minutes per unit of a group of history rows."""
+
+    median: float
+    ewma: float
+    """Recency weighted mean of the rows that are not outliers."""
+    samples: int
+
+    @property
+    def minutes_per_unit(self) -> float:
+        return self.ewma
+
+
+def pair_key(part_ids: np.ndarray, cutter_ids: np.ndarray) -> np.ndarray:
+    """Packs part and cutter ids into one int64 key per row."""
+    return (part_ids.astype(np.int64) << 32) | cutter_ids.astype(np.int64)
+
+
+def fit_groups(
+    keys: np.ndarray,
+    rates: np.ndarray,
+    half_life: float = ESTIMATOR_HALF_LIFE,
+    outlier_mads: float = ESTIMATOR_OUTLIER_MADS,
+) -> dict[int, RateEstimate]:
+    """Fits a robust rate for every group of rows sharing a key.
+
+    Args:
+        keys (np.ndarray): Group key of every row.
+        rates (np.ndarray): Minutes per unit of every row, oldest row first.
+        half_life (float, optional): Rows after which a row's weight halves. Defaults to the setting.
+        outlier_mads (float, optional): Deviations from the median beyond which a row is an outlier.
+            Defaults to the setting.
+
+    Returns:
+        dict[int, RateEstimate]: Estimate by key.
+    """
+    if len(keys) == 0:
+        return {}
+    # Sorting by key then rate puts every group's rates in order, so the medians are
+    # read from the middle of each run.
+    order = np.lexsort((rates, keys))
+    unique, starts, counts = np.unique(keys[order], return_index=True, return_counts=True)
+    lower = starts + (counts - 1) // 2
+    upper = starts + counts // 2
+    sorted_rates = rates[order]
+    medians = (sorted_rates[lower] + sorted_rates[upper]) / 2
+
+    group = np.searchsorted(unique, keys)
+    deviations = np.abs(rates - medians[group])
+    sorted_deviations = deviations[np.lexsort((deviations, group))]
+    mads = (sorted_deviations[lower] + sorted_deviations[upper]) / 2
+    inliers = deviations <= outlier_mads * MAD_TO_STANDARD_DEVIATION * mads[group]
+
+    # Age of each row within its group, 0 for the newest.
+    by_group = np.argsort(group, kind="stable")
+    positions = np.empty(len(keys), dtype=np.int64)
+    positions[by_group] = np.arange(len(keys)) - starts[group[by_group]]
+    ages = counts[group] - 1 - positions
+    weights = np.power(0.5, ages / half_life) * inliers
+    ewmas = np.bincount(group, weights * rates, len(unique)) / np.bincount(group, weights, len(unique))
+
+    return {
+        int(key): RateEstimate(float(median), float(ewma), int(count))
+        for key, median, ewma, count in zip(unique, medians, ewmas, counts)
+    }
+
+
+class CutTimeEstimator:
+    """Cut rates per part and cutter and per cutter, kept in memory and refreshed incrementally."""
+
+    def __init__(self, half_life: float = ESTIMATOR_HALF_LIFE, outlier_mads: float = ESTIMATOR_OUTLIER_MADS) -> None:
+        self.half_life = half_life
+        self.outlier_mads = outlier_mads
+        self.last_id = 0
+        self.refreshed_at = None  # type: float
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._part_ids = np.empty(0, dtype=np.int64)
+        self._cutter_ids = np.empty(0, dtype=np.int64)
+        self._rates = np.empty(0, dtype=np.float64)
+        self._pairs = {}  # type: dict[int, RateEstimate]
+        self._cutters = {}  # type: dict[int, RateEstimate]
+        self._overall = None  # type: RateEstimate
+
+    def __len__(self) -> int:
+        return len(self._rates)
+
+    def add_rows(self, part_ids: np.ndarray, cutter_ids: np.ndarray, rates: np.ndarray) -> None:
+        """Append history rows, oldest first, and refit the groups they touch."""
+        with self._lock:
+            self._part_ids = np.concatenate([self._part_ids, part_ids.astype(np.int64)])
+            self._cutter_ids = np.concatenate([self._cutter_ids, cutter_ids.astype(np.int64)])
+            self._rates = np.concatenate([self._rates, rates.astype(np.float64)])
+
+            pair_keys = pair_key(self._part_ids, self._cutter_ids)
+            changed = np.isin(pair_keys, np.unique(pair_key(part_ids, cutter_ids)))
+            self._pairs.update(
+                fit_groups(pair_keys[changed], self._rates[changed], self.half_life, self.outlier_mads)
+            )
+            # Older rows carry no weight against the newest ESTIMATOR_WINDOW, so the large
+            # per cutter and overall groups are refitted from their tails only.
+            tails = [np.flatnonzero(self._cutter_ids == cutter_id)[-ESTIMATOR_WINDOW:] for cutter_id in np.unique(cutter_ids)]
+            rows = np.concatenate(tails)
+            self._cutters.update(
+                fit_groups(self._cutter_ids[rows], self._rates[rows], self.half_life, self.outlier_mads)
+            )
+            tail = self._rates[-ESTIMATOR_WINDOW:]
+            self._overall = fit_groups(
+                np.zeros(len(tail), dtype=np.int64), tail, self.half_life, self.outlier_mads
+            ).get(0)
+
+    def refresh(self, session: session_type_hint = None) -> int:
+        """Read the history rows added since the last refresh.
+
+        Args:
+            session (Session, optional): Session to use for this operation. Defaults to a new session.
+
+        Returns:
+            int: Number of rows read.
+        """
+        with self._refresh_lock:
+            close_session = session is None
+            if session is None:
+                session = Session()
+            try:
+                rows = (
+                    session.query(
+                        PartCutHistory.id,
+                        PartCutHistory.part_id,
+                        PartCutHistory.wire_cutter_id,
+                        PartCutHistory.quantity_cut,
+                        PartCutHistory.total_time_minutes,
+                    )
+                    .filter(
+                        PartCutHistory.id > self.last_id,
+                        PartCutHistory.quantity_cut > 0,
+                        PartCutHistory.total_time_minutes > 0,
+                    )
+                    .order_by(PartCutHistory.id)
+                    .all()
+                )
+            finally:
+                if close_session:
+                    session.close()
+            self.refreshed_at = time.monotonic()
+            if not rows:
+                return 0
+            columns = np.array([tuple(row) for row in rows], dtype=np.float64)
+            self.add_rows(columns[:, 1], columns[:, 2], columns[:, 4] / columns[:, 3])
+            self.last_id = int(columns[-1, 0])
+        backend_logger.debug(f"Cut time estimator read {len(rows)} history rows")
+        return len(rows)
+
+    def refresh_if_stale(self, session: session_type_hint = None, max_age: float = ESTIMATOR_REFRESH_SECONDS) -> int:
+        """Refresh unless the last refresh was less than max_age seconds ago. Returns the number of rows read."""
+        if self.refreshed_at is not None and time.monotonic() - self.refreshed_at < max_age:
+            return 0
+        return self.refresh(session)
+
+    def pair_estimates(self) -> dict[tuple[int, int], RateEstimate]:
+        """Returns the estimate of every part and cutter by (part id, cutter id)."""
+        return {(key >> 32, key & 0xFFFFFFFF): estimate for key, estimate in self._pairs.items()}
+
+    def cutter_estimates(self) -> dict[int, RateEstimate]:
+        """Returns the estimate of every cutter over all of its parts by cutter id."""
+        return dict(self._cutters)
+
+    @property
+    def overall_minutes_per_unit(self) -> float:
+        """Returns the rate over all history, or SCHEDULER_DEFAULT_MINUTES_PER_UNIT without any."""
+        overall = self._overall
+        return overall.minutes_per_unit if overall is not None else SCHEDULER_DEFAULT_MINUTES_PER_UNIT
+
+    def minutes_per_unit(self, part_id: int, cutter_id: int) -> float:
+        """Returns the estimated minutes per unit of part on cutter.
+
+        Falls back to the cutter's rate over all parts, then the rate over all history.
+        """
+        for estimate in (self._pairs.get((part_id << 32) | cutter_id), self._cutters.get(cutter_id)):
+            if estimate is not None:
+                return estimate.minutes_per_unit
+        return self.overall_minutes_per_unit
+
+    def estimate_minutes(self, part_id: int, cutter_id: int, quantity: float) -> float:
+        """Returns the estimated minutes to cut quantity of part on cutter."""
+        return quantity * self.minutes_per_unit(part_id, cutter_id)
+
+
+cut_time_estimator = CutTimeEstimator()
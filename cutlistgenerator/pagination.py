@@ -0,0 +1,159 @@
+"""Keyset pagination, field projection and streaming JSON for the REST API.
+
+A page is read in two steps. First the ids of the page are read from the index, plus
+one extra id to know whether another page follows. Then the rows are loaded in small
+chunks and each one is written to the response as soon as it is serialized, so
+neither the server's memory nor the time to the first byte grows with the page.
+"""
+from __future__ import annotations
+import base64
+import binascii
+import json
+from typing import Any, Callable, Iterable, Iterator
+from sqlalchemy.orm import Query
+from cutlistgenerator.database import Session, session_type_hint
+
+Row = dict[str, Any]
+
+
+def encode_cursor(last_id: int) -> str:
+    """Returns an opaque cursor pointing after last_id."""
+    return base64.urlsafe_b64encode(json.dumps([last_id]).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> int:
+    """Returns the id a cursor from encode_cursor points after.
+
+    Raises:
+        ValueError: If the cursor is malformed.
+    """
+    try:
+        (last_id,) = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (binascii.Error, TypeError, ValueError) as error:
+        raise ValueError(f"Invalid cursor {cursor!r}") from error
+    if not isinstance(last_id, int):
+        raise ValueError(f"Invalid cursor {cursor!r}")
+    return last_id
+
+
+def parse_fields(fields: str) -> list[str]:
+    """Parses a fields=a,b.c parameter. Returns None when every field is wanted."""
+    if not fields:
+        return None
+    return [field.strip() for field in fields.split(",") if field.strip()]
+
+
+def project(value: Any, fields: list[str]) -> Any:
+    """Keeps only the listed fields of a serialized row.
+
+    Dotted fields select inside nested objects, e.g. "customer.name". Lists of
+    objects are projected element by element.
+
+    Args:
+        value (Any): A dict from to_dict, or a list of them.
+        fields (list[str]): Fields to keep. None keeps everything.
+
+    Returns:
+        Any: The projected value.
+    """
+    if fields is None:
+        return value
+    if isinstance(value, list):
+        return [project(item, fields) for item in value]
+    if not isinstance(value, dict):
+        return value
+    result = {}
+    for field in fields:
+        key, _, rest = field.partition(".")
+        if key not in value:
+            continue
+        if not rest:
+            result[key] = value[key]
+            continue
+        nested = project(value[key], [rest])
+        if isinstance(result.get(key), dict) and isinstance(nested, dict):
+            result[key].update(nested)
+        elif isinstance(result.get(key), list) and isinstance(nested, list):
+            for merged, item in zip(result[key], nested):
+                if isinstance(merged, dict) and isinstance(item, dict):
+                    merged.update(item)
+        else:
+            result[key] = nested
+    return result
+
+
+def read_page_ids(query: Query, id_column, after: int = None, limit: int = None) -> tuple[list[int], int]:
+    """Returns the ids of one page of query and the id the next page starts after.
+
+    Args:
+        query (Query): Filtered query of the rows to page through.
+        id_column (Column): Primary key column of the rows.
+        after (int, optional): Id from the previous page's cursor. Defaults to the first page.
+        limit (int, optional): Rows per page. Defaults to every row.
+
+    Returns:
+        tuple[list[int], int]: Ids on the page, and the last of them if another page follows, else None.
+    """
+    query = query.with_entities(id_column).order_by(id_column)
+    if after is not None:
+        query = query.filter(id_column > after)
+    if limit is not None:
+        query = query.limit(limit + 1)
+    ids = [id for id, in query]
+    if limit is not None and len(ids) > limit:
+        ids = ids[:limit]
+        return ids, ids[-1]
+    return ids, None
+
+
+def iter_rows(
+    model,
+    ids: list[int],
+    serialize: Callable[[Any], Row],
+    options: list = None,
+    chunk_size: int = 100,
+    session: session_type_hint = None,
+) -> Iterator[Row]:
+    """Loads the rows for ids a chunk at a time and yields them serialized, in id order.
+
+    Runs in its own short lived session unless one is given, so it can be consumed
+    after the request handler has returned.
+
+    Args:
+        model (Base): Mapped class to load.
+        ids (list[int]): Ids to load, in the order to yield them.
+        serialize (Callable[[Base], dict]): Turns one row into a dict.
+        options (list, optional): Loader options, e.g. selectinload, applied to every chunk. Defaults to None.
+        chunk_size (int, optional): Rows loaded per query. Defaults to 100.
+        session (Session, optional): Session to use for this operation. Defaults to a new session.
+
+    Yields:
+        dict: One serialized row.
+    """
+    close_session = session is None
+    if session is None:
+        session = Session()
+    try:
+        for start in range(0, len(ids), chunk_size):
+            query = session.query(model).filter(model.id.in_(ids[start : start + chunk_size]))
+            if options:
+                query = query.options(*options)
+            for row in query.order_by(model.id):
+                yield serialize(row)
+            # Serialized rows are not needed again, keep the identity map small.
+            session.expunge_all()
+    finally:
+        if close_session:
+            session.close()
+
+
+def stream_json_array(rows: Iterable[Row]) -> Iterator[str]:
+    """Encodes rows as a JSON array, one row per chunk."""
+    yield "["
+    first = True
+    for row in rows:
+        if not first:
+            yield ","
+        first = False
+        yield json.dumps(row, default=str)
+    yield "]"
@@ -0,0 +1,158 @@
+"""Conditional GET and response caching for the read endpoints.
+
+A response is versioned by MAX(date_modified) and COUNT(*) of the Auditing tables
+it is built from, read in one round trip. The count catches deletes, which leave
+no date behind. The ETag is derived from the endpoint, its query string and that
+version, so a client polling an unchanged endpoint gets a 304 without the page
+being queried or serialized. Bodies of recent responses are kept in memory and
+replayed to clients that do not have them yet.
+
+Commits made in this process that write to one of those tables also bump a local
+generation, so changes that do not touch date_modified, e.g. linking a cut job item,
+are picked up right away. Other commits, e.g. touching an API token, leave the cache
+alone. Other processes (the sync, the desktop app) are picked up through the version.
+"""
+from __future__ import annotations
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Iterable, Iterator
+from flask import Response, request
+from sqlalchemy import func, select
+from cutlistgenerator.database import Session, changes, session_type_hint
+from cutlistgenerator.settings import API_RESPONSE_CACHE_MAX_BYTES, API_RESPONSE_CACHE_SIZE
+from cutlistgenerator import statuscodes
+
+logger = logging.getLogger("api")
+
+
+@dataclass
+class CachedResponse:
+    etag: str
+    body: bytes
+    mimetype: str
+    headers: dict[str, str]
+
+
+class ResponseCache:
+    """LRU cache of response bodies keyed on endpoint and query string."""
+
+    def __init__(self, size: int = API_RESPONSE_CACHE_SIZE, max_bytes: int = API_RESPONSE_CACHE_MAX_BYTES) -> None:
+        self.size = size
+        self.max_bytes = max_bytes
+        self.generation = 0
+        self.hits = 0
+        self.not_modified = 0
+        self.misses = 0
+        self.tables = set()  # type: set[str]
+        """Tables of every model a response was versioned on."""
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # type: OrderedDict[str, CachedResponse]
+
+    def invalidate(self) -> None:
+        """Drop every cached response and change every ETag."""
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+
+    def invalidate_if_changed(self, committed: changes.Changes) -> None:
+        """Invalidate if a commit wrote to a table the cached responses are built from."""
+        with self._lock:
+            changed = not self.tables.isdisjoint(changes.tables(committed))
+        if changed:
+            self.invalidate()
+
+    @staticmethod
+    def table_versions(models: list, session: session_type_hint) -> list[tuple]:
+        """Returns (MAX(date_modified), COUNT(*)) of every model, read in one round trip."""
+        columns = []
+        for model in models:
+            columns.append(select(func.max(model.date_modified)).scalar_subquery())
+            columns.append(select(func.count()).select_from(model).scalar_subquery())
+        values = session.execute(select(*columns)).one()
+        return [tuple(values[index : index + 2]) for index in range(0, len(values), 2)]
+
+    @staticmethod
+    def version(models: list, session: session_type_hint) -> str:
+        """Returns MAX(date_modified) and COUNT(*) of every model as one string."""
+        return "|".join(str(value) for pair in ResponseCache.table_versions(models, session) for value in pair)
+
+    def etag(self, key: str, version: str) -> str:
+        return hashlib.sha1(f"{key}|{version}|{self.generation}".encode()).hexdigest()
+
+    def get(self, key: str, etag: str) -> CachedResponse:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.etag != etag:
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key: str, entry: CachedResponse, generation: int) -> None:
+        with self._lock:
+            if generation != self.generation:
+                return  # Invalidated while the response was being written.
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def recording(self, key: str, etag: str, response: Response, body: Iterable) -> Iterator[bytes]:
+        """Passes the streamed body of response through and caches it once it is complete."""
+        generation = self.generation
+        chunks = []
+        size = 0
+        for chunk in body:
+            if isinstance(chunk, str):
+                chunk = chunk.encode()
+            if chunks is not None:
+                size += len(chunk)
+                if size > self.max_bytes:
+                    chunks = None
+                else:
+                    chunks.append(chunk)
+            yield chunk
+        if chunks is not None:
+            headers = {name: value for name, value in response.headers.items() if name.startswith("X-")}
+            self.put(key, CachedResponse(etag, b"".join(chunks), response.mimetype, headers), generation)
+
+    def respond(self, models: list, build_response: Callable[[], Response]) -> Response:
+        """Answer the current GET request from the cache when possible.
+
+        Args:
+            models (list): Auditing models the response is built from.
+            build_response (Callable[[], Response]): Builds the response on a cache miss.
+
+        Returns:
+            Response: 304 if the client's copy is current, else the cached or freshly built response.
+        """
+        key = f"{request.path}?{request.query_string.decode()}"
+        with self._lock:
+            self.tables.update(model.__tablename__ for model in models)
+        with Session() as session:
+            etag = self.etag(key, self.version(models, session))
+
+        if request.if_none_match.contains(etag):
+            self.not_modified += 1
+            response = Response(status=statuscodes.HTTP_NOT_MODIFIED)
+            response.set_etag(etag)
+            return response
+
+        entry = self.get(key, etag)
+        if entry is not None:
+            self.hits += 1
+            response = Response(entry.body, mimetype=entry.mimetype, headers=entry.headers)
+        else:
+            self.misses += 1
+            response = build_response()
+            response.response = self.recording(key, etag, response, response.response)
+            response.implicit_sequence_conversion = False
+        response.set_etag(etag)
+        return response
+
+
+response_cache = ResponseCache()
+
+changes.add_commit_listener(response_cache.invalidate_if_changed)
@@ -0,0 +1,564 @@
+"""Cut job scheduling across wire cutters.
+
+Uncut sales order items that are not on a cut job are grouped by part into jobs,
+one CutJobItem each, and spread over the wire cutters. Jobs are taken earliest due
+date first, using pushed_back_due_date, and longest first within a due date (LPT).
+Each job goes to the capable cutter it would finish on earliest, counting the work
+already queued on the cutter's open cut jobs. This is O(n log n + n * cutters) and
+keeps the makespan close to the lower bound while late jobs are only those that
+could not be finished in time on any cutter.
+
+Cut times are the rates the cut time estimator fits from PartCutHistory, per part
+and cutter. A part without history on a cutter uses its rates on the other cutters
+scaled by processing speed, and the cutter's rate over all parts without any.
+
+    python -m cutlistgenerator.scheduler [--apply]
+    python -m cutlistgenerator.scheduler --benchmark [--lines 5000] [--parts 1000] [--cutters 4]
+"""
+from __future__ import annotations
+import argparse
+import datetime
+import logging
+import math
+import random
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import Iterable, NamedTuple
+from sqlalchemy import func, update
+from cutlistgenerator import errors
+from cutlistgenerator.database import global_session, session_type_hint, unit_of_work
+from cutlistgenerator.database.models.cutjob import (
+    CutJob,
+    CutJobItem,
+    CutJobItemStatus,
+    CutJobStatus,
+)
+from cutlistgenerator.database.models.part import Part
+from cutlistgenerator.database.models.salesorder import SalesOrder, SalesOrderItem, SalesOrderStatus
+from cutlistgenerator.database.models.wirecutter import WireCutter, WireSize
+from cutlistgenerator.estimator import cut_time_estimator
+from cutlistgenerator.settings import (
+    SCHEDULER_APPLY_ATTEMPTS,
+    SCHEDULER_DAY_START_HOUR,
+    SCHEDULER_DEFAULT_MINUTES_PER_UNIT,
+    SCHEDULER_MINUTES_PER_DAY,
+    SCHEDULER_WORK_DAYS,
+)
+from cutlistgenerator.utilities import chunks
+
+backend_logger = logging.getLogger("backend")
+
+
+class ItemRow(NamedTuple):
+    """The columns of an uncut sales order item the scheduler needs."""
+
+    id: int
+    part_id: int
+    quantity: float
+    due_date: datetime.datetime
+
+
+@dataclass
+class Cutter:
+    id: int
+    name: str
+    speed: float = 0.0
+    """Processing speed in feet per minute, 0 if unknown."""
+    max_awg: int = None
+    """Gauge of the thickest wire the cutter takes, None if it takes any."""
+    load_minutes: float = 0.0
+    """Work already queued on the cutter's open cut jobs."""
+
+
+@dataclass
+class Job:
+    """All uncut items of one part, cut together as one CutJobItem."""
+
+    part_id: int
+    item_ids: list[int]
+    quantity: float
+    due_date: datetime.datetime
+    awg: int = None
+    """Gauge of the part's wire, None if unknown."""
+
+    def can_run_on(self, cutter: Cutter) -> bool:
+        # A lower AWG is a thicker wire.
+        return self.awg is None or cutter.max_awg is None or self.awg >= cutter.max_awg
+
+
+@dataclass
+class Assignment:
+    job: Job
+    cutter_id: int
+    start_minutes: float
+    minutes: float
+
+    @property
+    def end_minutes(self) -> float:
+        return self.start_minutes + self.minutes
+
+
+@dataclass
+class Schedule:
+    start: datetime.datetime
+    minutes_per_day: float
+    assignments: list[Assignment] = field(default_factory=list)
+    unassigned: list[Job] = field(default_factory=list)
+    """Jobs no cutter is capable of."""
+    cutter_minutes: dict[int, float] = field(default_factory=dict)
+    """Minutes until each cutter is finished, including its queued work."""
+
+    @property
+    def makespan_minutes(self) -> float:
+        return max(self.cutter_minutes.values(), default=0.0)
+
+    def finish_date(self, minutes: float) -> datetime.datetime:
+        """Returns the date the work scheduled up to minutes is finished.
+
+        Each of SCHEDULER_WORK_DAYS has minutes_per_day of cutting from SCHEDULER_DAY_START_HOUR,
+        so nights and weekends are skipped.
+        """
+        day = self.start.date()
+        used = (self.start - day_start(day)).total_seconds() / 60
+        if day.weekday() not in SCHEDULER_WORK_DAYS or used >= self.minutes_per_day:
+            day = next_work_day(day)
+            used = 0.0
+        days, rest = divmod(max(used, 0.0) + minutes, self.minutes_per_day)
+        if rest == 0 and days > 0:
+            # Work that fills a day exactly is finished at the end of that day.
+            days -= 1
+            rest = self.minutes_per_day
+        return day_start(add_work_days(day, int(days))) + datetime.timedelta(minutes=rest)
+
+    def late(self) -> list[Assignment]:
+        """Returns the assignments that finish after their due date."""
+        return [
+            assignment
+            for assignment in self.assignments
+            if self.finish_date(assignment.end_minutes) > assignment.job.due_date
+        ]
+
+    def by_cutter(self) -> dict[int, list[Assignment]]:
+        result = {cutter_id: [] for cutter_id in self.cutter_minutes}
+        for assignment in self.assignments:
+            result[assignment.cutter_id].append(assignment)
+        return result
+
+
+def day_start(day: datetime.date) -> datetime.datetime:
+    return datetime.datetime.combine(day, datetime.time(SCHEDULER_DAY_START_HOUR))
+
+
+def next_work_day(day: datetime.date) -> datetime.date:
+    """Returns the first work day after day."""
+    day += datetime.timedelta(days=1)
+    while day.weekday() not in SCHEDULER_WORK_DAYS:
+        day += datetime.timedelta(days=1)
+    return day
+
+
+def add_work_days(day: datetime.date, count: int) -> datetime.date:
+    """Returns the work day count work days after the work day day."""
+    weeks, count = divmod(count, len(SCHEDULER_WORK_DAYS))
+    day += datetime.timedelta(weeks=weeks)
+    for _ in range(count):
+        day = next_work_day(day)
+    return day
+
+
+class CutRates:
+    """Minutes per unit to cut a part on a cutter."""
+
+    def __init__(
+        self,
+        rates: dict[tuple[int, int], float] = None,
+        cutter_rates: dict[int, float] = None,
+        default: float = SCHEDULER_DEFAULT_MINUTES_PER_UNIT,
+    ) -> None:
+        self.default = default
+        self.cutter_rates = cutter_rates or {}  # type: dict[int, float]
+        self.rates = {}  # type: dict[tuple[int, int], float]
+        self.by_part = {}  # type: dict[int, list[tuple[int, float]]]
+        for (part_id, cutter_id), rate in (rates or {}).items():
+            self.add(part_id, cutter_id, rate)
+
+    def add(self, part_id: int, cutter_id: int, rate: float) -> None:
+        self.rates[(part_id, cutter_id)] = rate
+        self.by_part.setdefault(part_id, []).append((cutter_id, rate))
+
+    def minutes_per_unit(self, part_id: int, cutter: Cutter, speeds: dict[int, float] = None) -> float:
+        """Returns the minutes per unit of part on cutter.
+
+        Falls back to the part's rates on the other cutters, then to the cutter's rate
+        over all parts, then to the default.
+
+        Args:
+            part_id (int): Id of the part.
+            cutter (Cutter): Cutter to cut it on.
+            speeds (dict[int, float], optional): Speed of every cutter by id, to scale the part's rate on
+                other cutters. Defaults to not scaling.
+        """
+        rate = self.rates.get((part_id, cutter.id))
+        if rate is not None:
+            return rate
+        known = self.by_part.get(part_id)
+        if not known:
+            return self.cutter_rates.get(cutter.id, self.default)
+        scaled = []
+        for cutter_id, rate in known:
+            speed = (speeds or {}).get(cutter_id, 0)
+            scaled.append(rate * speed / cutter.speed if speed and cutter.speed else rate)
+        return sum(scaled) / len(scaled)
+
+    @staticmethod
+    def load(session: session_type_hint) -> CutRates:
+        """Returns the rates fitted by the cut time estimator, after reading any new PartCutHistory."""
+        cut_time_estimator.refresh(session)
+        rates = CutRates(
+            cutter_rates={
+                cutter_id: estimate.minutes_per_unit
+                for cutter_id, estimate in cut_time_estimator.cutter_estimates().items()
+            },
+            default=cut_time_estimator.overall_minutes_per_unit,
+        )
+        for (part_id, cutter_id), estimate in cut_time_estimator.pair_estimates().items():
+            rates.add(part_id, cutter_id, estimate.minutes_per_unit)
+        return rates
+
+
+def group_items(rows: Iterable[ItemRow]) -> list[Job]:
+    """Groups item rows into one job per part, due when its earliest item is due."""
+    jobs = {}  # type: dict[int, Job]
+    for row in rows:
+        if row.quantity <= 0:
+            continue
+        job = jobs.get(row.part_id)
+        if job is None:
+            jobs[row.part_id] = Job(row.part_id, [row.id], row.quantity, row.due_date)
+            continue
+        job.item_ids.append(row.id)
+        job.quantity += row.quantity
+        if row.due_date < job.due_date:
+            job.due_date = row.due_date
+    return list(jobs.values())
+
+
+def schedule(
+    jobs: list[Job],
+    cutters: list[Cutter],
+    rates: CutRates,
+    start: datetime.datetime = None,
+    minutes_per_day: float = SCHEDULER_MINUTES_PER_DAY,
+) -> Schedule:
+    """Assigns jobs to cutters, earliest due date first and longest first within a day.
+
+    Args:
+        jobs (list[Job]): Jobs to schedule.
+        cutters (list[Cutter]): Cutters to schedule them on.
+        rates (CutRates): Cut rates of the parts.
+        start (datetime.datetime, optional): When the cutters start on the schedule. Defaults to now.
+        minutes_per_day (float, optional): Cutting minutes in a work day. Defaults to the setting.
+
+    Returns:
+        Schedule: The assignments, in the order each cutter runs them.
+    """
+    result = Schedule(start or datetime.datetime.now(), minutes_per_day)
+    result.cutter_minutes = {cutter.id: cutter.load_minutes for cutter in cutters}
+    speeds = {cutter.id: cutter.speed for cutter in cutters}
+
+    durations = {}  # type: dict[int, list[tuple[Cutter, float]]]
+    for job in jobs:
+        durations[id(job)] = [
+            (cutter, job.quantity * rates.minutes_per_unit(job.part_id, cutter, speeds))
+            for cutter in cutters
+            if job.can_run_on(cutter)
+        ]
+
+    def priority(job: Job) -> tuple:
+        options = durations[id(job)]
+        return (job.due_date.date(), -min((minutes for _, minutes in options), default=0.0))
+
+    for job in sorted(jobs, key=priority):
+        options = durations[id(job)]
+        if not options:
+            result.unassigned.append(job)
+            continue
+        # Earliest finish, then the least loaded cutter to keep room for later jobs.
+        cutter, minutes = min(
+            options,
+            key=lambda option: (
+                result.cutter_minutes[option[0].id] + option[1],
+                result.cutter_minutes[option[0].id],
+            ),
+        )
+        start_minutes = result.cutter_minutes[cutter.id]
+        result.assignments.append(Assignment(job, cutter.id, start_minutes, minutes))
+        result.cutter_minutes[cutter.id] = start_minutes + minutes
+    return result
+
+
+def load_jobs(session: session_type_hint) -> list[Job]:
+    """Returns a job per part for the uncut sales order items that are not on a cut job.
+
+    Only items the sales order table shows are scheduled, those on open orders whose part
+    is not excluded from import.
+    """
+    so_open_status = SalesOrderStatus.find_by_name("In Progress")
+    rows = (
+        ItemRow(
+            id,
+            part_id,
+            quantity_to_fulfill - quantity_fulfilled - quantity_picked,
+            date_scheduled_fulfillment - datetime.timedelta(days=push_back_days or 0),
+        )
+        for id, part_id, quantity_to_fulfill, quantity_fulfilled, quantity_picked, date_scheduled_fulfillment, push_back_days in (
+            session.query(
+                SalesOrderItem.id,
+                SalesOrderItem.part_id,
+                SalesOrderItem.quantity_to_fulfill,
+                SalesOrderItem.quantity_fulfilled,
+                SalesOrderItem.quantity_picked,
+                SalesOrderItem.date_scheduled_fulfillment,
+                Part.due_date_push_back_days,
+            )
+            .join(Part, Part.id == SalesOrderItem.part_id)
+            .join(SalesOrder, SalesOrder.id == SalesOrderItem.sales_order_id)
+            .filter(
+                SalesOrderItem.is_cut == False,
+                SalesOrderItem.cut_job_item_id == None,
+                SalesOrder.status_id <= so_open_status.id,
+                Part.excluded_from_import == False,
+            )
+        )
+    )
+    return group_items(rows)
+
+
+def load_cutters(session: session_type_hint, rates: CutRates) -> list[Cutter]:
+    """Returns every wire cutter with the work left on its open cut jobs."""
+    cutters = [
+        Cutter(id, name, speed or 0.0, awg)
+        for id, name, speed, awg in session.query(
+            WireCutter.id, WireCutter.name, WireCutter.max_processing_speed_feet_per_minute, WireSize.awg
+        )
+        .outerjoin(WireSize, WireSize.id == WireCutter.max_wire_size_id)
+        .order_by(WireCutter.id)
+    ]
+    by_id = {cutter.id: cutter for cutter in cutters}
+    speeds = {cutter.id: cutter.speed for cutter in cutters}
+    closed_jobs = [CutJobStatus.find_by_name(name).id for name in ("Fulfilled", "Voided")]
+    closed_items = [CutJobItemStatus.find_by_name(name).id for name in ("Fulfilled", "Voided")]
+    for cutter_id, part_id, left_to_cut in (
+        session.query(
+            CutJob.wire_cutter_id,
+            CutJobItem.part_id,
+            func.sum(CutJobItem.quantity_to_cut - CutJobItem.quantity_cut),
+        )
+        .join(CutJob, CutJob.id == CutJobItem.cut_job_id)
+        .filter(
+            CutJob.status_id.notin_(closed_jobs),
+            CutJobItem.status_id.notin_(closed_items),
+            CutJobItem.quantity_to_cut > CutJobItem.quantity_cut,
+        )
+        .group_by(CutJob.wire_cutter_id, CutJobItem.part_id)
+    ):
+        cutter = by_id.get(cutter_id)
+        if cutter is not None:
+            cutter.load_minutes += float(left_to_cut) * rates.minutes_per_unit(part_id, cutter, speeds)
+    return cutters
+
+
+def plan(session: session_type_hint = None) -> Schedule:
+    """Schedules every uncut sales order item that is not on a cut job.
+
+    Args:
+        session (Session, optional): Session to use for this operation. Defaults to Global Session.
+    """
+    if not session:
+        session = global_session
+    rates = CutRates.load(session)
+    return schedule(load_jobs(session), load_cutters(session, rates), rates)
+
+
+def apply(schedule: Schedule, session: session_type_hint = None) -> list[CutJob]:
+    """Creates a cut job per cutter with a cut job item per scheduled job, in one transaction.
+
+    Only items that are still not on a cut job are assigned. If any item of the
+    schedule was put on one since it was planned, nothing is written.
+
+    Args:
+        schedule (Schedule): Schedule from plan.
+        session (Session, optional): Session to use for this operation. Defaults to Global Session.
+
+    Raises:
+        ScheduleOutdatedError: If the schedule has to be planned again.
+
+    Returns:
+        list[CutJob]: The cut jobs created.
+    """
+    if not session:
+        session = global_session
+    job_status_id = CutJobStatus.find_by_name("Entered").id
+    item_status_id = CutJobItemStatus.find_by_name("Entered").id
+    cut_jobs = []
+    with unit_of_work(session):
+        for cutter_id, assignments in schedule.by_cutter().items():
+            if not assignments:
+                continue
+            cut_job = CutJob(status_id=job_status_id, wire_cutter_id=cutter_id)
+            session.add(cut_job)
+            session.flush()
+            cut_job_items = [
+                CutJobItem(
+                    cut_job_id=cut_job.id,
+                    part_id=assignment.job.part_id,
+                    status_id=item_status_id,
+                    quantity_to_cut=math.ceil(assignment.job.quantity),
+                )
+                for assignment in assignments
+            ]
+            session.add_all(cut_job_items)
+            session.flush()
+
+            now = datetime.datetime.now()
+            for assignment, cut_job_item in zip(assignments, cut_job_items):
+                assigned = 0
+                for chunk in chunks(assignment.job.item_ids):
+                    assigned += session.execute(
+                        update(SalesOrderItem)
+                        .where(SalesOrderItem.id.in_(chunk), SalesOrderItem.cut_job_item_id == None)
+                        .values(cut_job_item_id=cut_job_item.id, date_modified=now)
+                        .execution_options(synchronize_session=False)
+                    ).rowcount
+                if assigned < len(assignment.job.item_ids):
+                    raise errors.ScheduleOutdatedError(
+                        f"{len(assignment.job.item_ids) - assigned} items of part id {assignment.job.part_id} "
+                        "were put on a cut job after the schedule was planned."
+                    )
+            cut_jobs.append(cut_job)
+    backend_logger.info(
+        f"Scheduled {len(schedule.assignments)} parts onto {len(cut_jobs)} cut jobs, "
+        f"makespan {schedule.makespan_minutes:.0f} minutes, {len(schedule.late())} late."
+    )
+    return cut_jobs
+
+
+def synthetic_backlog(
+    lines: int, parts: int, cutters: int, seed: int = 1
+) -> tuple[list[ItemRow], dict[int, int], list[Cutter], CutRates, float]:
+    """Returns random item rows, part gauges, cutters and rates for benchmarking.
+
+    Rates are feet per unit divided by the cutter's speed. A fifth of the parts have no
+    history on each cutter, so the speed scaling fallback is exercised too. The first
+    cutter takes any gauge so every job has a capable cutter.
+
+    Returns:
+        tuple[list[ItemRow], dict[int, int], list[Cutter], CutRates, float]: The backlog and a lower
+            bound on its makespan, ignoring capabilities.
+    """
+    generator = random.Random(seed)
+    now = datetime.datetime.now()
+    cutter_list = [
+        Cutter(
+            id=number + 1,
+            name=f"Cutter {number + 1}",
+            speed=generator.choice([60.0, 90.0, 120.0]),
+            max_awg=None if number == 0 else generator.choice([None, 4, 10]),
+        )
+        for number in range(cutters)
+    ]
+    feet_per_unit = {part_id: generator.uniform(6.0, 60.0) for part_id in range(1, parts + 1)}
+    gauges = {part_id: generator.choice([2, 6, 12, 18, 22]) for part_id in feet_per_unit}
+    rates = CutRates()
+    for part_id, feet in feet_per_unit.items():
+        for cutter in cutter_list:
+            if generator.random() >= 0.2:
+                rates.add(part_id, cutter.id, feet / cutter.speed)
+
+    rows = [
+        ItemRow(
+            id=number + 1,
+            part_id=generator.randint(1, parts),
+            quantity=float(generator.randint(1, 50)),
+            due_date=now + datetime.timedelta(days=generator.randint(-5, 60)),
+        )
+        for number in range(lines)
+    ]
+    feet_by_part = {}  # type: dict[int, float]
+    for row in rows:
+        feet_by_part[row.part_id] = feet_by_part.get(row.part_id, 0.0) + row.quantity * feet_per_unit[row.part_id]
+    lower_bound = max(
+        sum(feet_by_part.values()) / sum(cutter.speed for cutter in cutter_list),
+        max(feet_by_part.values(), default=0.0) / max(cutter.speed for cutter in cutter_list),
+    )
+    return rows, gauges, cutter_list, rates, lower_bound
+
+
+def benchmark(lines: int, parts: int, cutters: int, seed: int = 1) -> dict[str, float]:
+    """Schedules a synthetic backlog and returns timings and quality measures."""
+    rows, gauges, cutter_list, rates, lower_bound = synthetic_backlog(lines, parts, cutters, seed)
+    started = time.perf_counter()
+    jobs = group_items(rows)
+    grouped = time.perf_counter()
+    for job in jobs:
+        job.awg = gauges[job.part_id]
+    result = schedule(jobs, cutter_list, rates)
+    finished = time.perf_counter()
+    return {
+        "lines": lines,
+        "jobs": len(jobs),
+        "cutters": cutters,
+        "group_seconds": grouped - started,
+        "schedule_seconds": finished - grouped,
+        "makespan_minutes": result.makespan_minutes,
+        "lower_bound_minutes": lower_bound,
+        "makespan_ratio": result.makespan_minutes / lower_bound if lower_bound else 1.0,
+        "late_jobs": len(result.late()),
+        "unassigned_jobs": len(result.unassigned),
+    }
+
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Schedule uncut sales order items onto the wire cutters.")
+    parser.add_argument("--apply", action="store_true", help="Create the cut jobs.")
+    parser.add_argument("--benchmark", action="store_true", help="Schedule synthetic backlogs instead.")
+    parser.add_argument("--lines", type=int, nargs="+", default=[1000, 5000, 20000], help="Benchmark backlog sizes.")
+    parser.add_argument("--parts", type=int, default=1000, help="Distinct parts in a benchmark backlog.")
+    parser.add_argument("--cutters", type=int, default=4, help="Cutters in a benchmark.")
+    args = parser.parse_args(argv)
+
+    if args.benchmark:
+        for lines in args.lines:
+            result = benchmark(lines, args.parts, args.cutters)
+            print(
+                f"{result['lines']:>6} lines {result['jobs']:>5} jobs on {result['cutters']} cutters: "
+                f"group {result['group_seconds'] * 1000:.1f} ms, schedule {result['schedule_seconds'] * 1000:.1f} ms, "
+                f"makespan {result['makespan_ratio']:.3f} x lower bound, "
+                f"{result['late_jobs']} late, {result['unassigned_jobs']} unassigned"
+            )
+        return 0
+
+    result = plan()
+    cutter_names = {cutter.id: cutter.name for cutter in WireCutter.find_all()}
+    for cutter_id, assignments in result.by_cutter().items():
+        minutes = result.cutter_minutes[cutter_id]
+        print(f"{cutter_names[cutter_id]}: {len(assignments)} parts, done {result.finish_date(minutes):%Y-%m-%d %H:%M}")
+    print(f"{len(result.late())} late, {len(result.unassigned)} with no capable cutter")
+    if args.apply:
+        for _ in range(SCHEDULER_APPLY_ATTEMPTS):
+            try:
+                apply(result)
+                break
+            except errors.ScheduleOutdatedError as error:
+                print(f"{error} Planning again.")
+                result = plan()
+        else:
+            print("Items kept being put on cut jobs, no cut jobs created.")
+            return 1
+        print("Cut jobs created.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -58,6 +58,9 @@ settings = QSettings(COMPANY_NAME, PROGRAM_NAME)
 DATE_TIME_FORMAT = "%m-%d-%Y %H:%M"
 DATE_FORMAT = "%m-%d-%Y"
 DEFAULT_DUE_DATE_PUSH_BACK_DAYS = 30
+SO_TABLE_PAGE_SIZE = 200  # rows read each time the sales order table scrolls to the end
+SO_TABLE_SEARCH_DELAY_MS = 300  # quiet time after typing before the sales order table is searched
+BATCH_SIZE = 500  # values per IN (...) list or multi-row statement
 
 LAST_USERNAME = DefaultSetting(
     settings=settings, name="last_username", value=""
@@ -156,6 +159,32 @@ if FORCE_REBUILD_DATABASE == "true":
     FORCE_REBUILD_DATABASE = True
 else:
     FORCE_REBUILD_DATABASE = False
+DATABASE_POOL_SIZE = int(
+    DefaultSetting(settings=settings, group_name="Database", name="pool_size", value=5)
+    .initialize_setting()
+    .value
+)
+DATABASE_MAX_OVERFLOW = int(
+    DefaultSetting(settings=settings, group_name="Database", name="max_overflow", value=10)
+    .initialize_setting()
+    .value
+)
+DATABASE_POOL_RECYCLE_SECONDS = int(
+    DefaultSetting(
+        settings=settings, group_name="Database", name="pool_recycle_seconds", value=3600
+    )
+    .initialize_setting()
+    .value
+)
+DATABASE_POOL_PRE_PING = (
+    DefaultSetting(settings=settings, group_name="Database", name="pool_pre_ping", value=True)
+    .initialize_setting()
+    .value
+)
+if DATABASE_POOL_PRE_PING in ("false", False):
+    DATABASE_POOL_PRE_PING = False
+else:
+    DATABASE_POOL_PRE_PING = True
 
 
 # Fishbowl settings
@@ -188,6 +217,23 @@ FISHBOWL_DATABASE_SCHEMA = (
     .initialize_setting()
     .value
 )
+FISHBOWL_FULL_SYNC_INTERVAL_HOURS = int(
+    DefaultSetting(
+        settings=settings,
+        group_name="Fishbowl",
+        name="full_sync_interval_hours",
+        value=24,
+    )
+    .initialize_setting()
+    .value
+)
+FISHBOWL_AUTO_SYNC_MINUTES = int(
+    DefaultSetting(
+        settings=settings, group_name="Fishbowl", name="auto_sync_minutes", value=0
+    )
+    .initialize_setting()
+    .value
+)  # 0 disables the automatic sync.
 FISHBOWL_DATABASE_URL = f"mysql+pymysql://{FISHBOWL_DATABASE_USER}:{FISHBOWL_DATABASE_PASSWORD}@{FISHBOWL_DATABASE_HOST}:{FISHBOWL_DATABASE_PORT}/{FISHBOWL_DATABASE_SCHEMA}"
 
 # Github settings
@@ -201,8 +247,60 @@ GITHUB_LATEST_RELEASE_ENDPOINT = (
 # Thread settings
 THREAD_UPDATE_INTERVAL = 5  # seconds
 
+# Sync settings
+SYNC_BATCH_SIZE = 500  # rows per multi-row INSERT statement
+SYNC_WORKERS = int(
+    DefaultSetting(settings=settings, group_name="Sync", name="workers", value=0)
+    .initialize_setting()
+    .value
+)  # Processes used to read a full sync. 0 or 1 reads serially.
+SYNC_PARTITION_SIZE = 200  # sales orders per parallel work item
+
+# Scheduler settings
+SCHEDULER_MINUTES_PER_DAY = float(
+    DefaultSetting(settings=settings, group_name="Scheduler", name="minutes_per_day", value=480)
+    .initialize_setting()
+    .value
+)  # Cutting minutes in one work day, used to turn scheduled minutes into dates.
+SCHEDULER_DEFAULT_MINUTES_PER_UNIT = 1.0  # for parts without a cut history
+SCHEDULER_DAY_START_HOUR = 7  # cutting starts at this hour on a work day
+SCHEDULER_WORK_DAYS = (0, 1, 2, 3, 4)  # weekdays with cutting, Monday is 0
+SCHEDULER_APPLY_ATTEMPTS = 3  # plans tried by --apply when items keep being put on cut jobs meanwhile
+
+# Cut time estimator settings
+ESTIMATOR_HALF_LIFE = 10  # history rows after which a row counts half as much
+ESTIMATOR_OUTLIER_MADS = 3.0  # rows further from the median are ignored
+ESTIMATOR_WINDOW = 500  # newest rows fitted for a cutter's rate over all parts
+ESTIMATOR_REFRESH_SECONDS = 60  # how stale estimates shown in tables and the API may be
+
+# Change bus settings
+CHANGE_BUS_HISTORY = 1000  # recent changes kept to replay to clients that reconnect with Last-Event-ID
+CHANGE_BUS_QUEUE_SIZE = 1000  # changes buffered per subscriber before it is told to reload
+CHANGE_POLL_SECONDS = 2  # how often other processes' changes are looked for in the database
+CHANGE_POLL_MAX_IDS = 1000  # changed rows listed in one event, more and clients are told to reload the table
+
 # API settings
 API_TOKEN_VALIDITY = 1  # days
+API_MAX_PAGE_SIZE = 1000  # largest limit accepted by the paged endpoints
+API_RESPONSE_CACHE_SIZE = 64  # responses kept for conditional GETs
+API_RESPONSE_CACHE_MAX_BYTES = 16 * 1024 * 1024  # larger responses are streamed but not cached
+API_THREADS = int(
+    DefaultSetting(settings=settings, group_name="API", name="threads", value=8)
+    .initialize_setting()
+    .value
+)  # Request threads per API process. The database pool is sized to match.
+API_WORKERS = int(
+    DefaultSetting(settings=settings, group_name="API", name="workers", value=1)
+    .initialize_setting()
+    .value
+)  # API processes sharing the listening socket.
+API_EVENT_STREAMS = 16  # open /api/events streams per API process, each holds a request thread
+API_EVENT_HEARTBEAT_SECONDS = 15  # comment line sent on idle event streams to keep proxies from closing them
+API_TOKEN_STORE = (
+    DefaultSetting(settings=settings, group_name="API", name="token_store", value="memory")
+    .initialize_setting()
+    .value
+)  # "memory", "database" for the application database, or a database URL such as sqlite:///tokens.db
 
 FLASK_SECRET_KEY = (
     DefaultSetting(
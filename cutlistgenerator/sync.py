@@ -0,0 +1,668 @@
+"""Bulk sync of Fishbowl sales order data into the local database.
+
+The sync is split into two stages:
+
+1. ``build_sync_batch`` transforms Fishbowl objects into plain rows keyed by
+   their natural keys (customer name, part number, SO number, ...).
+2. ``write_sync_batch`` preloads the existing keys into in-memory maps, works
+   out the inserts / updates as sets and writes them with batched multi-row
+   ``INSERT ... ON DUPLICATE KEY UPDATE`` statements.
+
+``sync_sales_orders`` ties the two together. It normally only pulls orders
+modified since the last run (tracked with per-table high-water marks stored
+as SystemProperty rows) and periodically falls back to a full reconciliation
+that also removes lines deleted in Fishbowl.
+
+When the ``workers`` setting is above 1 the read stage of a full sync is split
+into partitions of consecutive ``so.id`` values that are transformed in a pool
+of processes, each with its own Fishbowl connection. The partial batches are
+merged in partition order and written by the single write stage.
+"""
+from __future__ import annotations
+import datetime
+import logging
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from decimal import Decimal
+from typing import Callable, Iterable
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from fishbowlorm import FishbowlORM
+from fishbowlorm import utilities as fb_utilities
+from fishbowlorm import models as fb_models
+from fishbowlorm.models.basetables import ORM
+from cutlistgenerator.settings import (
+    SYNC_BATCH_SIZE,
+    SYNC_PARTITION_SIZE,
+    SYNC_WORKERS,
+    FISHBOWL_FULL_SYNC_INTERVAL_HOURS,
+)
+from cutlistgenerator.database import global_session, session_type_hint
+from cutlistgenerator.database.cache import lookup_cache
+from cutlistgenerator.database.deletion import delete_sales_order_items
+from cutlistgenerator.database.models.part import Part, ParentToChildPart
+from cutlistgenerator.database.models.customer import Customer
+from cutlistgenerator.database.models.salesorder import (
+    SalesOrder,
+    SalesOrderItem,
+    SalesOrderItemStatus,
+    SalesOrderItemType,
+    SalesOrderStatus,
+)
+from cutlistgenerator.database.models.systemproperty import SystemProperty
+from cutlistgenerator.utilities import chunks
+
+backend_logger = logging.getLogger("backend")
+
+ProgressCallback = Callable[[int, str], None]
+PhaseCallback = Callable[[str, float], None]
+
+SO_WATERMARK_KEY = "Fishbowl SO Sync Watermark"
+SO_ITEM_WATERMARK_KEY = "Fishbowl SO Item Sync Watermark"
+LAST_FULL_SYNC_KEY = "Fishbowl Last Full Sync"
+OPEN_STATUS_NAMES = ("Issued", "In Progress")
+
+
+@dataclass
+class SalesOrderRow:
+    """A sales order as pulled from Fishbowl."""
+
+    number: str
+    customer_name: str
+    status_name: str
+    date_scheduled_fulfillment: datetime.datetime
+
+
+@dataclass
+class SalesOrderItemRow:
+    """A sales order item (or exploded child item) as pulled from Fishbowl."""
+
+    so_number: str
+    part_number: str
+    fb_so_item_id: int
+    line_number: str
+    description: str
+    date_scheduled_fulfillment: datetime.datetime
+    quantity_fulfilled: float
+    quantity_ordered: float
+    quantity_picked: float
+    quantity_to_fulfill: float
+    status_name: str
+    type_name: str
+
+    @property
+    def key(self) -> tuple[int, str]:
+        return (self.fb_so_item_id, self.line_number)
+
+
+@dataclass
+class SyncBatch:
+    """All rows needed to bring the local database in line with Fishbowl."""
+
+    customers: set[str] = field(default_factory=set)
+    parts: dict[str, str] = field(default_factory=dict)
+    """Part number -> description."""
+    part_children: set[tuple[str, str]] = field(default_factory=set)
+    """(parent part number, child part number) pairs."""
+    sales_orders: dict[str, SalesOrderRow] = field(default_factory=dict)
+    sales_order_items: dict[tuple[int, str], SalesOrderItemRow] = field(
+        default_factory=dict
+    )
+    so_modified: datetime.datetime = None
+    """Newest so.dateLastModified read."""
+    item_modified: datetime.datetime = None
+    """Newest soitem.dateLastModified read."""
+
+    def merge(self, other: SyncBatch) -> None:
+        """Add the rows of other to this batch.
+
+        Rows already in this batch win, so merging partial batches in a fixed
+        order always gives the same result.
+        """
+        self.customers |= other.customers
+        self.part_children |= other.part_children
+        for number, description in other.parts.items():
+            self.parts.setdefault(number, description)
+        for number, row in other.sales_orders.items():
+            self.sales_orders.setdefault(number, row)
+        for key, row in other.sales_order_items.items():
+            self.sales_order_items.setdefault(key, row)
+        self.so_modified = newest(self.so_modified, other.so_modified)
+        self.item_modified = newest(self.item_modified, other.item_modified)
+
+
+@dataclass
+class SyncResult:
+    """Counts of what a sync wrote."""
+
+    customers_created: int = 0
+    parts_created: int = 0
+    part_children_created: int = 0
+    sales_orders_created: int = 0
+    sales_orders_updated: int = 0
+    sales_order_items_created: int = 0
+    sales_order_items_updated: int = 0
+    sales_order_items_deleted: int = 0
+    full_sync: bool = False
+    timings: dict[str, float] = field(default_factory=dict)
+    """Phase name -> seconds."""
+
+
+def newest(a: datetime.datetime, b: datetime.datetime) -> datetime.datetime:
+    """Returns the later of two datetimes, ignoring None."""
+    if a is None: return b
+    if b is None: return a
+    return max(a, b)
+
+
+def record_phase(timings: dict[str, float], name: str, started: float, phase: PhaseCallback = None) -> None:
+    """Store how long a phase took since started (a perf_counter value) and report it."""
+    seconds = time.perf_counter() - started
+    timings[name] = seconds
+    backend_logger.debug(f"[EXECUTION TIME] Sync phase {name} took {seconds} seconds.")
+    if phase is not None:
+        phase(name, seconds)
+
+
+def to_float(value: Decimal) -> float:
+    return float(value) if value is not None else 0.0
+
+
+def build_sync_batch(
+    fishbowl_orm: ORM,
+    fb_sales_orders: list[fb_models.FBSalesOrder],
+    child_parts: dict[str, list[fb_models.FBPart]] = None,
+    progress: ProgressCallback = None,
+) -> SyncBatch:
+    """Transform Fishbowl sales orders into a SyncBatch.
+
+    Args:
+        fishbowl_orm (ORM): The Fishbowl ORM to use for BOM lookups.
+        fb_sales_orders (list[FBSalesOrder]): The Fishbowl sales orders to process.
+        child_parts (dict[str, list[FBPart]], optional): Cache of parent part number -> child parts. Defaults to a new cache.
+        progress (ProgressCallback, optional): Called with (% complete, message). Defaults to None.
+
+    Returns:
+        SyncBatch: The rows to write.
+    """
+    if child_parts is None:
+        child_parts = {}
+    batch = SyncBatch()
+    total = len(fb_sales_orders)
+
+    parent_parts = {}
+    for fb_sales_order in fb_sales_orders:
+        for fb_so_item in fb_sales_order.items:
+            if not fb_so_item.productObj: continue
+            fb_parent_part = fb_so_item.productObj.partObj
+            if fb_parent_part.number in child_parts: continue
+            parent_parts[fb_parent_part.number] = fb_parent_part
+    if parent_parts:
+        backend_logger.debug(f"Pulling child parts for {len(parent_parts)} parts.")
+        child_parts.update(fb_utilities.get_child_parts_for_parts(fishbowl_orm, list(parent_parts.values())))
+
+    for index, fb_sales_order in enumerate(fb_sales_orders):
+        if progress is not None and index % 50 == 0:
+            progress(int(index / total * 100), f"Reading sales order {fb_sales_order.number} ({index}/{total})")
+
+        batch.so_modified = newest(batch.so_modified, fb_sales_order.dateLastModified)
+        customer_name = fb_sales_order.customerObj.name
+        batch.customers.add(customer_name)
+        batch.sales_orders[fb_sales_order.number] = SalesOrderRow(
+            number=fb_sales_order.number,
+            customer_name=customer_name,
+            status_name=fb_sales_order.statusObj.name,
+            date_scheduled_fulfillment=fb_sales_order.dateScheduledFulfillment,
+        )
+
+        for fb_so_item in fb_sales_order.items:
+            batch.item_modified = newest(batch.item_modified, fb_so_item.dateLastModified)
+            if not fb_so_item.productObj:
+                continue
+            fb_parent_part = fb_so_item.productObj.partObj
+            batch.parts.setdefault(fb_parent_part.number, fb_parent_part.description)
+
+            item_row = SalesOrderItemRow(
+                so_number=fb_sales_order.number,
+                part_number=fb_parent_part.number,
+                fb_so_item_id=fb_so_item.id,
+                line_number=str(fb_so_item.lineItem),
+                description=fb_so_item.description,
+                date_scheduled_fulfillment=fb_so_item.dateScheduledFulfillment,
+                quantity_fulfilled=to_float(fb_so_item.quantityFulfilled),
+                quantity_ordered=to_float(fb_so_item.quantityOrdered),
+                quantity_picked=to_float(fb_so_item.quantityPicked),
+                quantity_to_fulfill=to_float(fb_so_item.quantityToFulfill),
+                status_name=fb_so_item.statusObj.name,
+                type_name=fb_so_item.typeObj.name,
+            )
+            batch.sales_order_items[item_row.key] = item_row
+
+            for child_index, fb_child_part in enumerate(child_parts[fb_parent_part.number]):
+                batch.parts.setdefault(fb_child_part.number, fb_child_part.description)
+                batch.part_children.add((fb_parent_part.number, fb_child_part.number))
+
+                child_row = SalesOrderItemRow(
+                    **{
+                        **item_row.__dict__,
+                        "part_number": fb_child_part.number,
+                        "line_number": f"{item_row.line_number}.{child_index + 1}",
+                    }
+                )
+                batch.sales_order_items[child_row.key] = child_row
+
+    return batch
+
+
+partition_fishbowl_orm = None  # type: FishbowlORM # Set in each pool process by init_partition_worker.
+
+
+def fishbowl_connection(fishbowl_orm: FishbowlORM) -> dict:
+    """Returns the arguments needed to open another FishbowlORM to the same database."""
+    return {
+        "db_name": fishbowl_orm.db_name,
+        "host": fishbowl_orm.host,
+        "port": fishbowl_orm.port,
+        "username": fishbowl_orm.username,
+        "password": fishbowl_orm.password,
+    }
+
+
+def init_partition_worker(connection: dict) -> None:
+    """Pool initializer, opens the Fishbowl connection used by build_partition."""
+    global partition_fishbowl_orm
+    partition_fishbowl_orm = FishbowlORM(**connection)
+
+
+def build_partition(so_ids: list[int]) -> SyncBatch:
+    """Pool task, reads and transforms the Fishbowl sales orders in so_ids."""
+    fb_sales_orders = fb_models.FBSalesOrder.find_by_ids(partition_fishbowl_orm, so_ids)
+    batch = build_sync_batch(partition_fishbowl_orm, fb_sales_orders)
+    partition_fishbowl_orm.session.expunge_all()
+    return batch
+
+
+def build_sync_batch_parallel(
+    fishbowl_orm: FishbowlORM,
+    so_ids: list[int],
+    workers: int,
+    progress: ProgressCallback = None,
+) -> SyncBatch:
+    """Build a SyncBatch for so_ids using a pool of worker processes.
+
+    Args:
+        fishbowl_orm (FishbowlORM): The Fishbowl ORM whose connection settings the workers copy.
+        so_ids (list[int]): Fishbowl sales order ids to process.
+        workers (int): Number of worker processes.
+        progress (ProgressCallback, optional): Called with (% complete, message). Defaults to None.
+
+    Returns:
+        SyncBatch: The merged rows to write.
+    """
+    partitions = list(chunks(sorted(so_ids), SYNC_PARTITION_SIZE))
+    batches = [None] * len(partitions)  # type: list[SyncBatch]
+    backend_logger.info(f"Reading {len(so_ids)} sales orders in {len(partitions)} partitions with {workers} workers.")
+
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=init_partition_worker,
+        initargs=(fishbowl_connection(fishbowl_orm),),
+    ) as executor:
+        futures = {
+            executor.submit(build_partition, partition): index
+            for index, partition in enumerate(partitions)
+        }
+        for finished, future in enumerate(as_completed(futures), start=1):
+            batches[futures[future]] = future.result()
+            if progress is not None:
+                progress(int(finished / len(partitions) * 100), f"Read partition {finished}/{len(partitions)}")
+
+    batch = SyncBatch()
+    for partial in batches:
+        batch.merge(partial)
+    return batch
+
+
+def load_id_map(session: session_type_hint, key_column, keys: Iterable) -> dict:
+    """Return a key -> id map for the rows whose key_column is in keys."""
+    table = key_column.class_
+    result = {}
+    for chunk in chunks(sorted(set(keys))):
+        for key, id in session.query(key_column, table.id).filter(key_column.in_(chunk)):
+            result[key] = id
+    return result
+
+
+def insert_rows(session: session_type_hint, table, rows: list[dict], update_columns: list[str] = None) -> None:
+    """Write rows with batched multi-row INSERT ... ON DUPLICATE KEY UPDATE statements.
+
+    When update_columns is empty the duplicate key clause is a no-op, which makes
+    the insert safe against rows created by someone else since the keys were loaded.
+    """
+    for chunk in chunks(rows, SYNC_BATCH_SIZE):
+        statement = mysql_insert(table.__table__).values(chunk)
+        if update_columns:
+            updates = {column: statement.inserted[column] for column in update_columns}
+        else:
+            primary_key = table.__table__.primary_key.columns.values()[0]
+            updates = {primary_key.name: primary_key}
+        session.execute(statement.on_duplicate_key_update(**updates))
+
+
+# This line keeps black magic from happening.
+# fmt: off
+def write_sync_batch(
+    batch: SyncBatch,
+    session: session_type_hint = None,
+    progress: ProgressCallback = None,
+    phase: PhaseCallback = None,
+) -> SyncResult:
+    """Write a SyncBatch to the local database.
+
+    Args:
+        batch (SyncBatch): The rows to write.
+        session (Session, optional): Session to use for this operation. Defaults to Global Session.
+        progress (ProgressCallback, optional): Called with (% complete, message). Defaults to None.
+        phase (PhaseCallback, optional): Called with (phase name, seconds) as each phase finishes. Defaults to None.
+
+    Returns:
+        SyncResult: Counts of created / updated rows.
+    """
+    if not session: session = global_session
+    if progress is None: progress = lambda value, message: None
+    result = SyncResult()
+    now = datetime.datetime.now()
+
+    # Customers, parts and part links.
+    s = time.perf_counter()
+    progress(0, "Writing customers and parts")
+    customer_ids = load_id_map(session, Customer.name, batch.customers)
+    new_customers = sorted(batch.customers - customer_ids.keys())
+    insert_rows(session, Customer, [
+        {"name": name, "date_created": now, "date_modified": now} for name in new_customers
+    ])
+    result.customers_created = len(new_customers)
+
+    part_ids = load_id_map(session, Part.number, batch.parts)
+    new_parts = sorted(batch.parts.keys() - part_ids.keys())
+    insert_rows(session, Part, [
+        {"number": number, "description": batch.parts[number], "date_created": now, "date_modified": now}
+        for number in new_parts
+    ])
+    result.parts_created = len(new_parts)
+
+    if new_customers: customer_ids.update(load_id_map(session, Customer.name, new_customers))
+    if new_parts: part_ids.update(load_id_map(session, Part.number, new_parts))
+
+    parent_ids = sorted({part_ids[parent] for parent, _ in batch.part_children})
+    existing_links = set()
+    for chunk in chunks(parent_ids):
+        existing_links.update(
+            session.query(ParentToChildPart.parent_id, ParentToChildPart.child_id)
+            .filter(ParentToChildPart.parent_id.in_(chunk))
+        )
+    new_links = sorted(
+        {(part_ids[parent], part_ids[child]) for parent, child in batch.part_children} - existing_links
+    )
+    insert_rows(session, ParentToChildPart, [
+        {"parent_id": parent_id, "child_id": child_id} for parent_id, child_id in new_links
+    ])
+    result.part_children_created = len(new_links)
+    session.commit()
+    record_phase(result.timings, "write customers and parts", s, phase)
+
+    # Sales orders.
+    s = time.perf_counter()
+    progress(33, "Writing sales orders")
+    so_status_ids = lookup_cache.id_map(SalesOrderStatus)
+    existing_orders = {}  # type: dict[str, tuple[int, int]]
+    for chunk in chunks(sorted(batch.sales_orders)):
+        for number, id, status_id in (
+            session.query(SalesOrder.number, SalesOrder.id, SalesOrder.status_id)
+            .filter(SalesOrder.number.in_(chunk))
+        ):
+            existing_orders[number] = (id, status_id)
+
+    order_rows = []
+    for number, row in sorted(batch.sales_orders.items()):
+        status_id = so_status_ids[row.status_name]
+        if number in existing_orders:
+            if existing_orders[number][1] == status_id: continue
+            result.sales_orders_updated += 1
+        else:
+            result.sales_orders_created += 1
+        order_rows.append({
+            "number": number,
+            "customer_id": customer_ids[row.customer_name],
+            "date_scheduled_fulfillment": row.date_scheduled_fulfillment,
+            "status_id": status_id,
+            "date_created": now,
+            "date_modified": now,
+        })
+    insert_rows(session, SalesOrder, order_rows, update_columns=["status_id", "date_modified"])
+    session.commit()
+    order_ids = {number: id for number, (id, _) in existing_orders.items()}
+    new_orders = [number for number in batch.sales_orders if number not in order_ids]
+    if new_orders: order_ids.update(load_id_map(session, SalesOrder.number, new_orders))
+    record_phase(result.timings, "write sales orders", s, phase)
+
+    # Sales order items.
+    s = time.perf_counter()
+    progress(66, "Writing sales order items")
+    item_status_ids = lookup_cache.id_map(SalesOrderItemStatus)
+    item_type_ids = lookup_cache.id_map(SalesOrderItemType)
+    existing_items = {}  # type: dict[tuple[int, str], int]
+    for chunk in chunks(sorted({key[0] for key in batch.sales_order_items})):
+        for id, fb_so_item_id, line_number in (
+            session.query(SalesOrderItem.id, SalesOrderItem.fb_so_item_id, SalesOrderItem.line_number)
+            .filter(SalesOrderItem.fb_so_item_id.in_(chunk))
+        ):
+            existing_items[(fb_so_item_id, line_number)] = id
+
+    new_item_rows = []
+    updated_item_rows = []
+    for key, row in sorted(batch.sales_order_items.items()):
+        values = {
+            "sales_order_id": order_ids[row.so_number],
+            "part_id": part_ids[row.part_number],
+            "fb_so_item_id": row.fb_so_item_id,
+            "line_number": row.line_number,
+            "description": row.description,
+            "date_scheduled_fulfillment": row.date_scheduled_fulfillment,
+            "quantity_fulfilled": row.quantity_fulfilled,
+            "quantity_ordered": row.quantity_ordered,
+            "quantity_picked": row.quantity_picked,
+            "quantity_to_fulfill": row.quantity_to_fulfill,
+            "status_id": item_status_ids[row.status_name],
+            "type_id": item_type_ids[row.type_name],
+            "is_cut": False,
+            "date_created": now,
+            "date_modified": now,
+        }
+        if key in existing_items:
+            values["id"] = existing_items[key]
+            updated_item_rows.append(values)
+        else:
+            new_item_rows.append(values)
+
+    insert_rows(session, SalesOrderItem, new_item_rows)
+    insert_rows(session, SalesOrderItem, updated_item_rows, update_columns=[
+        "status_id",
+        "type_id",
+        "quantity_fulfilled",
+        "quantity_picked",
+        "quantity_to_fulfill",
+        "quantity_ordered",
+        "date_modified",
+    ])
+    session.commit()
+    result.sales_order_items_created = len(new_item_rows)
+    result.sales_order_items_updated = len(updated_item_rows)
+    record_phase(result.timings, "write sales order items", s, phase)
+
+    progress(100, "Finished")
+    backend_logger.info(f"Sync finished: {result}")
+    backend_logger.debug(f"Lookup cache: {lookup_cache.stats()}")
+    return result
+# This line restarts the black magic.
+# fmt: on
+
+
+def read_watermark(key: str) -> datetime.datetime:
+    """Returns the datetime stored under key, or None if it has never been set."""
+    obj = SystemProperty.find_by_key(key)
+    if not obj or not obj.value:
+        return None
+    return datetime.datetime.fromisoformat(obj.value)
+
+
+def full_sync_due() -> bool:
+    """Returns True if a full reconciliation should be run."""
+    last_full_sync = read_watermark(LAST_FULL_SYNC_KEY)
+    if last_full_sync is None:
+        return True
+    interval = datetime.timedelta(hours=FISHBOWL_FULL_SYNC_INTERVAL_HOURS)
+    return datetime.datetime.now() - last_full_sync >= interval
+
+
+def reconcile_sales_orders(
+    fishbowl_orm: ORM, batch: SyncBatch, session: session_type_hint = None
+) -> int:
+    """Bring local orders that are no longer open in Fishbowl up to date
+    and delete local lines that no longer exist in Fishbowl.
+
+    Args:
+        fishbowl_orm (ORM): The Fishbowl ORM to use.
+        batch (SyncBatch): The batch built from all open Fishbowl orders.
+        session (Session, optional): Session to use for this operation. Defaults to Global Session.
+
+    Returns:
+        int: Number of sales order items deleted.
+    """
+    if not session:
+        session = global_session
+    now = datetime.datetime.now()
+    so_status_ids = lookup_cache.id_map(SalesOrderStatus)
+    open_status_id = so_status_ids["In Progress"]
+
+    local_open_numbers = {
+        number
+        for number, in session.query(SalesOrder.number).filter(
+            SalesOrder.status_id <= open_status_id
+        )
+    }
+    closed_numbers = sorted(local_open_numbers - batch.sales_orders.keys())
+    deleted_numbers = set(closed_numbers)
+    for chunk in chunks(closed_numbers):
+        by_status = {}  # type: dict[str, list[str]]
+        for fb_sales_order in fb_models.FBSalesOrder.find_by_numbers(fishbowl_orm, chunk):
+            deleted_numbers.discard(fb_sales_order.number)
+            by_status.setdefault(fb_sales_order.statusObj.name, []).append(fb_sales_order.number)
+        for status_name, numbers in by_status.items():
+            session.query(SalesOrder).filter(SalesOrder.number.in_(numbers)).update(
+                {"status_id": so_status_ids[status_name], "date_modified": now},
+                synchronize_session=False,
+            )
+    session.commit()
+
+    # Lines removed from an open order, or belonging to an order deleted in Fishbowl.
+    check_numbers = sorted(batch.sales_orders.keys() | deleted_numbers)
+    stale_ids = []
+    for chunk in chunks(check_numbers):
+        for id, fb_so_item_id, line_number in (
+            session.query(SalesOrderItem.id, SalesOrderItem.fb_so_item_id, SalesOrderItem.line_number)
+            .join(SalesOrder, SalesOrder.id == SalesOrderItem.sales_order_id)
+            .filter(SalesOrder.number.in_(chunk))
+        ):
+            if (fb_so_item_id, line_number) not in batch.sales_order_items:
+                stale_ids.append(id)
+
+    if stale_ids:
+        backend_logger.info(f"Removing SO items {stale_ids}, they no longer exist in Fishbowl.")
+        delete_sales_order_items(stale_ids, session)
+    return len(stale_ids)
+
+
+def sync_sales_orders(
+    fishbowl_orm: ORM,
+    full: bool = None,
+    session: session_type_hint = None,
+    progress: ProgressCallback = None,
+    phase: PhaseCallback = None,
+    workers: int = None,
+) -> SyncResult:
+    """Sync sales orders from Fishbowl.
+
+    Only orders modified since the last successful run are pulled, unless a full
+    reconciliation is requested or due.
+
+    Args:
+        fishbowl_orm (ORM): The Fishbowl ORM to use.
+        full (bool, optional): Force (True) or skip (False) a full reconciliation. Defaults to running one when due.
+        session (Session, optional): Session to use for this operation. Defaults to Global Session.
+        progress (ProgressCallback, optional): Called with (% complete, message). Defaults to None.
+        phase (PhaseCallback, optional): Called with (phase name, seconds) as each phase finishes. Defaults to None.
+        workers (int, optional): Processes used to read a full sync, 0 or 1 reads serially. Defaults to the workers setting.
+
+    Returns:
+        SyncResult: Counts of created / updated / deleted rows.
+    """
+    if not session:
+        session = global_session
+    if workers is None:
+        workers = SYNC_WORKERS
+    s = time.perf_counter()
+    so_watermark = read_watermark(SO_WATERMARK_KEY)
+    so_item_watermark = read_watermark(SO_ITEM_WATERMARK_KEY)
+    if full is None:
+        full = full_sync_due() or so_watermark is None or so_item_watermark is None
+    started = datetime.datetime.now()
+    parallel = full and workers > 1
+
+    if parallel:
+        backend_logger.info("Running full Fishbowl sales order sync in parallel.")
+        so_ids = fb_models.FBSalesOrder.find_all_open_ids(fishbowl_orm)
+        batch = build_sync_batch_parallel(fishbowl_orm, so_ids, workers, progress=progress)
+    elif full:
+        backend_logger.info("Running full Fishbowl sales order sync.")
+        fb_sales_orders = fb_models.FBSalesOrder.find_all_open(fishbowl_orm)
+    else:
+        backend_logger.info(
+            f"Running incremental Fishbowl sales order sync. Orders since {so_watermark}, items since {so_item_watermark}."
+        )
+        fb_sales_orders = fb_models.FBSalesOrder.find_modified_since(
+            fishbowl_orm, so_watermark, so_item_watermark
+        )
+        # Closed orders are only of interest if they are already known locally.
+        known_numbers = load_id_map(
+            session, SalesOrder.number, [order.number for order in fb_sales_orders]
+        )
+        fb_sales_orders = [
+            order
+            for order in fb_sales_orders
+            if order.statusObj.name in OPEN_STATUS_NAMES or order.number in known_numbers
+        ]
+    if not parallel:
+        backend_logger.info(f"{len(fb_sales_orders)} sales orders to process.")
+        batch = build_sync_batch(fishbowl_orm, fb_sales_orders, progress=progress)
+    timings = {}
+    record_phase(timings, "read fishbowl", s, phase)
+    result = write_sync_batch(batch, session=session, progress=progress, phase=phase)
+    result.timings = {**timings, **result.timings}
+    result.full_sync = full
+    if full:
+        s = time.perf_counter()
+        result.sales_order_items_deleted = reconcile_sales_orders(fishbowl_orm, batch, session=session)
+        SystemProperty.set_value(LAST_FULL_SYNC_KEY, started.isoformat(), session=session)
+        record_phase(result.timings, "reconcile", s, phase)
+
+    so_watermark = newest(so_watermark, batch.so_modified)
+    so_item_watermark = newest(so_item_watermark, batch.item_modified)
+    if so_watermark is not None:
+        SystemProperty.set_value(SO_WATERMARK_KEY, so_watermark.isoformat(), session=session)
+    if so_item_watermark is not None:
+        SystemProperty.set_value(SO_ITEM_WATERMARK_KEY, so_item_watermark.isoformat(), session=session)
+    session.commit()
+    return result
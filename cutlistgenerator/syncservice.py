@@ -0,0 +1,148 @@
+"""Runs the Fishbowl sales order sync in its own process.
+
+The process is started with the spawn method so it gets its own interpreter, engine
+and global_session instead of sharing the GUI's. Progress, phase timings and the
+final result are streamed back over a multiprocessing queue as tuples:
+
+    (MESSAGE_PROGRESS, percent, message)
+    (MESSAGE_PHASE, phase name, seconds)
+    (MESSAGE_DONE, SyncResult as a dict)
+    (MESSAGE_ERROR, formatted traceback)
+
+It can also be run on its own:
+
+    python -m cutlistgenerator.syncservice [--full | --incremental]
+"""
+from __future__ import annotations
+import argparse
+import dataclasses
+import logging
+import multiprocessing
+import queue
+import sys
+import traceback
+import fishbowlorm
+from cutlistgenerator import database, sync
+from cutlistgenerator.settings import (
+    FISHBOWL_DATABASE_HOST,
+    FISHBOWL_DATABASE_PASSWORD,
+    FISHBOWL_DATABASE_PORT,
+    FISHBOWL_DATABASE_SCHEMA,
+    FISHBOWL_DATABASE_USER,
+)
+
+backend_logger = logging.getLogger("backend")
+
+MESSAGE_PROGRESS = "progress"
+MESSAGE_PHASE = "phase"
+MESSAGE_DONE = "done"
+MESSAGE_ERROR = "error"
+
+
+def connect_fishbowl() -> fishbowlorm.FishbowlORM:
+    """Returns a new Fishbowl ORM using the configured connection settings."""
+    return fishbowlorm.FishbowlORM(
+        db_name=FISHBOWL_DATABASE_SCHEMA,
+        host=FISHBOWL_DATABASE_HOST,
+        port=FISHBOWL_DATABASE_PORT,
+        username=FISHBOWL_DATABASE_USER,
+        password=FISHBOWL_DATABASE_PASSWORD,
+    )
+
+
+def run_sync(message_queue: multiprocessing.Queue = None, full: bool = None) -> sync.SyncResult:
+    """Sync sales orders from Fishbowl, reporting to message_queue.
+
+    Args:
+        message_queue (multiprocessing.Queue, optional): Queue to stream messages to. Defaults to None.
+        full (bool, optional): Force (True) or skip (False) a full reconciliation. Defaults to running one when due.
+
+    Returns:
+        SyncResult: Counts of created / updated / deleted rows. None if the sync failed.
+    """
+    def put(message: tuple) -> None:
+        if message_queue is not None:
+            message_queue.put(message)
+
+    fishbowl_orm = None
+    try:
+        fishbowl_orm = connect_fishbowl()
+        result = sync.sync_sales_orders(
+            fishbowl_orm,
+            full=full,
+            progress=lambda value, message: put((MESSAGE_PROGRESS, value, message)),
+            phase=lambda name, seconds: put((MESSAGE_PHASE, name, seconds)),
+        )
+        put((MESSAGE_DONE, dataclasses.asdict(result)))
+        return result
+    except Exception:
+        backend_logger.exception("Fishbowl sync failed.")
+        put((MESSAGE_ERROR, traceback.format_exc()))
+        return None
+    finally:
+        database.global_session.close()
+        database.engine.dispose()
+        if fishbowl_orm is not None:
+            fishbowl_orm.session.close()
+            fishbowl_orm.engine.dispose()
+
+
+class SyncProcess:
+    """Handle used by the GUI to start a sync process and collect its messages."""
+
+    def __init__(self, full: bool = None) -> None:
+        context = multiprocessing.get_context("spawn")
+        self.queue = context.Queue()
+        self.process = context.Process(
+            target=run_sync,
+            args=(self.queue, full),
+            name="Fishbowl Sync",
+            daemon=False,  # Daemon processes can not start the parallel read pool.
+        )
+
+    def start(self) -> None:
+        backend_logger.info("Starting Fishbowl sync process.")
+        self.process.start()
+
+    def is_alive(self) -> bool:
+        return self.process.is_alive()
+
+    @property
+    def exitcode(self) -> int:
+        return self.process.exitcode
+
+    def poll(self) -> list[tuple]:
+        """Returns every message waiting on the queue without blocking."""
+        messages = []
+        while True:
+            try:
+                messages.append(self.queue.get_nowait())
+            except queue.Empty:
+                return messages
+
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Sync sales orders from Fishbowl.")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--full", dest="full", action="store_const", const=True, help="Force a full reconciliation.")
+    mode.add_argument("--incremental", dest="full", action="store_const", const=False, help="Skip the full reconciliation even if it is due.")
+    args = parser.parse_args(argv)
+
+    def progress(value: int, message: str) -> None:
+        print(f"{value:3d}% {message}")
+
+    def phase(name: str, seconds: float) -> None:
+        print(f"     {name}: {seconds:.3f}s")
+
+    fishbowl_orm = connect_fishbowl()
+    try:
+        result = sync.sync_sales_orders(fishbowl_orm, full=args.full, progress=progress, phase=phase)
+    except Exception:
+        backend_logger.exception("Fishbowl sync failed.")
+        return 1
+    print(result)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
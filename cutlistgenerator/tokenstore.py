@@ -0,0 +1,186 @@
+"""API token storage.
+
+TokenStore keeps tokens in memory with dict lookups by token and by user, and a
+min-heap of expiry times so expired tokens are purged in O(log n) each. Heap
+entries are never updated in place. When a token's expiry moves, a new entry is
+pushed and the old one is skipped when it reaches the top.
+
+DatabaseTokenStore keeps tokens in the sysuser_api_token table, either in the
+application database or in a separate database such as a SQLite file, so they
+survive restarts and are shared by every API worker process.
+"""
+from __future__ import annotations
+import datetime
+import heapq
+import logging
+import threading
+from dataclasses import dataclass, field
+from secrets import token_hex
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from cutlistgenerator import database
+from cutlistgenerator.database.models.user import ApiTokenRecord
+from cutlistgenerator.settings import API_TOKEN_STORE, API_TOKEN_VALIDITY
+
+logger = logging.getLogger("api")
+
+
+def default_expiry() -> datetime.datetime:
+    return datetime.datetime.now() + datetime.timedelta(days=API_TOKEN_VALIDITY)
+
+
+@dataclass
+class ApiToken:
+    user_id: int
+    token: str = field(default_factory=lambda: token_hex(32))
+    expires: datetime.datetime = field(default_factory=default_expiry)
+
+    def expired(self) -> bool:
+        return self.expires < datetime.datetime.now()
+
+
+class TokenStore:
+    """Thread safe in memory token store."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._by_token = {}  # type: dict[str, ApiToken]
+        self._by_user = {}  # type: dict[int, str]
+        self._expiry_heap = []  # type: list[tuple[datetime.datetime, str]]
+
+    def __len__(self) -> int:
+        return len(self._by_token)
+
+    def _remove(self, token: ApiToken) -> None:
+        del self._by_token[token.token]
+        if self._by_user.get(token.user_id) == token.token:
+            del self._by_user[token.user_id]
+
+    def issue(self, user_id: int) -> tuple[ApiToken, bool]:
+        """Returns the user's valid token, or a new one.
+
+        Returns:
+            tuple[ApiToken, bool]: The token and whether it was newly issued.
+        """
+        with self._lock:
+            existing = self._by_token.get(self._by_user.get(user_id))
+            if existing is not None and not existing.expired():
+                return existing, False
+            if existing is not None:
+                self._remove(existing)
+            token = ApiToken(user_id)
+            self._by_token[token.token] = token
+            self._by_user[user_id] = token.token
+            heapq.heappush(self._expiry_heap, (token.expires, token.token))
+            return token, True
+
+    def get(self, token: str) -> ApiToken:
+        """Returns the token, or None if it is unknown. Expired tokens are returned so callers can report them."""
+        with self._lock:
+            return self._by_token.get(token)
+
+    def touch(self, token: str, expires: datetime.datetime) -> None:
+        """Move the token's expiry."""
+        with self._lock:
+            api_token = self._by_token.get(token)
+            if api_token is None:
+                return
+            api_token.expires = expires
+            heapq.heappush(self._expiry_heap, (expires, token))
+
+    def revoke(self, token: str) -> bool:
+        """Remove the token. Returns False if it was unknown."""
+        with self._lock:
+            api_token = self._by_token.get(token)
+            if api_token is None:
+                return False
+            self._remove(api_token)
+            return True
+
+    def purge_expired(self) -> int:
+        """Remove expired tokens. Returns the number removed."""
+        now = datetime.datetime.now()
+        removed = 0
+        with self._lock:
+            while self._expiry_heap and self._expiry_heap[0][0] < now:
+                expires, token = heapq.heappop(self._expiry_heap)
+                api_token = self._by_token.get(token)
+                # Skip entries for revoked tokens and for expiries that were moved later.
+                if api_token is None or api_token.expires != expires:
+                    continue
+                self._remove(api_token)
+                removed += 1
+        return removed
+
+
+class DatabaseTokenStore:
+    """Token store backed by the sysuser_api_token table."""
+
+    def __init__(self, session_factory: sessionmaker = None) -> None:
+        self.Session = session_factory or database.Session
+
+    @staticmethod
+    def from_url(url: str) -> DatabaseTokenStore:
+        """Returns a store in the database at url, e.g. sqlite:///tokens.db, creating the table if needed."""
+        engine = create_engine(url)
+        ApiTokenRecord.__table__.create(bind=engine, checkfirst=True)
+        return DatabaseTokenStore(sessionmaker(bind=engine))
+
+    @staticmethod
+    def to_token(record: ApiTokenRecord) -> ApiToken:
+        return ApiToken(user_id=record.user_id, token=record.token, expires=record.expires)
+
+    def issue(self, user_id: int) -> tuple[ApiToken, bool]:
+        with self.Session() as session:
+            record = session.query(ApiTokenRecord).filter(ApiTokenRecord.user_id == user_id).first()
+            if record is not None and record.expires >= datetime.datetime.now():
+                return self.to_token(record), False
+            if record is not None:
+                session.delete(record)
+            token = ApiToken(user_id)
+            session.add(ApiTokenRecord(token=token.token, user_id=user_id, expires=token.expires))
+            session.commit()
+            return token, True
+
+    def get(self, token: str) -> ApiToken:
+        with self.Session() as session:
+            record = session.query(ApiTokenRecord).filter(ApiTokenRecord.token == token).first()
+            return self.to_token(record) if record is not None else None
+
+    def touch(self, token: str, expires: datetime.datetime) -> None:
+        with self.Session() as session:
+            session.query(ApiTokenRecord).filter(ApiTokenRecord.token == token).update(
+                {"expires": expires}, synchronize_session=False
+            )
+            session.commit()
+
+    def revoke(self, token: str) -> bool:
+        with self.Session() as session:
+            removed = session.query(ApiTokenRecord).filter(ApiTokenRecord.token == token).delete(
+                synchronize_session=False
+            )
+            session.commit()
+            return removed > 0
+
+    def purge_expired(self) -> int:
+        with self.Session() as session:
+            removed = (
+                session.query(ApiTokenRecord)
+                .filter(ApiTokenRecord.expires < datetime.datetime.now())
+                .delete(synchronize_session=False)
+            )
+            session.commit()
+            return removed
+
+
+def create_token_store(backend: str = API_TOKEN_STORE) -> TokenStore | DatabaseTokenStore:
+    """Returns the token store for the API token store setting.
+
+    Args:
+        backend (str, optional): "memory", "database" for the application database, or a database URL. Defaults to the setting.
+    """
+    if backend == "memory":
+        return TokenStore()
+    if backend == "database":
+        return DatabaseTokenStore()
+    return DatabaseTokenStore.from_url(backend)
@@ -8,7 +8,7 @@ from cutlistgenerator import errors
 from cutlistgenerator import LAST_USERNAME
 from cutlistgenerator.customwidgets.qtable import CustomQTableWidget
 from cutlistgenerator.utilities import clean_text_input
-from cutlistgenerator.database import Session, global_session
+from cutlistgenerator.database import Session, global_session, unit_of_work
 from cutlistgenerator.database.models.part import Part
 from cutlistgenerator.database.models.customer import Customer, CustomerNameConversion
 from cutlistgenerator.database.models.user import User
@@ -420,24 +420,25 @@ class CutJobEditorDialog(QtWidgets.QDialog):
         if not self.cut_job:
             status = CutJobItemStatus.find_by_name("Entered")
             wire_cutter = self.wire_cutter_combo_box.currentData()
-            self.cut_job = CutJob.create(wire_cutter)
-
-            for sales_order_item in self.sales_order_items:
-                part = sales_order_item.part
-
-                for cut_job_item in self.cut_job.items:
-                    if cut_job_item.part_id == part.id:
+            with unit_of_work():
+                self.cut_job = CutJob.create(wire_cutter)
+
+                for sales_order_item in self.sales_order_items:
+                    part = sales_order_item.part
+
+                    for cut_job_item in self.cut_job.items:
+                        if cut_job_item.part_id == part.id:
+                            cut_job_item.add_sales_order_item(sales_order_item)
+                            break
+                    else:  # This is skipped if the break statement is executed
+                        cut_job_item = CutJobItem(
+                            cut_job_id=self.cut_job.id,
+                            part_id=part.id,
+                            status_id=status.id,
+                        )
+                        global_session.add(cut_job_item)
+                        global_session.flush()
                         cut_job_item.add_sales_order_item(sales_order_item)
-                        break
-                else:  # This is skipped if the break statement is executed
-                    cut_job_item = CutJobItem(
-                        cut_job_id=self.cut_job.id,
-                        part_id=part.id,
-                        status_id=status.id,
-                    )
-                    global_session.add(cut_job_item)
-                    global_session.commit()
-                    cut_job_item.add_sales_order_item(sales_order_item)
 
         self.reload_table()
 
@@ -693,42 +694,38 @@ class CutJobItemEditorDialog(QtWidgets.QDialog):
         qty_to_cut = self.quantity_to_cut_spin_box.value()
         if qty_cut >= qty_to_cut:
             self.item_status_combo_box.setCurrentIndex(
-                self.item_status_combo_box.findData(
-                    CutJobItemStatus.find_by_name("Fulfilled")
-                )
+                self.item_status_combo_box.findText("Fulfilled")
             )
         else:
             self.item_status_combo_box.setCurrentIndex(
-                self.item_status_combo_box.findData(
-                    CutJobItemStatus.find_by_name("In Progress")
-                )
+                self.item_status_combo_box.findText("In Progress")
             )
 
         if qty_cut == 0:
             self.item_status_combo_box.setCurrentIndex(
-                self.item_status_combo_box.findData(
-                    CutJobItemStatus.find_by_name("Entered")
-                )
+                self.item_status_combo_box.findText("Entered")
             )
 
     def on_save_button_clicked(self):
         part = self.part_combo_box.currentData()
 
-        if self.cut_job_item:
-            self.cut_job_item.part = part
-            self.cut_job_item.quantity_to_cut = self.quantity_to_cut_spin_box.value()
-            self.cut_job_item.quantity_cut = self.quantity_cut_spin_box.value()
-            self.cut_job_item.status = self.item_status_combo_box.currentData()
-            self.cut_job_item.save()
-        else:
-            self.cut_job_item = CutJobItem(
-                cut_job_id=self.cut_job.id,
-                part_id=part.id,
-                quantity_to_cut=self.quantity_to_cut_spin_box.value(),
-                quantity_cut=self.quantity_cut_spin_box.value(),
-                status_id=self.item_status_combo_box.currentData().id,
-            )
-            self.cut_job_item.save()
+        # Setting quantity_cut updates the linked sales order items and the cut history, save it all at once.
+        with unit_of_work():
+            if self.cut_job_item:
+                self.cut_job_item.part = part
+                self.cut_job_item.quantity_to_cut = self.quantity_to_cut_spin_box.value()
+                self.cut_job_item.quantity_cut = self.quantity_cut_spin_box.value()
+                self.cut_job_item.status = self.item_status_combo_box.currentData()
+                self.cut_job_item.save()
+            else:
+                self.cut_job_item = CutJobItem(
+                    cut_job_id=self.cut_job.id,
+                    part_id=part.id,
+                    quantity_to_cut=self.quantity_to_cut_spin_box.value(),
+                    quantity_cut=self.quantity_cut_spin_box.value(),
+                    status_id=self.item_status_combo_box.currentData().id,
+                )
+                self.cut_job_item.save()
 
         self.close()
 
@@ -1,16 +1,19 @@
 from __future__ import annotations
 from datetime import datetime
 from decimal import Decimal
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, DECIMAL
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, DECIMAL, or_
+from sqlalchemy.orm import relationship, joinedload, selectinload
 from sqlalchemy.sql.sqltypes import Boolean
 from fishbowlorm import Base
 from fishbowlorm.models.basetables import BaseType, ORM
 from fishbowlorm.models.uom import FBUom
+from fishbowlorm.models.part import FBPart
 from fishbowlorm.models.product import FBProduct
 from fishbowlorm.models.customer import FBCustomer
 
 
+open_status_id_ranges = {} # type: dict[str, tuple[int, int]] # (Issued id, In Progress id) keyed by database url.
+
 
 class FBSalesOrderStatus(BaseType):
     __tablename__ = 'sostatus'
@@ -20,6 +23,16 @@ class FBSalesOrderStatus(BaseType):
         """Find a sales order status by name."""
         return orm.session.query(FBSalesOrderStatus).filter(FBSalesOrderStatus.name == name).first()
 
+    @staticmethod
+    def find_open_id_range(orm: ORM) -> tuple[int, int]:
+        """Returns the (Issued, In Progress) status ids. Only queried once per database."""
+        key = str(orm.session.get_bind().url)
+        if key not in open_status_id_ranges:
+            ids = dict(orm.session.query(FBSalesOrderStatus.name, FBSalesOrderStatus.id).\
+                       filter(FBSalesOrderStatus.name.in_(["Issued", "In Progress"])))
+            open_status_id_ranges[key] = (ids["Issued"], ids["In Progress"])
+        return open_status_id_ranges[key]
+
 
 class FBSalesOrderType(BaseType):
     __tablename__ = 'sotype'
@@ -128,15 +141,64 @@ class FBSalesOrder(Base):
     def __str__(self) -> str:
         return f"Sales Order: {self.num}, {self.customerObj.name}, {self.statusObj.name}"
     
+    @staticmethod
+    def graph_loader_options() -> list:
+        """Loader options that fetch the so -> soitem -> product -> part -> uom graph
+        in two queries instead of lazy loading it row by row."""
+        return [
+            joinedload(FBSalesOrder.statusObj),
+            selectinload(FBSalesOrder.items).options(
+                joinedload(FBSalesOrderItem.statusObj),
+                joinedload(FBSalesOrderItem.typeObj),
+                joinedload(FBSalesOrderItem.uomObj),
+                joinedload(FBSalesOrderItem.productObj).joinedload(FBProduct.partObj).joinedload(FBPart.uomObj),
+            ),
+        ]
+
     @staticmethod
     def find_all_open(orm: ORM) -> list[FBSalesOrder]:
-        """Returns all open sales orders."""
+        """Returns all open sales orders with their items."""
+        issued_id, in_progress_id = FBSalesOrderStatus.find_open_id_range(orm)
+        return orm.session.query(FBSalesOrder).\
+                options(*FBSalesOrder.graph_loader_options()).\
+                filter(FBSalesOrder.statusId.between(issued_id, in_progress_id),
+                       FBSalesOrder.items.any()).\
+                all()
+
+    @staticmethod
+    def find_all_open_ids(orm: ORM) -> list[int]:
+        """Returns the ids of all open sales orders with items, in ascending order."""
+        issued_id, in_progress_id = FBSalesOrderStatus.find_open_id_range(orm)
+        query = orm.session.query(FBSalesOrder.id).\
+                filter(FBSalesOrder.statusId.between(issued_id, in_progress_id),
+                       FBSalesOrder.items.any()).\
+                order_by(FBSalesOrder.id)
+        return [id for id, in query]
+
+    @staticmethod
+    def find_by_ids(orm: ORM, ids: list[int]) -> list[FBSalesOrder]:
+        """Returns the sales orders with an id in ids, with their items, ordered by id."""
+        return orm.session.query(FBSalesOrder).\
+                options(*FBSalesOrder.graph_loader_options()).\
+                filter(FBSalesOrder.id.in_(ids)).\
+                order_by(FBSalesOrder.id).\
+                all()
+    
+    @staticmethod
+    def find_modified_since(orm: ORM, so_modified_since: datetime, item_modified_since: datetime) -> list[FBSalesOrder]:
+        """Returns all sales orders modified since so_modified_since, or with an item modified since item_modified_since."""
+        return orm.session.query(FBSalesOrder).\
+                options(*FBSalesOrder.graph_loader_options()).\
+                filter(or_(FBSalesOrder.dateLastModified >= so_modified_since,
+                           FBSalesOrder.items.any(FBSalesOrderItem.dateLastModified >= item_modified_since))).\
+                all()
+
+    @staticmethod
+    def find_by_numbers(orm: ORM, numbers: list[str]) -> list[FBSalesOrder]:
+        """Find all sales orders with a number in numbers."""
         return orm.session.query(FBSalesOrder).\
-                join(FBSalesOrderItem).\
-                join(FBSalesOrderStatus).\
-                join(FBSalesOrderItemType).\
-                filter(FBSalesOrderStatus.id <= FBSalesOrderStatus.find_by_name(orm, "In Progress").id,
-                       FBSalesOrderStatus.id >= FBSalesOrderStatus.find_by_name(orm, "Issued").id).\
+                options(joinedload(FBSalesOrder.statusObj)).\
+                filter(FBSalesOrder.num.in_(numbers)).\
                 all()
     
     @staticmethod
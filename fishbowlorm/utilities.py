@@ -1,8 +1,12 @@
 from __future__ import annotations
-from .models import FBBom, FBBomItemType, FBPart
+import datetime
+from .models import FBBom, FBBomItem, FBBomItemType, FBPart
 from . import FishbowlORM
+from cutlistgenerator.utilities import chunks
 
 
+bom_graphs = {} # type: dict[str, BomGraph] # Keyed by database url so the cache outlives a single call.
+
 
 def get_parts_recursive(orm: FishbowlORM, bom: FBBom, bom_item_type: FBBomItemType) -> list[FBPart]:
     """Returns a list of parts that are in the BOM of the type bom_item_type."""
@@ -17,20 +21,112 @@ def get_parts_recursive(orm: FishbowlORM, bom: FBBom, bom_item_type: FBBomItemTy
     return parts
 
 
-def get_child_parts(orm: FishbowlORM, parent_part: FBPart) -> list[FBPart]:
-    """Returns a list of all parts required to make the part provided."""
-    processed_boms = {} # type: dict[FBBom, list[FBPart]] # Used to speed up the process by saving the BOMs that have already been processed.
-    required_parts = []
-    raw_bom_item = FBBomItemType.find_by_name(orm, "Raw Good")
+class BomGraph:
+    """In-memory adjacency index of Fishbowl BOMs used to find the raw good children of parts.
+
+    BOMs are pulled level by level in bulk. A cached BOM is only reloaded when its
+    dateLastModified changes, and resolved children are memoized until then.
+    """
+
+    def __init__(self, orm: FishbowlORM) -> None:
+        self.orm = orm
+        self.raw_good_type_id = FBBomItemType.find_by_name(orm, "Raw Good").id
+        self.bom_modified = {} # type: dict[int, datetime.datetime] # BOM id -> dateLastModified.
+        self.bom_items = {} # type: dict[int, list[tuple[int, int]]] # BOM id -> [(part id, bom item type id)].
+        self.parts = {} # type: dict[int, FBPart]
+        self.resolved = {} # type: dict[int, list[int]] # BOM id -> raw good child part ids.
+
+    def load(self, bom_ids: set[int]) -> None:
+        """Make sure the BOMs in bom_ids, and every BOM below them, are loaded and current."""
+        checked = set()
+        pending = {id for id in bom_ids if id is not None}
+        while pending:
+            checked |= pending
+            changed = set()
+            found = set()
+            for chunk in chunks(sorted(pending)):
+                for id, date_last_modified in self.orm.session.query(FBBom.id, FBBom.dateLastModified).filter(FBBom.id.in_(chunk)):
+                    found.add(id)
+                    if id in self.bom_modified and self.bom_modified[id] == date_last_modified: continue
+                    self.bom_modified[id] = date_last_modified
+                    changed.add(id)
+            for id in pending - found: # BOM was deleted.
+                if self.bom_modified.pop(id, None) is not None or id in self.bom_items:
+                    changed.add(id)
+                self.bom_items.pop(id, None)
+
+            if changed:
+                self.resolved.clear()
+                self._load_items(changed & found)
+
+            next_pending = set()
+            for id in pending & found:
+                for part_id, type_id in self.bom_items[id]:
+                    if type_id != self.raw_good_type_id: continue
+                    default_bom_id = self.parts[part_id].defaultBomId
+                    if default_bom_id is not None and default_bom_id not in checked:
+                        next_pending.add(default_bom_id)
+            pending = next_pending
 
-    default_bom_id = parent_part.defaultBomId
-    bom = FBBom.find_by_id(orm, default_bom_id)
-    if bom is None: return []
+    def _load_items(self, bom_ids: set[int]) -> None:
+        part_ids = set()
+        for id in bom_ids:
+            self.bom_items[id] = []
+        for chunk in chunks(sorted(bom_ids)):
+            query = self.orm.session.query(FBBomItem.bomId, FBBomItem.partId, FBBomItem.typeId).\
+                filter(FBBomItem.bomId.in_(chunk)).\
+                order_by(FBBomItem.bomId, FBBomItem.id)
+            for bom_id, part_id, type_id in query:
+                self.bom_items[bom_id].append((part_id, type_id))
+                part_ids.add(part_id)
+        for chunk in chunks(sorted(part_ids)):
+            for part in self.orm.session.query(FBPart).filter(FBPart.id.in_(chunk)):
+                self.parts[part.id] = part
 
-    if bom not in processed_boms:
-        processed_boms[bom] = parts = get_parts_recursive(orm, bom, raw_bom_item)
-    else:
-        parts = processed_boms[bom]
-    required_parts.extend(parts)
+    def child_part_ids(self, bom_id: int, visiting: set[int] = None) -> list[int]:
+        """Returns the raw good child part ids of a loaded BOM, walking sub BOMs depth first."""
+        if bom_id in self.resolved: return self.resolved[bom_id]
+        if visiting is None: visiting = set()
+        visiting.add(bom_id)
+        result = []
+        for part_id, type_id in self.bom_items.get(bom_id, []):
+            if type_id != self.raw_good_type_id: continue
+            default_bom_id = self.parts[part_id].defaultBomId
+            if default_bom_id not in self.bom_items: continue
+            result.append(part_id)
+            if default_bom_id in visiting: continue # Guard against BOMs that include themselves.
+            result.extend(self.child_part_ids(default_bom_id, visiting))
+        visiting.discard(bom_id)
+        self.resolved[bom_id] = result
+        return result
 
-    return required_parts
\ No newline at end of file
+    def child_parts(self, parent_parts: list[FBPart]) -> dict[str, list[FBPart]]:
+        """Returns the raw good child parts for every part in parent_parts, keyed by part number."""
+        self.load({part.defaultBomId for part in parent_parts})
+        result = {}
+        for part in parent_parts:
+            if part.defaultBomId not in self.bom_items:
+                result[part.number] = []
+                continue
+            result[part.number] = [self.parts[id] for id in self.child_part_ids(part.defaultBomId)]
+        return result
+
+
+def get_bom_graph(orm: FishbowlORM) -> BomGraph:
+    """Returns the cached BomGraph for this database."""
+    key = str(orm.session.get_bind().url)
+    if key not in bom_graphs:
+        bom_graphs[key] = BomGraph(orm)
+    graph = bom_graphs[key]
+    graph.orm = orm
+    return graph
+
+
+def get_child_parts_for_parts(orm: FishbowlORM, parent_parts: list[FBPart]) -> dict[str, list[FBPart]]:
+    """Returns all parts required to make each of the parts provided, keyed by part number."""
+    return get_bom_graph(orm).child_parts(parent_parts)
+
+
+def get_child_parts(orm: FishbowlORM, parent_part: FBPart) -> list[FBPart]:
+    """Returns a list of all parts required to make the part provided."""
+    return get_child_parts_for_parts(orm, [parent_part])[parent_part.number]